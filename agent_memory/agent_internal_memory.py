@@ -1,4 +1,7 @@
-from functools import wraps
+import asyncio
+import inspect
+from concurrent.futures import ThreadPoolExecutor
+from functools import wraps, partial
 from typing import Callable, Any
 from uuid import uuid4
 
@@ -11,6 +14,11 @@ from agent_memory.data_classes.memory_dataclasses import *
 from agent_memory.data_classes.graph_dataclasses import *
 from agent_memory.graph_tooling.state_management import StateManagement
 from agent_memory.hash_rag.HashRag import HashRag
+from agent_memory.cost_ledger.cost_ledger import CostLedger
+from agent_memory.ingestion.memory_ingestion_pipeline import MemoryIngestionPipeline
+from tracing.tracer import TraceLevel, get_tracer
+
+tracer = get_tracer('agent_memory')
 
 
 
@@ -22,12 +30,16 @@ class AgentMemory:
         self.checkpoint_uuid = checkpoint_uuid
         self.task_uuid = task_uuid
         self.work_package_uuid = work_package_uuid
-        self.graph_memory = GraphDag()
+        self.cost_ledger = CostLedger(task_uuid=task_uuid, work_package_uuid=work_package_uuid)
+        self.graph_memory = GraphDag(cost_ledger=self.cost_ledger)
         self.function_normalizer = FunctionOutputNormalizer()
         self.state_management = StateManagement(MemoryClass=self.graph_memory)
         self.hash_rag = HashRag(ai_driver=self.ai_driver)
         self.checkpoint = checkpoint
         self.checkpoint_dataclass_list = []
+        self._memory_executor = None
+        self.ingestion_pipeline = None
+        self._context_cache = {}
         logger.debug(f"AgentMemory initialized with work_package_uuid: {work_package_uuid}, task_uuid: {task_uuid}")
         return
 
@@ -77,53 +89,181 @@ class AgentMemory:
             logger.error("No checkpoint dataclass list available")
             raise ValueError("Checkpoint dataclass list is empty")
 
+    def add_streamed_checkpoint(self, checkpoint) -> CheckPoints:
+        """
+        Maps one streamed checkpoint (a parsed `Checkpoint` or its dict form) to a
+        `CheckPoints` dataclass and appends it to the graph straight away, chained after
+        the previous checkpoint.  Use as the `on_checkpoint` callback of
+        `TaskMaster.stream_web_checkpoint`.
+        """
+        if hasattr(checkpoint, 'model_dump'):
+            checkpoint = checkpoint.model_dump()
+        checkpoint_dataclass = CheckPoints(
+            checkpoint_uuid=str(uuid4()),
+            checkpoint_iterator=checkpoint.get('checkpoint_iter'),
+            checkpoint_description=checkpoint.get('description'),
+            checkpoint_review_criteria=checkpoint.get('review_criteria')
+        )
+        if self.graph_memory.checkpoints is None:
+            self.graph_memory.checkpoints = self.checkpoint_dataclass_list
+        self.graph_memory.add_checkpoint(checkpoint_dataclass)
+        if self.graph_memory.checkpoints is not self.checkpoint_dataclass_list:
+            self.checkpoint_dataclass_list.append(checkpoint_dataclass)
+        logger.info(f"Added streamed checkpoint {checkpoint_dataclass.checkpoint_iterator} "
+                    f"({checkpoint_dataclass.checkpoint_uuid})")
+        return checkpoint_dataclass
+
     def run_function(self, function_handler):
-        logger.info(f"Running function: {function_handler.__name__}")
         try:
-            function_output = self.function_normalizer.normalize(function_handler)
-            self.add_function_to_memory(function_output=function_output)
-            logger.success(f"Successfully executed function: {function_handler.__name__}")
+            with tracer.span('memory.run_function', TraceLevel.INFO, function_name=function_handler.__name__):
+                function_output = self.function_normalizer.normalize(function_handler)(step_uuid=str(uuid4()))
+                self.add_function_to_memory(function_output=function_output)
             return function_output
         except Exception as e:
             logger.error(f"Error running function {function_handler.__name__}: {str(e)}")
             raise
 
     def add_function_to_memory(self, function_output):
-        logger.info("Adding function output to memory")
         try:
-            self.hash_rag.data_for_rag = function_output
-            #self.hash_rag.tester()
-            logger.success("Successfully added function output to memory")
+            with tracer.span('memory.add_function'):
+                self.hash_rag.data_for_rag = function_output
+                self._add_to_rag([function_output])
         except Exception as e:
             logger.error(f"Error adding function to memory: {str(e)}")
             raise
         return
 
+    def start_background_ingestion(self, max_queue_size: int = 1024, batch_size: int = 64,
+                                   max_batch_latency: float = 0.05, put_timeout: float = None):
+        """
+        Routes `add_steps_to_memory` through a `MemoryIngestionPipeline`: steps are queued and a
+        worker thread batches graph inserts and RAG embeddings off the caller's thread.
+        """
+        if self.ingestion_pipeline is None:
+            self.ingestion_pipeline = MemoryIngestionPipeline(
+                memory=self, max_queue_size=max_queue_size, batch_size=batch_size,
+                max_batch_latency=max_batch_latency, put_timeout=put_timeout
+            )
+        self.ingestion_pipeline.start()
+
+    def stop_background_ingestion(self, flush: bool = True, timeout: float = None):
+        if self.ingestion_pipeline is not None:
+            self.ingestion_pipeline.stop(flush=flush, timeout=timeout)
+
+    def flush(self, timeout: float = None) -> bool:
+        """Blocks until queued steps are in the graph and RAG index.  No-op without background ingestion."""
+        if self.ingestion_pipeline is None or not self.ingestion_pipeline.running:
+            return True
+        return self.ingestion_pipeline.flush(timeout=timeout)
+
+    def ingestion_metrics(self) -> dict:
+        return self.ingestion_pipeline.metrics() if self.ingestion_pipeline is not None else {}
+
     def add_steps_to_memory(self, normalised_output, checkpoint_uuid, step_uuid):
-        logger.info(f"Adding steps to memory - Step UUID: {step_uuid}, Checkpoint UUID: {checkpoint_uuid}")
-        try:
+        if self.ingestion_pipeline is not None and self.ingestion_pipeline.running:
             normalised_output.step_uuid = step_uuid
             normalised_output.checkpoint_uuid = checkpoint_uuid
-            self._add_to_graph(step_object=normalised_output)
-            self.add_function_to_memory(function_output=normalised_output)
-            logger.success("Successfully added steps to memory")
+            normalised_output.invalidate_embedding_text()
+            self.ingestion_pipeline.submit(normalised_output)
+            return
+        try:
+            with tracer.span('memory.add_steps', TraceLevel.INFO, step_uuid=step_uuid, checkpoint_uuid=checkpoint_uuid):
+                normalised_output.step_uuid = step_uuid
+                normalised_output.checkpoint_uuid = checkpoint_uuid
+                normalised_output.invalidate_embedding_text()
+                self._add_to_graph(step_object=normalised_output)
+                self.add_function_to_memory(function_output=normalised_output)
         except Exception as e:
             logger.error(f"Error adding steps to memory: {str(e)}")
             raise
         return
 
     def _add_to_graph(self, step_object):
-        logger.debug(f"Adding step object to graph - UUID: {step_object.step_uuid}")
         try:
-            self.graph_memory.add_execution_steps(step_object)
-            logger.success("Successfully added step to graph")
+            with tracer.span('memory.add_to_graph', step_uuid=step_object.step_uuid):
+                self.graph_memory.add_execution_steps(step_object)
         except Exception as e:
             logger.error(f"Error adding step to graph: {str(e)}")
             raise
 
-    def _add_to_rag(self, step_object):
-        logger.debug("Adding to RAG")
-        return
+    def _add_to_rag(self, step_objects):
+        if self.hash_rag.ai_driver is None:
+            return
+        with tracer.span('memory.add_to_rag', steps=len(step_objects)):
+            self.hash_rag.ingest_steps(step_objects)
+
+    @staticmethod
+    def _estimate_tokens(text: str) -> int:
+        return len(text) // 4 + 1
+
+    def _render_step_context(self, step_uuid: str, max_output_chars: int) -> str:
+        attrs = self.graph_memory.graph.nodes[step_uuid]
+        output = str(attrs.get('step_function_function_output'))
+        if len(output) > max_output_chars:
+            output = output[:max_output_chars] + '...'
+        error = attrs.get('step_function_rror')
+        error_text = f" Error: {error.type} - {error.message}" if error else ''
+        return (f"[step {step_uuid}] {attrs.get('step_function_name')} -> {attrs.get('step_function_status')}."
+                f"{error_text} Output: {output}")
+
+    def build_context(self, checkpoint_uuid: str, token_budget: int, rag_k: int = 5,
+                      max_output_chars: int = 2000, token_counter=None) -> MemoryContext:
+        """
+        Assembles "previous function output" context for a checkpoint's prompts.  Steps of the
+        checkpoint and its preceding checkpoints (newest first) are combined with RAG hits for the
+        checkpoint description, deduplicated by step, and packed greedily under `token_budget`.
+
+        Results are memoized per checkpoint and budget until memory changes, so repeated
+        assembly for the same checkpoint is a dictionary lookup.
+        """
+        self.flush()
+        memory_version = (self.graph_memory.version, len(self.hash_rag.dataclass_list))
+        cache_key = (checkpoint_uuid, token_budget, rag_k, max_output_chars)
+        cached = self._context_cache.get(cache_key)
+        if cached is not None and cached[0] == memory_version:
+            return cached[1]
+
+        count_tokens = token_counter or self._estimate_tokens
+        with tracer.span('memory.build_context', TraceLevel.INFO, checkpoint_uuid=checkpoint_uuid):
+            candidates = []
+            for ancestor in self.graph_memory.get_checkpoint_ancestry(checkpoint_uuid):
+                for step_uuid in self.graph_memory.get_checkpoint_steps(ancestor):
+                    candidates.append((step_uuid, None))
+
+            description = self.graph_memory.graph.nodes[checkpoint_uuid].get('checkpoint_description')
+            if description and self.hash_rag.vector_store is not None and self.hash_rag.ai_driver is not None:
+                for index, chunk in self.hash_rag.search(query=description, k=rag_k).items():
+                    candidates.append((str(index), chunk))
+
+            seen = set()
+            sections = []
+            step_uuids = []
+            tokens_used = 0
+            dropped_items = 0
+            for step_uuid, text in candidates:
+                if step_uuid in seen:
+                    continue
+                seen.add(step_uuid)
+                if text is None:
+                    text = self._render_step_context(step_uuid, max_output_chars)
+                tokens = count_tokens(text)
+                if tokens_used + tokens > token_budget:
+                    dropped_items += 1
+                    continue
+                sections.append(text)
+                step_uuids.append(step_uuid)
+                tokens_used += tokens
+
+        context = MemoryContext(
+            checkpoint_uuid=checkpoint_uuid,
+            text='\n'.join(sections),
+            token_budget=token_budget,
+            tokens_used=tokens_used,
+            step_uuids=step_uuids,
+            dropped_items=dropped_items
+        )
+        self._context_cache[cache_key] = (memory_version, context)
+        return context
 
     def get_checkpoint(self):
         logger.info("Getting checkpoint")
@@ -135,13 +275,57 @@ class AgentMemory:
             logger.error(f"Error getting checkpoint: {str(e)}")
             raise
 
+    async def add_steps_to_memory_async(self, normalised_output, checkpoint_uuid, step_uuid):
+        """
+        Awaitable `add_steps_to_memory`.  The write runs on a single memory worker thread so the
+        event loop is never blocked and graph/RAG mutations stay serialised.  With background
+        ingestion the step is queued directly unless the queue is full.
+        """
+        if self.ingestion_pipeline is not None and self.ingestion_pipeline.running:
+            normalised_output.step_uuid = step_uuid
+            normalised_output.checkpoint_uuid = checkpoint_uuid
+            normalised_output.invalidate_embedding_text()
+            if self.ingestion_pipeline.try_submit(normalised_output):
+                return
+        if self._memory_executor is None:
+            self._memory_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='agent-memory')
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self._memory_executor, partial(
+            self.add_steps_to_memory,
+            normalised_output=normalised_output,
+            checkpoint_uuid=checkpoint_uuid,
+            step_uuid=step_uuid
+        ))
+
     def add_to_memory_decorator(self):
         """
         Decorator to add function output to AgentMemory.
         Now properly handles the order of operations for normalization.
+        Coroutine handlers are awaited and written to memory via `add_steps_to_memory_async`.
         """
 
         def decorator(handler: Callable) -> Callable:
+            if inspect.iscoroutinefunction(handler):
+                @wraps(handler)
+                async def async_wrapper(*args: Any, **kwargs: Any) -> Any:
+                    checkpoint_uuid = kwargs.get('checkpoint_uuid')
+                    step_uuid = kwargs.get('step_uuid')
+
+                    output = await handler(*args, **kwargs)
+
+                    if isinstance(output, FunctionExecutionOutput):
+                        if checkpoint_uuid:
+                            output.checkpoint_uuid = checkpoint_uuid
+                        if step_uuid:
+                            output.step_uuid = step_uuid
+
+                        await self.add_steps_to_memory_async(normalised_output=output,
+                                                             checkpoint_uuid=checkpoint_uuid, step_uuid=step_uuid)
+
+                    return output
+
+                return async_wrapper
+
             @wraps(handler)
             def wrapper(*args: Any, **kwargs: Any) -> Any:
                 checkpoint_uuid = kwargs.get('checkpoint_uuid')
@@ -163,7 +347,6 @@ class AgentMemory:
 
         return decorator
 
-
 if __name__ == '__main__':
     logger.info("Starting main execution")
     try:
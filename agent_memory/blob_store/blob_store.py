@@ -0,0 +1,129 @@
+import hashlib
+import pickle
+import reprlib
+import sys
+import tempfile
+import zlib
+from pathlib import Path
+from typing import Any, Optional, Union
+
+from loguru import logger
+
+from agent_memory.data_classes.normalizer_dataclasses import SpilledBlob
+
+
+class BlobStore:
+    """
+    Local, content-addressed store for large step values.  Values are pickled,
+    zlib-compressed and written under `root_dir`; callers keep a `SpilledBlob`
+    handle (preview + summary stats) instead of the value itself.
+    """
+
+    def __init__(self, root_dir: Optional[Union[str, Path]] = None, compression_level: int = 3,
+                 preview_chars: int = 256):
+        self.root_dir = Path(root_dir) if root_dir else Path(tempfile.gettempdir()) / 'agent_memory_blobs'
+        self.root_dir.mkdir(parents=True, exist_ok=True)
+        self.compression_level = compression_level
+        self._repr = reprlib.Repr()
+        self._repr.maxstring = preview_chars
+        self._repr.maxother = preview_chars
+        self.preview_chars = preview_chars
+
+    @staticmethod
+    def estimate_size(obj: Any, limit: Optional[int] = None) -> int:
+        """
+        Cheap size estimate in bytes.  Containers are walked recursively, stopping as soon
+        as `limit` is exceeded so checking a huge value against a threshold stays cheap.
+        """
+        if isinstance(obj, (str, bytes, bytearray, memoryview)):
+            return len(obj)
+        nbytes = getattr(obj, 'nbytes', None)
+        if isinstance(nbytes, int):
+            return nbytes
+        memory_usage = getattr(obj, 'memory_usage', None)
+        if callable(memory_usage):
+            try:
+                usage = memory_usage(deep=True)
+                return int(usage.sum()) if hasattr(usage, 'sum') else int(usage)
+            except Exception:
+                pass
+
+        total = 0
+        stack = [obj]
+        seen = set()
+        while stack:
+            item = stack.pop()
+            if id(item) in seen:
+                continue
+            seen.add(id(item))
+            if isinstance(item, (str, bytes, bytearray)):
+                total += len(item)
+            else:
+                try:
+                    total += sys.getsizeof(item)
+                except TypeError:
+                    pass
+                if isinstance(item, dict):
+                    stack.extend(item.keys())
+                    stack.extend(item.values())
+                elif isinstance(item, (list, tuple, set, frozenset)):
+                    stack.extend(item)
+            if limit is not None and total > limit:
+                break
+        return total
+
+    def _summarise(self, obj: Any, size_bytes: int) -> dict:
+        summary = {'type': type(obj).__name__, 'size_bytes': size_bytes}
+        try:
+            summary['length'] = len(obj)
+        except TypeError:
+            pass
+        shape = getattr(obj, 'shape', None)
+        if shape is not None:
+            summary['shape'] = tuple(shape)
+        return summary
+
+    def _preview(self, obj: Any) -> str:
+        if isinstance(obj, (str, bytes, bytearray)):
+            return repr(obj[:self.preview_chars])
+        return self._repr.repr(obj)
+
+    def _path(self, blob_id: str) -> Path:
+        return self.root_dir / blob_id[:2] / f'{blob_id}.zlib'
+
+    def put(self, obj: Any, size_bytes: Optional[int] = None) -> SpilledBlob:
+        """Spill `obj` to disk and return its handle.  Identical values share one blob."""
+        payload = pickle.dumps(obj, protocol=pickle.HIGHEST_PROTOCOL)
+        blob_id = hashlib.sha256(payload).hexdigest()
+        path = self._path(blob_id)
+        if not path.exists():
+            compressed = zlib.compress(payload, self.compression_level)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_suffix('.tmp')
+            tmp_path.write_bytes(compressed)
+            tmp_path.replace(path)
+            stored_bytes = len(compressed)
+        else:
+            stored_bytes = path.stat().st_size
+        size_bytes = size_bytes if size_bytes is not None else len(payload)
+        logger.debug(f"Spilled {type(obj).__name__} ({size_bytes} bytes) to blob {blob_id[:12]}")
+        return SpilledBlob(
+            blob_id=blob_id,
+            location=str(path),
+            size_bytes=size_bytes,
+            stored_bytes=stored_bytes,
+            preview=self._preview(obj),
+            summary=self._summarise(obj, size_bytes)
+        )
+
+    @staticmethod
+    def read(location: Union[str, Path]) -> Any:
+        return pickle.loads(zlib.decompress(Path(location).read_bytes()))
+
+    def get(self, blob: Union[SpilledBlob, str]) -> Any:
+        """Load a spilled value back from its handle or blob id."""
+        return self.read(blob.location if isinstance(blob, SpilledBlob) else self._path(blob))
+
+    def delete(self, blob: Union[SpilledBlob, str]):
+        path = Path(blob.location) if isinstance(blob, SpilledBlob) else self._path(blob)
+        path.unlink(missing_ok=True)
@@ -0,0 +1,150 @@
+import threading
+from dataclasses import replace
+from typing import Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+from agent_memory.data_classes.cost_dataclasses import CostBudget, CostTotals, ModelPrice
+from agent_memory.data_classes.normalizer_dataclasses import FunctionCost
+
+
+class CostLedger:
+    """
+    Incremental token and cost accounting for a run.  Every recorded step is rolled up
+    into its checkpoint, task and work package as it arrives, so totals and budget
+    checks are dictionary lookups rather than graph walks.
+
+    Scopes are 'checkpoint', 'task' and 'work_package'; the task and work package
+    keys default to the uuids the ledger was created with.  The ledger is safe to
+    share between threads; `totals` returns a snapshot, not the live totals.
+    """
+
+    SCOPES = ('checkpoint', 'task', 'work_package')
+
+    def __init__(self, task_uuid: Optional[str] = None, work_package_uuid: Optional[str] = None,
+                 model_prices: Optional[Dict[str, ModelPrice]] = None,
+                 on_budget_exceeded: Optional[Callable[[str, str, CostTotals, CostBudget], None]] = None):
+        self.task_uuid = task_uuid
+        self.work_package_uuid = work_package_uuid
+        self.model_prices = model_prices or {}
+        self.on_budget_exceeded = on_budget_exceeded
+        self._totals: Dict[Tuple[str, str], CostTotals] = {}
+        self._budgets: Dict[Tuple[str, str], CostBudget] = {}
+        self._exceeded: set = set()
+        self._steps: Dict[str, Tuple[str, List[FunctionCost]]] = {}
+        # re-entrant so `on_budget_exceeded` may read the ledger
+        self._lock = threading.RLock()
+
+    @staticmethod
+    def _copy(totals: CostTotals) -> CostTotals:
+        return replace(totals, tokens_by_model=dict(totals.tokens_by_model))
+
+    def _price(self, item: FunctionCost) -> float:
+        price = self.model_prices.get(item.model)
+        if price is None:
+            return 0.0
+        return ((item.prompt_tokens or 0) * price.prompt + (item.completion_tokens or 0) * price.completion) / 1000
+
+    def _scope_keys(self, checkpoint_uuid: str) -> List[Tuple[str, str]]:
+        keys = [('checkpoint', checkpoint_uuid)]
+        if self.task_uuid:
+            keys.append(('task', self.task_uuid))
+        if self.work_package_uuid:
+            keys.append(('work_package', self.work_package_uuid))
+        return keys
+
+    def _apply(self, checkpoint_uuid: str, costs: List[FunctionCost], sign: int):
+        for key in self._scope_keys(checkpoint_uuid):
+            totals = self._totals.get(key)
+            if totals is None:
+                totals = self._totals[key] = CostTotals()
+            totals.steps += sign
+            for item in costs:
+                total_tokens = item.total_tokens or 0
+                totals.prompt_tokens += sign * (item.prompt_tokens or 0)
+                totals.completion_tokens += sign * (item.completion_tokens or 0)
+                totals.total_tokens += sign * total_tokens
+                totals.cost += sign * self._price(item)
+                model = item.model or 'unknown'
+                totals.tokens_by_model[model] = totals.tokens_by_model.get(model, 0) + sign * total_tokens
+            if sign > 0:
+                self._check_budget(key, totals)
+
+    def _check_budget(self, key: Tuple[str, str], totals: CostTotals):
+        budget = self._budgets.get(key)
+        if budget is None or key in self._exceeded:
+            return
+        if self._over(totals, budget):
+            self._exceeded.add(key)
+            logger.warning(f"Budget exceeded for {key[0]} {key[1]}: {totals.total_tokens} tokens, cost {totals.cost:.4f}")
+            if self.on_budget_exceeded is not None:
+                self.on_budget_exceeded(key[0], key[1], self._copy(totals), budget)
+
+    @staticmethod
+    def _over(totals: CostTotals, budget: CostBudget) -> bool:
+        return ((budget.max_tokens is not None and totals.total_tokens > budget.max_tokens)
+                or (budget.max_cost is not None and totals.cost > budget.max_cost))
+
+    def _key(self, scope: str, key: Optional[str]) -> Tuple[str, str]:
+        if scope not in self.SCOPES:
+            raise ValueError(f"Unknown cost scope '{scope}', expected one of {self.SCOPES}")
+        if key is None:
+            key = self.task_uuid if scope == 'task' else self.work_package_uuid if scope == 'work_package' else None
+        if key is None:
+            raise ValueError(f"A key is required for cost scope '{scope}'")
+        return scope, key
+
+    def record_step(self, step_uuid: str, checkpoint_uuid: str, costs: Optional[List[FunctionCost]]):
+        """Adds a step's cost items to every scope it belongs to.  Re-recording a step replaces it."""
+        costs = costs or []
+        with self._lock:
+            previous = self._steps.get(step_uuid)
+            if previous is not None:
+                self._apply(previous[0], previous[1], sign=-1)
+            self._steps[step_uuid] = (checkpoint_uuid, costs)
+            self._apply(checkpoint_uuid, costs, sign=1)
+
+    def step_costs(self, step_uuid: str) -> List[FunctionCost]:
+        with self._lock:
+            entry = self._steps.get(step_uuid)
+            return list(entry[1]) if entry else []
+
+    def totals(self, scope: str, key: Optional[str] = None) -> CostTotals:
+        scope_key = self._key(scope, key)
+        with self._lock:
+            totals = self._totals.get(scope_key)
+            return self._copy(totals) if totals is not None else CostTotals()
+
+    def set_budget(self, scope: str, key: Optional[str] = None, max_tokens: Optional[int] = None,
+                   max_cost: Optional[float] = None):
+        scope_key = self._key(scope, key)
+        with self._lock:
+            self._budgets[scope_key] = CostBudget(max_tokens=max_tokens, max_cost=max_cost)
+            self._exceeded.discard(scope_key)
+            totals = self._totals.get(scope_key)
+            if totals is not None:
+                self._check_budget(scope_key, totals)
+
+    def remaining(self, scope: str, key: Optional[str] = None) -> Dict[str, Optional[float]]:
+        """Tokens and cost left under the scope's budget (None where no limit is set)."""
+        scope_key = self._key(scope, key)
+        with self._lock:
+            budget = self._budgets.get(scope_key, CostBudget())
+            totals = self._totals.get(scope_key) or CostTotals()
+            return {
+                'tokens': budget.max_tokens - totals.total_tokens if budget.max_tokens is not None else None,
+                'cost': budget.max_cost - totals.cost if budget.max_cost is not None else None,
+            }
+
+    def is_over_budget(self, scope: str, key: Optional[str] = None) -> bool:
+        scope_key = self._key(scope, key)
+        with self._lock:
+            budget = self._budgets.get(scope_key)
+            totals = self._totals.get(scope_key)
+            return budget is not None and totals is not None and self._over(totals, budget)
+
+    def can_spend(self, scope: str, key: Optional[str] = None, tokens: int = 0, cost: float = 0.0) -> bool:
+        """True if an estimated spend still fits the scope's budget; use before choosing a model."""
+        remaining = self.remaining(scope, key)
+        return ((remaining['tokens'] is None or tokens <= remaining['tokens'])
+                and (remaining['cost'] is None or cost <= remaining['cost']))
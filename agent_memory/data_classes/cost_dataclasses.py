@@ -0,0 +1,25 @@
+from dataclasses import dataclass, field
+from typing import Dict, Optional
+
+
+@dataclass(slots=True)
+class CostTotals:
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    cost: float = 0.0
+    steps: int = 0
+    tokens_by_model: Dict[str, int] = field(default_factory=dict)
+
+
+@dataclass(slots=True)
+class CostBudget:
+    max_tokens: Optional[int] = None
+    max_cost: Optional[float] = None
+
+
+@dataclass(slots=True)
+class ModelPrice:
+    """Price in the ledger's currency per 1,000 prompt / completion tokens."""
+    prompt: float
+    completion: float
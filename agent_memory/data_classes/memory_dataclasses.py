@@ -5,4 +5,13 @@ from dataclasses import dataclass, field
 class MemoryParams:
     checkpoint_uuid: str
     step_uuid: str
-    previous_step_uuid: str
\ No newline at end of file
+    previous_step_uuid: str
+
+@dataclass
+class MemoryContext:
+    checkpoint_uuid: str
+    text: str
+    token_budget: int
+    tokens_used: int
+    step_uuids: List[str] = field(default_factory=list)
+    dropped_items: int = 0
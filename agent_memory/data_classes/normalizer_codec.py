@@ -0,0 +1,141 @@
+"""
+Compact msgpack encoding for `FunctionExecutionOutput` records.
+
+Records are packed as positional arrays `[CODEC_VERSION, *field values]` so field
+names are not repeated per record; new fields must be appended, and missing trailing
+fields decode to their defaults.  Objects msgpack cannot represent (pydantic models,
+dataclasses, anything else via `repr`) are reduced to plain data, so decoding those
+outputs is lossy.
+"""
+import dataclasses
+from datetime import datetime, timedelta
+from enum import Enum
+from typing import Any, BinaryIO, Iterable, Iterator
+
+import msgpack
+
+from agent_memory.data_classes.normalizer_dataclasses import (
+    FunctionCost, FunctionError, FunctionExecutionOutput, FunctionProfile, SpilledBlob
+)
+
+CODEC_VERSION = 1
+
+_EXT_DATETIME = 1
+_EXT_TUPLE = 2
+_EXT_COST = 3
+_EXT_ERROR = 4
+_EXT_PROFILE = 5
+_EXT_SPILLED_BLOB = 6
+
+_EPOCH = datetime(1970, 1, 1)
+_MICROSECOND = timedelta(microseconds=1)
+
+_RECORD_FIELDS = tuple(f for f in dataclasses.fields(FunctionExecutionOutput) if f.init)
+_RECORD_FIELD_NAMES = tuple(f.name for f in _RECORD_FIELDS)
+# Timestamps sit at fixed positions, so they are packed as plain integers (microseconds since epoch)
+_TIMESTAMP_FIELDS = ('execution_start', 'execution_end')
+_TIMESTAMP_POSITIONS = tuple(_RECORD_FIELD_NAMES.index(name) + 1 for name in _TIMESTAMP_FIELDS)
+_NESTED_TYPES = {
+    _EXT_COST: FunctionCost,
+    _EXT_ERROR: FunctionError,
+    _EXT_PROFILE: FunctionProfile,
+    _EXT_SPILLED_BLOB: SpilledBlob,
+}
+_NESTED_CODES = {nested_type: code for code, nested_type in _NESTED_TYPES.items()}
+
+
+def _default(obj: Any) -> Any:
+    nested_code = _NESTED_CODES.get(type(obj))
+    if nested_code is not None:
+        values = [getattr(obj, f.name) for f in dataclasses.fields(obj)]
+        return msgpack.ExtType(nested_code, _pack(values))
+    if isinstance(obj, datetime):
+        if obj.tzinfo is not None:
+            return obj.isoformat()
+        return msgpack.ExtType(_EXT_DATETIME, _pack((obj - _EPOCH) // _MICROSECOND))
+    if isinstance(obj, tuple):
+        return msgpack.ExtType(_EXT_TUPLE, _pack(list(obj)))
+    if isinstance(obj, dict):
+        return dict(obj)
+    if isinstance(obj, (list, set, frozenset)):
+        return list(obj)
+    if isinstance(obj, Enum):
+        return obj.value
+    for base in (bool, int, float, str, bytes):
+        if isinstance(obj, base):
+            return base(obj)
+    if hasattr(obj, 'model_dump'):
+        return obj.model_dump()
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return {f.name: getattr(obj, f.name) for f in dataclasses.fields(obj)}
+    return repr(obj)
+
+
+def _ext_hook(code: int, data: bytes) -> Any:
+    if code == _EXT_DATETIME:
+        return _EPOCH + _unpack(data) * _MICROSECOND
+    if code == _EXT_TUPLE:
+        return tuple(_unpack(data))
+    nested_type = _NESTED_TYPES.get(code)
+    if nested_type is not None:
+        return nested_type(*_unpack(data))
+    return msgpack.ExtType(code, data)
+
+
+def _pack(obj: Any) -> bytes:
+    return msgpack.packb(obj, default=_default, strict_types=True, use_bin_type=True)
+
+
+def _unpack(data: bytes) -> Any:
+    return msgpack.unpackb(data, ext_hook=_ext_hook, raw=False, strict_map_key=False)
+
+
+def _record_values(record: FunctionExecutionOutput) -> list:
+    values = [CODEC_VERSION]
+    values.extend(getattr(record, name) for name in _RECORD_FIELD_NAMES)
+    for position in _TIMESTAMP_POSITIONS:
+        timestamp = values[position]
+        if isinstance(timestamp, datetime) and timestamp.tzinfo is None:
+            values[position] = (timestamp - _EPOCH) // _MICROSECOND
+    return values
+
+
+def _record_from_values(values: list) -> FunctionExecutionOutput:
+    version = values[0]
+    if version > CODEC_VERSION:
+        raise ValueError(f"Unsupported FunctionExecutionOutput codec version {version} (max {CODEC_VERSION})")
+    for position in _TIMESTAMP_POSITIONS:
+        if position < len(values) and isinstance(values[position], int):
+            values[position] = _EPOCH + values[position] * _MICROSECOND
+    kwargs = dict(zip(_RECORD_FIELD_NAMES, values[1:]))
+    if kwargs.get('args_provided') is None:
+        kwargs['args_provided'] = {}
+    return FunctionExecutionOutput(**kwargs)
+
+
+def encode_execution_output(record: FunctionExecutionOutput) -> bytes:
+    """Encode a single record to msgpack bytes."""
+    return _pack(_record_values(record))
+
+
+def decode_execution_output(data: bytes) -> FunctionExecutionOutput:
+    """Decode bytes produced by `encode_execution_output`."""
+    return _record_from_values(_unpack(data))
+
+
+def write_execution_outputs(records: Iterable[FunctionExecutionOutput], stream: BinaryIO) -> int:
+    """Append records to a binary stream back to back; returns the number of bytes written."""
+    packer = msgpack.Packer(default=_default, strict_types=True, use_bin_type=True)
+    written = 0
+    for record in records:
+        chunk = packer.pack(_record_values(record))
+        stream.write(chunk)
+        written += len(chunk)
+    return written
+
+
+def iter_execution_outputs(stream: BinaryIO) -> Iterator[FunctionExecutionOutput]:
+    """Lazily decode records written by `write_execution_outputs`."""
+    unpacker = msgpack.Unpacker(stream, ext_hook=_ext_hook, raw=False, strict_map_key=False)
+    for values in unpacker:
+        yield _record_from_values(values)
@@ -1,4 +1,4 @@
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, fields
 from typing import Any, Dict, Optional, Union, List
 from datetime import datetime
 import uuid
@@ -9,18 +9,47 @@ class FunctionType(Enum):
     DATA_PROCESSING = "data_processing"
     PROCESSED_DATA = "processed_data"
 
-@dataclass
+def _as_dict(instance) -> Dict[str, Any]:
+    """Shallow field dictionary for slotted dataclasses, which have no `__dict__` for `vars()`."""
+    return {f.name: getattr(instance, f.name) for f in fields(instance)}
+
+@dataclass(slots=True)
 class FunctionCost:
     completion_tokens: Optional[int] = None
     prompt_tokens: Optional[int] = None
     total_tokens: Optional[int] = None
+    model: Optional[str] = None
 
-@dataclass
+@dataclass(slots=True)
 class FunctionError:
     type: str
     message: str
 
-@dataclass
+@dataclass(slots=True)
+class FunctionProfile:
+    duration_ns: int
+    cpu_time_ns: int
+    peak_memory_bytes: Optional[int] = None
+    stack_samples: Optional[Dict[str, int]] = None
+
+@dataclass(slots=True)
+class SpilledBlob:
+    """Handle left in place of a step value that was spilled to the `BlobStore`."""
+    blob_id: str
+    location: str
+    size_bytes: int
+    stored_bytes: int
+    preview: str
+    summary: Dict[str, Any] = field(default_factory=dict)
+
+    def load(self) -> Any:
+        from agent_memory.blob_store.blob_store import BlobStore
+        return BlobStore.read(self.location)
+
+    def __str__(self) -> str:
+        return f"<spilled {self.summary.get('type', 'value')} {self.size_bytes} bytes: {self.preview}>"
+
+@dataclass(slots=True)
 class FunctionExecutionOutput:
     function_name: str
     function_signature: str
@@ -42,7 +71,7 @@ class FunctionExecutionOutput:
     status: str  # 'pending', 'success', 'error'
     function_output: Optional[Any] = None
     error: Optional[FunctionError] = None
-    cost: Optional[Union[Dict, List[Dict]]] = None
+    cost: Optional[List[FunctionCost]] = None
 
     # Output characteristics
     function_output_type: Optional[str] = None
@@ -51,9 +80,25 @@ class FunctionExecutionOutput:
     has_markdown: bool = False
     iteration_count: Optional[int] = None
 
+    # Streamed outputs (filled in once the consumer drains the stream)
+    is_streaming: bool = False
+    stream_completed: bool = False
+    stream_size: Optional[int] = None
+    stream_duration: Optional[float] = None
+
+    # Resource profile (only when the normalizer runs with profiling enabled)
+    profile: Optional[FunctionProfile] = None
+
     # Arguments provided
     args_provided: Dict[str, Any] = field(default_factory=dict)
 
+    # Set when the normalizer could not build the full record and fell back to a minimal one
+    degraded: bool = False
+    degraded_reason: Optional[FunctionError] = None
+
+    # Lazily built by to_embedding_text(), see invalidate_embedding_text()
+    _embedding_text: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+
     def to_dict(self) -> Dict[str, Any]:
         """Convert the dataclass to a dictionary format."""
         return {
@@ -66,16 +111,46 @@ class FunctionExecutionOutput:
             'checkpoint_uuid': self.checkpoint_uuid,
             'status': self.status,
             'function_output': self.function_output,
-            'error': vars(self.error) if self.error else None,
-            'cost': vars(self.cost) if self.cost else None,
+            'error': _as_dict(self.error) if self.error else None,
+            'cost': [_as_dict(item) for item in self.cost] if self.cost else None,
             'function_output_type': self.function_output_type,
             'has_iter': self.has_iter,
             'is_empty': self.is_empty,
             'has_markdown': self.has_markdown,
             'iteration_count': self.iteration_count,
-            'args_provided': self.args_provided
+            'is_streaming': self.is_streaming,
+            'stream_completed': self.stream_completed,
+            'stream_size': self.stream_size,
+            'stream_duration': self.stream_duration,
+            'profile': _as_dict(self.profile) if self.profile else None,
+            'args_provided': self.args_provided,
+            'degraded': self.degraded,
+            'degraded_reason': _as_dict(self.degraded_reason) if self.degraded_reason else None
         }
 
+    def update_from_stream(self, stream) -> None:
+        """Copy the statistics of a drained `StreamingOutput` onto this record."""
+        self.iteration_count = stream.iteration_count
+        self.stream_completed = stream.completed
+        self.stream_size = stream.size_bytes
+        self.stream_duration = stream.duration
+        self.is_empty = stream.iteration_count == 0
+        if stream.error is not None and self.error is None:
+            self.status = 'error'
+            self.error = FunctionError(type=type(stream.error).__name__, message=str(stream.error))
+        self._embedding_text = None
+
+    def to_bytes(self) -> bytes:
+        """Compact msgpack encoding, see `normalizer_codec`."""
+        from agent_memory.data_classes.normalizer_codec import encode_execution_output
+        return encode_execution_output(self)
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> 'FunctionExecutionOutput':
+        """Decode a record produced by `to_bytes`."""
+        from agent_memory.data_classes.normalizer_codec import decode_execution_output
+        return decode_execution_output(data)
+
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'FunctionExecutionOutput':
         """Create a FunctionExecutionOutput instance from a dictionary."""
@@ -87,16 +162,32 @@ class FunctionExecutionOutput:
         if data.get('error'):
             data['error'] = FunctionError(**data['error'])
 
-        # Convert cost dict to FunctionCost if present
+        # Convert cost dicts to FunctionCost if present
         if data.get('cost'):
-            data['cost'] = FunctionCost(**data['cost'])
+            cost = data['cost'] if isinstance(data['cost'], list) else [data['cost']]
+            data['cost'] = [FunctionCost(**item) for item in cost]
+
+        if data.get('profile'):
+            data['profile'] = FunctionProfile(**data['profile'])
+
+        if data.get('degraded_reason'):
+            data['degraded_reason'] = FunctionError(**data['degraded_reason'])
 
         return cls(**data)
 
+    def invalidate_embedding_text(self) -> None:
+        """Drop the cached embedding text; call after mutating a field that appears in it."""
+        self._embedding_text = None
+
     def to_embedding_text(self) -> str:
-        """Generate a rich text representation for embedding."""
+        """Generate a rich text representation for embedding.  Built once and cached."""
+        if self._embedding_text is None:
+            self._embedding_text = self._build_embedding_text()
+        return self._embedding_text
+
+    def _build_embedding_text(self) -> str:
         error_text = f"Error: {self.error.type} - {self.error.message}" if self.error else "No errors"
-        cost_text = f"Tokens used: {self.cost.total_tokens}" if self.cost else "No cost data"
+        cost_text = f"Tokens used: {sum(item.total_tokens or 0 for item in self.cost)}" if self.cost else "No cost data"
 
         return f"""
                         Function execution: {self.function_name}{self.function_signature}
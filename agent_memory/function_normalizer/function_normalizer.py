@@ -1,9 +1,18 @@
 from typing import Callable, Any, Dict, Optional, Tuple, Union, List
 from datetime import datetime
+import asyncio
 import inspect
+import threading
+import time
 from functools import wraps
 from agent_memory.data_classes.normalizer_dataclasses import *
+from agent_memory.function_normalizer.streaming_output import StreamingOutput
+from agent_memory.function_normalizer.step_profiler import StepProfiler
+from agent_memory.blob_store.blob_store import BlobStore
 from loguru import logger
+from tracing.tracer import TraceLevel, get_tracer
+
+tracer = get_tracer('function_normalizer')
 
 class FunctionOutputNormalizer:
     """
@@ -11,12 +20,26 @@ class FunctionOutputNormalizer:
     structured information about the function's execution and results.
     """
 
+    counters: Dict[str, int] = {'calls': 0, 'errors': 0, 'fallback': 0, 'spilled': 0}
+    # steps run concurrently (threads and the async wrapper), so counters change under this lock
+    _counters_lock = threading.Lock()
+
+    # Profiling is opt-in: per decorator via normalize(profile=True) or globally here.
+    profile_steps: bool = False
+    profile_trace_memory: bool = True
+    profile_stack_sample_interval: Optional[float] = None
+
+    # Values larger than spill_threshold_bytes are moved to blob_store (disabled while None).
+    spill_threshold_bytes: Optional[int] = None
+    blob_store: Optional[BlobStore] = None
+
     @staticmethod
     def _get_iteration_count(output: Any) -> Optional[int]:
         """
         Gets the iteration count by examining containers for content length.  Handles
         more cases and provides more robust iteration counting.  Uses `isinstance`
-        checks *before* attempting attribute access for improved safety.
+        checks *before* attempting attribute access for improved safety.  One-shot
+        iterators are never consumed here; streamed outputs report their count once drained.
         """
         if isinstance(output, (list, tuple, set, dict)):
             return len(output)
@@ -27,11 +50,8 @@ class FunctionOutputNormalizer:
                 return len(output)
             except TypeError:
                 return None
-        elif hasattr(output, '__iter__'):
-            try:
-                return sum(1 for _ in output)
-            except TypeError:
-                return None
+        elif isinstance(output, StreamingOutput):
+            return output.iteration_count if output.duration is not None else None
         return None
 
     @staticmethod
@@ -78,6 +98,35 @@ class FunctionOutputNormalizer:
 
         return output_only, cost_data
 
+    @staticmethod
+    def _to_function_costs(cost: Any) -> Optional[List[FunctionCost]]:
+        """
+        Converts extracted cost data (a usage dict, a list of them, or usage objects with
+        token attributes) into `FunctionCost` items carrying the model name when known.
+        """
+        if cost is None:
+            return None
+        items = cost if isinstance(cost, (list, tuple)) else [cost]
+        function_costs = []
+        for item in items:
+            if isinstance(item, FunctionCost):
+                function_costs.append(item)
+            elif isinstance(item, dict):
+                function_costs.append(FunctionCost(
+                    completion_tokens=item.get('completion_tokens'),
+                    prompt_tokens=item.get('prompt_tokens'),
+                    total_tokens=item.get('total_tokens'),
+                    model=item.get('model')
+                ))
+            elif hasattr(item, 'total_tokens'):
+                function_costs.append(FunctionCost(
+                    completion_tokens=getattr(item, 'completion_tokens', None),
+                    prompt_tokens=getattr(item, 'prompt_tokens', None),
+                    total_tokens=getattr(item, 'total_tokens', None),
+                    model=getattr(item, 'model', None)
+                ))
+        return function_costs or None
+
     @staticmethod
     def _is_markdown(output: Any) -> bool:
         """
@@ -87,154 +136,262 @@ class FunctionOutputNormalizer:
         return isinstance(output, dict) and any(key in markdown_keys for key in output)
 
     @classmethod
-    def _normalise_function_output(cls, handler: Callable, *args, **kwargs) -> Dict[str, Any]:
-        """
-        Normalizes function output (internal method).  This is the lower-level
-        normalization, returning a dictionary.
-        """
-        start_time = datetime.now()
-        return_obj = {
-            'function_name': handler.__name__,
-            'function_signature': str(inspect.signature(handler)),
-            'execution_start': start_time.isoformat(),
-            'args_provided': {
-                'args': args,
-                'kwargs': kwargs
-            },
-            'status': 'pending',
-            'error': None,
-        }
+    def get_counters(cls) -> Dict[str, int]:
+        """
+        Returns a snapshot of the normalizer counters.  `fallback` counts how often
+        building the `FunctionExecutionOutput` failed and a degraded record was
+        returned instead.
+        """
+        with cls._counters_lock:
+            return dict(cls.counters)
 
-        try:
-            raw_output = handler(*args, **kwargs)
-            output, cost = cls._extract_cost(raw_output)
-
-            return_obj.update({
-                'status': 'success',
-                'function_output': output,
-                'cost': cost,
-                'function_output_type': type(output).__name__ if output is not None else 'NoneType',
-                'has_iter': hasattr(output, '__iter__') and not isinstance(output, (str, bytes)),
-                'is_empty': output is None or (isinstance(output, (list, tuple, dict, str)) and len(output) == 0),
-                'has_markdown': cls._is_markdown(output),
-            })
-
-            iteration_count = cls._get_iteration_count(output)
-            if iteration_count is not None:
-                return_obj['iteration_count'] = iteration_count
+    @classmethod
+    def reset_counters(cls):
+        with cls._counters_lock:
+            for key in cls.counters:
+                cls.counters[key] = 0
+
+    @classmethod
+    def _increment(cls, name: str):
+        with cls._counters_lock:
+            cls.counters[name] += 1
 
+    @classmethod
+    def configure_spilling(cls, threshold_bytes: Optional[int], blob_store: Optional[BlobStore] = None,
+                           root_dir: Optional[str] = None):
+        """
+        Enables size-aware spilling: step outputs and individual arguments estimated above
+        `threshold_bytes` are written to a compressed `BlobStore` and replaced on the record by
+        a `SpilledBlob` handle.  Pass `threshold_bytes=None` to disable.
+        """
+        cls.spill_threshold_bytes = threshold_bytes
+        if threshold_bytes is not None:
+            cls.blob_store = blob_store or cls.blob_store or BlobStore(root_dir=root_dir)
+
+    @classmethod
+    def _spill_if_large(cls, value: Any) -> Any:
+        if value is None or isinstance(value, (StreamingOutput, SpilledBlob, bool, int, float)):
+            return value
+        threshold = cls.spill_threshold_bytes
+        size_bytes = BlobStore.estimate_size(value, limit=threshold)
+        if size_bytes <= threshold:
+            return value
+        try:
+            blob = cls.blob_store.put(value)
         except Exception as e:
-            logger.exception("Error during function execution: %s", e)
-            return_obj.update({
-                'status': 'error',
-                'error': {
-                    'type': type(e).__name__,
-                    'message': str(e)
-                },
-                'function_output': None
-            })
-
-        finally:
-            end_time = datetime.now()
-            return_obj.update({
-                'execution_end': end_time.isoformat(),
-                'execution_duration': (end_time - start_time).total_seconds()
-            })
+            logger.warning(f"Could not spill {type(value).__name__} ({size_bytes} bytes), keeping it in memory: {e}")
+            return value
+        cls._increment('spilled')
+        return blob
+
+    @classmethod
+    def _spill_large_values(cls, function_execution_output: FunctionExecutionOutput):
+        """Replaces oversized output and argument values on the record with `SpilledBlob` handles."""
+        function_execution_output.function_output = cls._spill_if_large(function_execution_output.function_output)
+        args_provided = function_execution_output.args_provided
+        args_provided['args'] = tuple(cls._spill_if_large(value) for value in args_provided['args'])
+        args_provided['kwargs'] = {key: cls._spill_if_large(value) for key, value in args_provided['kwargs'].items()}
+
+    @classmethod
+    def _build_degraded_output(cls, func: Callable, args: tuple, kwargs: dict, output: Any, cost: Any,
+                               status: str, error: Optional[FunctionError], start_time: datetime,
+                               end_time: datetime, execution_duration: float, step_uuid: str,
+                               checkpoint_uuid: str, previous_step_uuid: str,
+                               build_error: Exception) -> FunctionExecutionOutput:
+        """
+        Builds a minimal `FunctionExecutionOutput`, marked `degraded`, from values already
+        captured by `normalize`, so memory and the cost ledger still record the step.  Every
+        derived field is best effort.  The handler is never called again, so side effects and
+        model costs are not repeated.
+        """
+        cls._increment('fallback')
+        return_obj = FunctionExecutionOutput(
+            function_name=getattr(func, '__name__', repr(func)),
+            function_signature='',
+            function_type=None,
+            reasoning=None,
+            data_processing=None,
+            processed_data=None,
+            execution_start=start_time,
+            execution_end=end_time,
+            execution_duration=execution_duration,
+            step_uuid=step_uuid,
+            checkpoint_uuid=checkpoint_uuid,
+            previous_step_uuid=previous_step_uuid,
+            status=status,
+            function_output=output,
+            error=error,
+            args_provided={'args': args, 'kwargs': kwargs},
+            degraded=True,
+            degraded_reason=FunctionError(type=type(build_error).__name__, message=str(build_error))
+        )
+        try:
+            return_obj.function_signature = str(inspect.signature(func))
+        except (TypeError, ValueError):
+            pass
+        try:
+            return_obj.cost = cls._to_function_costs(cost)
+        except Exception:
+            pass
 
+        if status == 'success':
+            try:
+                return_obj.function_output_type = type(output).__name__ if output is not None else 'NoneType'
+                return_obj.has_iter = hasattr(output, '__iter__') and not isinstance(output, (str, bytes))
+                return_obj.is_empty = output is None or (isinstance(output, (list, tuple, dict, str))
+                                                         and len(output) == 0)
+                return_obj.has_markdown = cls._is_markdown(output)
+            except Exception:
+                pass
         return return_obj
 
     @classmethod
-    def normalize(cls, handler=None):
+    def _build_execution_output(cls, func: Callable, args: tuple, kwargs: dict, output: Any, cost: Any,
+                                status: str, error: Optional[FunctionError], start_time: datetime,
+                                end_time: datetime, execution_duration: float, step_uuid: str,
+                                checkpoint_uuid: str, previous_step_uuid: str, function_label: Optional[str],
+                                profile: Optional[FunctionProfile] = None) -> FunctionExecutionOutput:
+        """
+        Builds the `FunctionExecutionOutput` for an already executed handler, falling back to
+        a minimal record marked `degraded` if construction fails.  Shared by the sync and async wrappers.
+        """
+        try:
+            cost_data = cls._to_function_costs(cost)
+            function_execution_output = FunctionExecutionOutput(
+                step_uuid=step_uuid,
+                checkpoint_uuid=checkpoint_uuid,
+                previous_step_uuid=previous_step_uuid,
+                function_type=function_label,
+                reasoning=None,
+                data_processing=None,
+                processed_data=None,
+                function_name=func.__name__,
+                function_signature=str(inspect.signature(func)),
+                execution_start=start_time,
+                execution_end=end_time,
+                execution_duration=execution_duration,
+                status=status,
+                function_output=output,
+                error=error,
+                cost=cost_data,
+                function_output_type=output.source_type if isinstance(output, StreamingOutput)
+                else type(output).__name__ if output is not None else 'NoneType',
+                has_iter=hasattr(output, '__iter__') and not isinstance(output, (str, bytes)),
+                is_empty=output is None or (isinstance(output, (list, tuple, dict, str)) and len(output) == 0),
+                has_markdown=cls._is_markdown(output),
+                iteration_count=cls._get_iteration_count(output),
+                args_provided={'args': args, 'kwargs': kwargs},
+                is_streaming=isinstance(output, StreamingOutput),
+                profile=profile
+            )
+            if function_execution_output.is_streaming:
+                output.add_done_callback(function_execution_output.update_from_stream)
+            def _get_reasoning():
+                function_execution_output.reasoning = output.action_type_reason
+
+            def _get_data_processing():
+                function_execution_output.data_processing = 'data_processing'
+
+            def _get_processed_data():
+                function_execution_output.processed_data = 'processed_data'
+
+            function_type_mapper = {
+             "reasoning": _get_reasoning,
+            "data_processing": _get_data_processing,
+            "processed_data": _get_processed_data,
+            }
+            if function_label in function_type_mapper:
+                function_type_mapper[function_label]()
+
+            if cls.spill_threshold_bytes is not None:
+                cls._spill_large_values(function_execution_output)
+
+            tracer.event(TraceLevel.DEBUG, 'normalizer.step', lambda: repr(function_execution_output),
+                         function_name=function_execution_output.function_name,
+                         status=status, duration=execution_duration)
+
+            return function_execution_output
+        except Exception as e:
+            logger.exception(f"Error creating FunctionExecutionOutput: {e}")
+            return cls._build_degraded_output(
+                func=func, args=args, kwargs=kwargs, output=output, cost=cost, status=status,
+                error=error, start_time=start_time, end_time=end_time,
+                execution_duration=execution_duration, step_uuid=step_uuid, checkpoint_uuid=checkpoint_uuid,
+                previous_step_uuid=previous_step_uuid, build_error=e
+            )
+
+    @classmethod
+    def _profiler(cls, profile: Optional[bool], stack_sample_interval: Optional[float]) -> Optional[StepProfiler]:
+        if not (cls.profile_steps if profile is None else profile):
+            return None
+        return StepProfiler(
+            trace_memory=cls.profile_trace_memory,
+            stack_sample_interval=stack_sample_interval or cls.profile_stack_sample_interval
+        )
+
+    @classmethod
+    def normalize(cls, handler=None, profile: Optional[bool] = None, stack_sample_interval: Optional[float] = None):
         """
         Decorator that normalizes function output. Can be used with or without parameters.
+        Coroutine functions get an async wrapper that awaits the handler and times it with
+        the event loop clock.
 
         Args:
             handler: The function to be decorated (when used without parameters)
+            profile: Record a `FunctionProfile` (perf_counter_ns, CPU time, tracemalloc peak)
+                for each call.  Defaults to `FunctionOutputNormalizer.profile_steps`
+            stack_sample_interval: Seconds between stack samples while profiling, None to disable
             step_uuid: Optional step UUID for tracking
             checkpoint_uuid: Optional checkpoint UUID for tracking
         """
 
         def decorator(func: Callable) -> Callable:
+            if inspect.iscoroutinefunction(func):
+                return cls._async_wrapper(func, profile=profile, stack_sample_interval=stack_sample_interval)
+
             @wraps(func)
             def wrapper(*args: Any, **kwargs: Any) -> FunctionExecutionOutput:
+                profiler = cls._profiler(profile, stack_sample_interval)
                 start_time = datetime.now()
+                start_ns = time.perf_counter_ns()
                 output: Any = None
-                cost_data: Optional[FunctionCost] = None
+                cost: Any = None
                 error: Optional[FunctionError] = None
                 status: str = 'pending'
                 step_uuid = kwargs.pop('step_uuid', '')
                 checkpoint_uuid = kwargs.pop('checkpoint_uuid', '')
                 previous_step_uuid = kwargs.pop('previous_step_uuid', '')
+                function_label = getattr(func, 'function_type_label', None)
+                cls._increment('calls')
 
                 try:
-                    raw_output = func(*args, **kwargs)
-                    output, cost = cls._extract_cost(raw_output)
-
-                    if hasattr(func, 'function_type_label'):
-                        function_label = func.function_type_label
-
-                    if cost:
-                        cost = cost
+                    if profiler is not None:
+                        with profiler:
+                            raw_output = func(*args, **kwargs)
                     else:
-                        cost = None
+                        raw_output = func(*args, **kwargs)
+                    output, cost = cls._extract_cost(raw_output)
+                    if StreamingOutput.is_stream(output):
+                        output = StreamingOutput(output)
                     status = 'success'
 
                 except Exception as e:
                     logger.exception(f"Error during function execution: {e}")
+                    cls._increment('errors')
                     status = 'error'
                     error = FunctionError(type=type(e).__name__, message=str(e))
 
                 finally:
+                    execution_duration = (time.perf_counter_ns() - start_ns) / 1e9
                     end_time = datetime.now()
-                    execution_duration = (end_time - start_time).total_seconds()
 
-                try:
-                    function_execution_output = FunctionExecutionOutput(
-                        step_uuid=step_uuid,
-                        checkpoint_uuid=checkpoint_uuid,
-                        previous_step_uuid=previous_step_uuid,
-                        function_type=function_label,
-                        reasoning=None,
-                        data_processing=None,
-                        processed_data=None,
-                        function_name=func.__name__,
-                        function_signature=str(inspect.signature(func)),
-                        execution_start=start_time,
-                        execution_end=end_time,
-                        execution_duration=execution_duration,
-                        status=status,
-                        function_output=output,
-                        error=error,
-                        cost=cost_data,
-                        function_output_type=type(output).__name__ if output is not None else 'NoneType',
-                        has_iter=hasattr(output, '__iter__') and not isinstance(output, (str, bytes)),
-                        is_empty=output is None or (isinstance(output, (list, tuple, dict, str)) and len(output) == 0),
-                        has_markdown=cls._is_markdown(output),
-                        iteration_count=cls._get_iteration_count(output),
-                        args_provided={'args': args, 'kwargs': kwargs}
-                    )
-                    print(function_execution_output)
-                    def _get_reasoning():
-                        function_execution_output.reasoning = output.action_type_reason
-
-                    def _get_data_processing():
-                        function_execution_output.data_processing = 'data_processing'
-
-                    def _get_processed_data():
-                        function_execution_output.processed_data = 'processed_data'
-
-                    function_type_mapper = {
-                     "reasoning": _get_reasoning,
-                    "data_processing": _get_data_processing,
-                    "processed_data": _get_processed_data,
-                    }
-                    if function_label in function_type_mapper:
-                        function_type_mapper[function_label]()
-
-                    return function_execution_output
-                except Exception as e:
-                    logger.exception(f"Error creating FunctionExecutionOutput: {e}")
-                    return cls._normalise_function_output(func, *args, **kwargs)
+                return cls._build_execution_output(
+                    func=func, args=args, kwargs=kwargs, output=output, cost=cost, status=status, error=error,
+                    start_time=start_time, end_time=end_time, execution_duration=execution_duration,
+                    step_uuid=step_uuid, checkpoint_uuid=checkpoint_uuid,
+                    previous_step_uuid=previous_step_uuid, function_label=function_label,
+                    profile=profiler.profile if profiler is not None else None
+                )
 
             return wrapper
 
@@ -242,4 +399,57 @@ class FunctionOutputNormalizer:
             return decorator
         return decorator(handler)
 
+    @classmethod
+    def _async_wrapper(cls, func: Callable, profile: Optional[bool] = None,
+                       stack_sample_interval: Optional[float] = None) -> Callable:
+        """
+        Coroutine-aware counterpart of the `normalize` wrapper.  The handler is awaited,
+        so the coroutine result (not the coroutine object) is recorded.
+        """
+
+        @wraps(func)
+        async def wrapper(*args: Any, **kwargs: Any) -> FunctionExecutionOutput:
+            loop = asyncio.get_running_loop()
+            profiler = cls._profiler(profile, stack_sample_interval)
+            start_time = datetime.now()
+            start_clock = loop.time()
+            output: Any = None
+            cost: Any = None
+            error: Optional[FunctionError] = None
+            status: str = 'pending'
+            step_uuid = kwargs.pop('step_uuid', '')
+            checkpoint_uuid = kwargs.pop('checkpoint_uuid', '')
+            previous_step_uuid = kwargs.pop('previous_step_uuid', '')
+            function_label = getattr(func, 'function_type_label', None)
+            cls._increment('calls')
 
+            try:
+                if profiler is not None:
+                    with profiler:
+                        raw_output = await func(*args, **kwargs)
+                else:
+                    raw_output = await func(*args, **kwargs)
+                output, cost = cls._extract_cost(raw_output)
+                if StreamingOutput.is_stream(output):
+                    output = StreamingOutput(output)
+                status = 'success'
+
+            except Exception as e:
+                logger.exception(f"Error during async function execution: {e}")
+                cls._increment('errors')
+                status = 'error'
+                error = FunctionError(type=type(e).__name__, message=str(e))
+
+            finally:
+                execution_duration = loop.time() - start_clock
+                end_time = datetime.now()
+
+            return cls._build_execution_output(
+                func=func, args=args, kwargs=kwargs, output=output, cost=cost, status=status, error=error,
+                start_time=start_time, end_time=end_time, execution_duration=execution_duration,
+                step_uuid=step_uuid, checkpoint_uuid=checkpoint_uuid,
+                previous_step_uuid=previous_step_uuid, function_label=function_label,
+                profile=profiler.profile if profiler is not None else None
+            )
+
+        return wrapper
@@ -0,0 +1,100 @@
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from typing import Optional
+
+from agent_memory.data_classes.normalizer_dataclasses import FunctionProfile
+
+
+class _StackSampler(threading.Thread):
+    """
+    Daemon thread that periodically captures the stack of a target thread and counts
+    collapsed stacks ("outer;inner;leaf"), the format flamegraph tools consume.
+    """
+
+    def __init__(self, target_thread_id: int, interval: float, max_depth: int):
+        super().__init__(name='step-stack-sampler', daemon=True)
+        self.target_thread_id = target_thread_id
+        self.interval = interval
+        self.max_depth = max_depth
+        self.samples: Counter = Counter()
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            frame = sys._current_frames().get(self.target_thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < self.max_depth:
+                code = frame.f_code
+                stack.append(f"{code.co_filename.rsplit('/', 1)[-1]}:{code.co_name}:{frame.f_lineno}")
+                frame = frame.f_back
+            self.samples[';'.join(reversed(stack))] += 1
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+
+
+class StepProfiler:
+    """
+    Context manager that profiles a single step: `perf_counter_ns` duration, CPU time of
+    the calling thread, peak traced memory and, optionally, a sampled stack profile.
+
+    tracemalloc is process wide, so peaks of concurrently profiled steps (threads or
+    asyncio tasks) overlap, and nested profilers reset the outer peak.  CPU time is
+    per-thread, so for coroutines it includes other tasks run by the same loop.
+    """
+
+    def __init__(self, trace_memory: bool = True, stack_sample_interval: Optional[float] = None,
+                 max_stack_depth: int = 32):
+        self.trace_memory = trace_memory
+        self.stack_sample_interval = stack_sample_interval
+        self.max_stack_depth = max_stack_depth
+        self.profile: Optional[FunctionProfile] = None
+        self._started_tracing = False
+        self._memory_baseline = 0
+        self._sampler: Optional[_StackSampler] = None
+        self._start_ns = 0
+        self._cpu_start_ns = 0
+
+    def __enter__(self) -> 'StepProfiler':
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self._started_tracing = True
+            else:
+                tracemalloc.reset_peak()
+            self._memory_baseline = tracemalloc.get_traced_memory()[0]
+        if self.stack_sample_interval:
+            self._sampler = _StackSampler(threading.get_ident(), self.stack_sample_interval, self.max_stack_depth)
+            self._sampler.start()
+        self._cpu_start_ns = time.thread_time_ns()
+        self._start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> bool:
+        duration_ns = time.perf_counter_ns() - self._start_ns
+        cpu_time_ns = time.thread_time_ns() - self._cpu_start_ns
+
+        peak_memory_bytes = None
+        if self.trace_memory:
+            peak_memory_bytes = max(tracemalloc.get_traced_memory()[1] - self._memory_baseline, 0)
+            if self._started_tracing:
+                tracemalloc.stop()
+
+        stack_samples = None
+        if self._sampler is not None:
+            self._sampler.stop()
+            stack_samples = dict(self._sampler.samples.most_common())
+
+        self.profile = FunctionProfile(
+            duration_ns=duration_ns,
+            cpu_time_ns=cpu_time_ns,
+            peak_memory_bytes=peak_memory_bytes,
+            stack_samples=stack_samples
+        )
+        return False
@@ -0,0 +1,86 @@
+import sys
+from time import perf_counter
+from typing import Any, Callable, Iterator, List, Optional
+
+
+class StreamingOutput:
+    """
+    Pass-through iterator for streamed step outputs.  Wraps a generator or other
+    one-shot iterator and records iteration count, size and duration as the
+    consumer drains it, so nothing is buffered or consumed by the normalizer.
+    """
+
+    def __init__(self, iterator: Iterator[Any], on_complete: Optional[Callable[['StreamingOutput'], None]] = None):
+        self._iterator = iterator
+        self.source_type: str = type(iterator).__name__
+        self._callbacks: List[Callable[['StreamingOutput'], None]] = []
+        self._started_at: Optional[float] = None
+        self.iteration_count: int = 0
+        self.size_bytes: int = 0
+        self.duration: Optional[float] = None
+        self.completed: bool = False
+        self.error: Optional[BaseException] = None
+        if on_complete is not None:
+            self._callbacks.append(on_complete)
+
+    @staticmethod
+    def is_stream(output: Any) -> bool:
+        """True for one-shot iterators (generators, map objects, file handles...) that counting would exhaust."""
+        return (isinstance(output, Iterator) and not isinstance(output, StreamingOutput)
+                and not isinstance(output, (str, bytes, bytearray)))
+
+    @staticmethod
+    def _item_size(item: Any) -> int:
+        if isinstance(item, (str, bytes, bytearray, memoryview)):
+            return len(item)
+        try:
+            return sys.getsizeof(item)
+        except TypeError:
+            return 0
+
+    def add_done_callback(self, callback: Callable[['StreamingOutput'], None]):
+        """Registers a callback fired once the stream is exhausted, closed or fails.  Fires immediately if already done."""
+        if self.duration is not None:
+            callback(self)
+        else:
+            self._callbacks.append(callback)
+
+    def _finish(self, completed: bool, error: Optional[BaseException] = None):
+        if self.duration is not None:
+            return
+        self.completed = completed
+        self.error = error
+        self.duration = perf_counter() - self._started_at if self._started_at is not None else 0.0
+        callbacks, self._callbacks = self._callbacks, []
+        for callback in callbacks:
+            callback(self)
+
+    def __iter__(self) -> 'StreamingOutput':
+        return self
+
+    def __next__(self) -> Any:
+        if self._started_at is None:
+            self._started_at = perf_counter()
+        try:
+            item = next(self._iterator)
+        except StopIteration:
+            self._finish(completed=True)
+            raise
+        except Exception as e:
+            self._finish(completed=False, error=e)
+            raise
+        self.iteration_count += 1
+        self.size_bytes += self._item_size(item)
+        return item
+
+    def close(self):
+        """Closes the underlying iterator early, recording the partial statistics."""
+        close = getattr(self._iterator, 'close', None)
+        if close is not None:
+            close()
+        self._finish(completed=False)
+
+    def __repr__(self) -> str:
+        state = 'completed' if self.completed else ('closed' if self.duration is not None else 'open')
+        return (f"StreamingOutput(state={state}, iteration_count={self.iteration_count}, "
+                f"size_bytes={self.size_bytes}, duration={self.duration})")
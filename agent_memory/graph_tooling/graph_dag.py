@@ -1,4 +1,5 @@
 import ast
+from datetime import datetime
 import numpy as np
 from loguru import logger
 from typing import Dict, List, Set, Tuple
@@ -8,11 +9,14 @@ import matplotlib.pyplot as plt
 
 
 class GraphDag:
-    def __init__(self, checkpoints: dict = None):
+    def __init__(self, checkpoints: dict = None, cost_ledger=None):
         self.checkpoints = checkpoints
         self.graph = nx.DiGraph()
+        self.cost_ledger = cost_ledger
+        self.version = 0
 
     def build_checkpoints(self):
+        self.version += 1
         for checkpoint in self.checkpoints:
             self.graph.add_node(
                 checkpoint.checkpoint_uuid,
@@ -38,7 +42,34 @@ class GraphDag:
         if initial_tasks:  # Check if there are any initial tasks
             self.graph.nodes[initial_tasks[0]]['ready_to_start'] = True
 
+    def add_checkpoint(self, checkpoint):
+        """
+        Appends one checkpoint after the current last checkpoint, so the graph can be
+        built while checkpoints are still being streamed from the planner.
+        """
+        self.version += 1
+        if self.checkpoints is None:
+            self.checkpoints = []
+        previous_checkpoint = self.checkpoints[-1] if self.checkpoints else None
+        self.checkpoints.append(checkpoint)
+        self.graph.add_node(
+            checkpoint.checkpoint_uuid,
+            checkpoint_uuid=checkpoint.checkpoint_uuid,
+            checkpoint_iterator=checkpoint.checkpoint_iterator,
+            checkpoint_description=checkpoint.checkpoint_description,
+            checkpoint_review_criteria=checkpoint.checkpoint_review_criteria,
+            ready_to_start=previous_checkpoint is None,
+            completed=False
+        )
+        if previous_checkpoint is not None:
+            self.graph.add_edge(
+                previous_checkpoint.checkpoint_uuid,
+                checkpoint.checkpoint_uuid,
+                dependency_type='checkpoint_step'
+            )
+
     def add_execution_steps(self, step_object):
+        self.version += 1
 
         self.graph.add_node(
             step_object.step_uuid,
@@ -59,6 +90,10 @@ class GraphDag:
             step_function_is_empty=step_object.is_empty,
             step_function_has_markdown=step_object.has_markdown,
             step_function_iteration_count=step_object.iteration_count,
+            step_function_profile_duration_ns=step_object.profile.duration_ns if step_object.profile else None,
+            step_function_profile_cpu_time_ns=step_object.profile.cpu_time_ns if step_object.profile else None,
+            step_function_profile_peak_memory_bytes=step_object.profile.peak_memory_bytes if step_object.profile else None,
+            step_function_profile_stack_samples=step_object.profile.stack_samples if step_object.profile else None,
             step_state_function_run=step_object.function_output,
             step_state_review=step_object.function_output,
         )
@@ -70,6 +105,12 @@ class GraphDag:
             dependency_type='checkpoint_parent'
         )
 
+        if self.cost_ledger is not None:
+            self.cost_ledger.record_step(step_object.step_uuid, step_object.checkpoint_uuid, step_object.cost)
+            checkpoint_totals = self.cost_ledger.totals('checkpoint', step_object.checkpoint_uuid)
+            self.graph.nodes[step_object.checkpoint_uuid]['cost_total_tokens'] = checkpoint_totals.total_tokens
+            self.graph.nodes[step_object.checkpoint_uuid]['cost_total'] = checkpoint_totals.cost
+
         # Add edge from previous step if it exists and isn't the checkpoint
         if step_object.previous_step_uuid and step_object.previous_step_uuid != step_object.checkpoint_uuid:
             self.graph.add_edge(
@@ -78,6 +119,45 @@ class GraphDag:
                 dependency_type='step_sequence'
             )
 
+    def get_checkpoint_ancestry(self, checkpoint_uuid: str) -> List[str]:
+        """The checkpoint followed by the checkpoints before it, nearest first."""
+        ancestry = [checkpoint_uuid]
+        seen = {checkpoint_uuid}
+        current = checkpoint_uuid
+        while True:
+            previous = [
+                predecessor for predecessor in self.graph.predecessors(current)
+                if self.graph.edges[predecessor, current].get('dependency_type') == 'checkpoint_step'
+                and predecessor not in seen
+            ]
+            if not previous:
+                return ancestry
+            current = previous[0]
+            seen.add(current)
+            ancestry.append(current)
+
+    def get_checkpoint_steps(self, checkpoint_uuid: str) -> List[str]:
+        """Step nodes executed under a checkpoint, most recently finished first."""
+        steps = [
+            successor for successor in self.graph.successors(checkpoint_uuid)
+            if self.graph.edges[checkpoint_uuid, successor].get('dependency_type') == 'checkpoint_parent'
+        ]
+        steps.sort(key=lambda node: self.graph.nodes[node].get('step_function_execution_end') or datetime.min, reverse=True)
+        return steps
+
+    def find_expensive_steps(self, metric: str = 'duration_ns', top_n: int = 10) -> List[Tuple[str, int]]:
+        """
+        Ranks profiled step nodes by a profile metric ('duration_ns', 'cpu_time_ns'
+        or 'peak_memory_bytes'), most expensive first.
+        """
+        attribute = f'step_function_profile_{metric}'
+        ranked = [
+            (node, data[attribute]) for node, data in self.graph.nodes(data=True)
+            if data.get(attribute) is not None
+        ]
+        ranked.sort(key=lambda item: item[1], reverse=True)
+        return ranked[:top_n]
+
     def analyze_dependencies(self) -> Dict[str, List[str]]:
         """Analyzes and validates the dependency structure"""
         analysis = {
@@ -1,9 +1,11 @@
 import json
 import pprint
+from dataclasses import replace
 import faiss
 import numpy as np
 from docx import Document as DOC
 from agent_memory.data_classes.graph_dataclasses import *
+from agent_memory.hash_rag.BaseModels import *
 from loguru import logger
 
 class HashRag:
@@ -50,6 +52,50 @@ class HashRag:
         self.create_faiss_index()
 
 
+    def ingest_steps(self, step_objects):
+        """
+        Embeds a batch of step records with one embeddings call and appends them to the
+        FAISS index in one add, instead of rebuilding the whole index per step like
+        `tester`.  Markdown output goes to `markdown_store` and is embedded as its step
+        UUID; the step records themselves are left untouched.
+        """
+        step_chunks = []
+        for step_object in step_objects:
+            step_uuid = step_object.step_uuid
+            if step_object.has_markdown:
+                self.markdown_store[step_uuid] = step_object.function_output
+                step_object = replace(step_object, function_output=step_uuid)
+            step_chunks.append((step_uuid, step_object.to_embedding_text()))
+        if not step_chunks:
+            return 0
+        embeddings, cost = self.ai_driver.embeddings(prompt=[chunks for _, chunks in step_chunks])
+
+        new_items = []
+        for (step_uuid, chunks), step_embeddings in zip(step_chunks, embeddings):
+            self._create_mapping(str(step_uuid), chunks)
+            new_items.append(HashRagBaseModel(
+                index=step_uuid,
+                data_object=DataInformation(
+                    parent_location='',
+                    datatype=str(type(chunks)),
+                    is_stored_locally=True,
+                    data=chunks,
+                    data_location=""
+                ),
+                vector_embeddings=step_embeddings
+            ))
+        self._add_to_index(new_items)
+        return len(new_items)
+
+    def _add_to_index(self, items):
+        if not items:
+            return
+        embeddings = np.array([item.vector_embeddings for item in items]).astype('float32')
+        if self.vector_store is None:
+            self.vector_store = faiss.IndexFlatL2(embeddings.shape[1])
+        self.vector_store.add(embeddings)
+        self.dataclass_list.extend(items)
+
     def _chuncking_strategy_function_output(self, step_data):
         """No strategy built yet, just for testing"""
         return str(step_data)
@@ -0,0 +1,181 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+from loguru import logger
+
+
+class IngestionQueueFull(Exception):
+    pass
+
+
+class MemoryIngestionPipeline:
+    """
+    Moves memory bookkeeping off the step's thread.  `submit` puts a step record on a
+    bounded queue; a single worker drains it in batches, inserting into the graph and
+    then embedding the batch into HashRag.  A full queue blocks the submitter
+    (backpressure), optionally up to `put_timeout` seconds.
+
+    The worker is the only writer to the graph and RAG index while the pipeline runs,
+    so call `flush()` before reading memory that must include recent steps.  A step
+    counts as `processed` once it is in both; `failed` counts steps the graph rejected
+    and `rag_failed` steps that reached the graph but not the RAG index.
+    """
+
+    def __init__(self, memory, max_queue_size: int = 1024, batch_size: int = 64,
+                 max_batch_latency: float = 0.05, put_timeout: Optional[float] = None):
+        self.memory = memory
+        self.max_queue_size = max_queue_size
+        self.batch_size = batch_size
+        self.max_batch_latency = max_batch_latency
+        self.put_timeout = put_timeout
+
+        self._queue: Deque[Any] = deque()
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._drained = threading.Condition(self._lock)
+        self._in_flight = 0
+        self._running = False
+        self._worker: Optional[threading.Thread] = None
+
+        self._metrics = {
+            'enqueued': 0,
+            'processed': 0,
+            'failed': 0,
+            'rag_failed': 0,
+            'batches': 0,
+            'max_queue_depth': 0,
+            'blocked_puts': 0,
+            'blocked_seconds': 0.0,
+            'rejected_puts': 0,
+            'last_batch_size': 0,
+            'last_batch_seconds': 0.0,
+        }
+
+    @property
+    def running(self) -> bool:
+        return self._running
+
+    def start(self):
+        with self._lock:
+            if self._running:
+                return
+            self._running = True
+        self._worker = threading.Thread(target=self._run, name='memory-ingestion', daemon=True)
+        self._worker.start()
+        logger.info(f"Memory ingestion pipeline started (queue {self.max_queue_size}, batch {self.batch_size})")
+
+    def stop(self, flush: bool = True, timeout: Optional[float] = None):
+        if flush:
+            self.flush(timeout=timeout)
+        with self._lock:
+            self._running = False
+            self._not_empty.notify_all()
+        if self._worker is not None:
+            self._worker.join(timeout)
+            self._worker = None
+        logger.info("Memory ingestion pipeline stopped")
+
+    def submit(self, step_object):
+        """Enqueue a step record, blocking while the queue is full."""
+        with self._lock:
+            if len(self._queue) >= self.max_queue_size:
+                self._metrics['blocked_puts'] += 1
+                blocked_at = time.perf_counter()
+                deadline = blocked_at + self.put_timeout if self.put_timeout is not None else None
+                while len(self._queue) >= self.max_queue_size:
+                    remaining = deadline - time.perf_counter() if deadline is not None else None
+                    if remaining is not None and remaining <= 0:
+                        self._metrics['rejected_puts'] += 1
+                        self._metrics['blocked_seconds'] += time.perf_counter() - blocked_at
+                        raise IngestionQueueFull(f"Memory ingestion queue full ({self.max_queue_size} steps)")
+                    self._not_full.wait(remaining)
+                self._metrics['blocked_seconds'] += time.perf_counter() - blocked_at
+            self._queue.append(step_object)
+            self._metrics['enqueued'] += 1
+            if len(self._queue) > self._metrics['max_queue_depth']:
+                self._metrics['max_queue_depth'] = len(self._queue)
+            self._not_empty.notify()
+
+    def try_submit(self, step_object) -> bool:
+        """Non-blocking `submit`; returns False instead of waiting when the queue is full."""
+        with self._lock:
+            if len(self._queue) >= self.max_queue_size:
+                return False
+            self._queue.append(step_object)
+            self._metrics['enqueued'] += 1
+            if len(self._queue) > self._metrics['max_queue_depth']:
+                self._metrics['max_queue_depth'] = len(self._queue)
+            self._not_empty.notify()
+            return True
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Wait until every submitted step has been written.  Returns False on timeout."""
+        with self._lock:
+            return self._drained.wait_for(lambda: not self._queue and self._in_flight == 0, timeout)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            metrics = dict(self._metrics)
+            metrics['queue_depth'] = len(self._queue)
+            metrics['in_flight'] = self._in_flight
+        taken = metrics['processed'] + metrics['failed'] + metrics['rag_failed']
+        metrics['average_batch_size'] = taken / metrics['batches'] if metrics['batches'] else 0.0
+        return metrics
+
+    def _take_batch(self) -> List[Any]:
+        with self._lock:
+            while self._running and not self._queue:
+                self._not_empty.wait()
+            if not self._queue:
+                return []
+            deadline = time.perf_counter() + self.max_batch_latency
+            while self._running and len(self._queue) < self.batch_size:
+                remaining = deadline - time.perf_counter()
+                if remaining <= 0:
+                    break
+                self._not_empty.wait(remaining)
+            batch = [self._queue.popleft() for _ in range(min(self.batch_size, len(self._queue)))]
+            self._in_flight = len(batch)
+            self._not_full.notify_all()
+            return batch
+
+    def _write_batch(self, batch: List[Any]) -> int:
+        started = time.perf_counter()
+        written = []
+        for step_object in batch:
+            try:
+                self.memory.graph_memory.add_execution_steps(step_object)
+                written.append(step_object)
+            except Exception as e:
+                logger.error(f"Error adding step {step_object.step_uuid} to graph: {e}")
+        rag_failed = 0
+        try:
+            self.memory._add_to_rag(written)
+        except Exception as e:
+            logger.error(f"Error adding {len(written)} steps to RAG: {e}")
+            rag_failed = len(written)
+        with self._lock:
+            self._metrics['batches'] += 1
+            self._metrics['processed'] += len(written) - rag_failed
+            self._metrics['failed'] += len(batch) - len(written)
+            self._metrics['rag_failed'] += rag_failed
+            self._metrics['last_batch_size'] = len(batch)
+            self._metrics['last_batch_seconds'] = time.perf_counter() - started
+        return len(written) - rag_failed
+
+    def _run(self):
+        while True:
+            batch = self._take_batch()
+            if not batch:
+                with self._lock:
+                    if not self._running:
+                        self._drained.notify_all()
+                        return
+                continue
+            self._write_batch(batch)
+            with self._lock:
+                self._in_flight = 0
+                self._drained.notify_all()
@@ -1,4 +1,7 @@
+import asyncio
 import os
+import time
+from typing import Any, Awaitable, Callable
 from uuid import uuid4
 
 from build_utils.encode_config_json import JsonFormatter
@@ -8,7 +11,10 @@ from setup_master.master import Master
 from build_utils.create_config_class import CreateConfigClass
 from utils.ai.ai_enums import *
 from api_master import APIMaster
+from async_api_master import AsyncAPIMaster
+from task_context_cache import TaskContextCache
 from thinking.thinking import TaskMaster
+from thinking.planning_pipeline.planning_pipeline import PlanningPipeline
 from agent_registry import map_agent
 from agent_memory.agent_internal_memory import AgentMemory
 
@@ -37,6 +43,9 @@ class AgentPrime:
         self.work_package_uuid = None
 
         self.api_master = None
+        self.async_api_master = None
+        # upper bound; with a leased work package the agent beats at least three times per lease
+        self.heartbeat_interval = 10.0
         self.thinking = None
 
     def initialise_class_runtimes(self):
@@ -63,7 +72,9 @@ class AgentPrime:
                                                 orchestration_engine_host=True)),
                                         api_key=self.master.SE.base64_decode_string(
                                             self.master.CF.return_config_orchestration_engine(
-                                                orchestration_engine_api_key=True)))
+                                                orchestration_engine_api_key=True)),
+                                        context_cache=TaskContextCache(
+                                            os.path.join(self.working_directory, '.cache', 'task_context.json')))
             logger.info('Api master initialised')
             self.thinking = TaskMaster(AI_CLIENT=self.AI)
             logger.info('Thinking initialised')
@@ -72,7 +83,8 @@ class AgentPrime:
 
     def initialise_memory_system(self):
         if not AgentPrime._memory_initialized:
-            self.memory = AgentMemory(checkpoint=self.checkpoint_information, ai_driver=self.ai_driver)
+            self.memory = AgentMemory(checkpoint=self.checkpoint_information, ai_driver=self.ai_driver,
+                                      task_uuid=self.task_uuid, work_package_uuid=self.work_package_uuid)
             self.memory.map_checkpoint_to_dataclass()
             self.memory.build_graph_initial_from_checkpoint_dataclass_list()
             AgentPrime._memory_initialized = True
@@ -84,25 +96,28 @@ class AgentPrime:
         logger.info("Initializing agent UUIDs")
         try:
             request = self.api_master.register_heartbeat()
-            if request.get('agent_uuid'):
-                self.agent_uuid = request.get('agent_uuid')
-                logger.info(f'Agent UUID: {self.agent_uuid}')
-                self.agent_tier = request.get('agent_tier')
-                logger.info(f'Agent Tier: {self.agent_tier}')
-                self.task_uuid = request.get('task_uuid')
-                logger.info(f'Task UUID: {self.task_uuid}')
-                self.work_package_uuid = request.get('work_package_uuid')
-                logger.info(f'Work Package UUID: {self.work_package_uuid}')
-                self.work_available = True
-            else:
-                logger.info('No current work available')
-                self.work_available = False
+            self._apply_registration(request)
             return True
         except Exception as e:
             logger.error(f'Error initializing agent UUIDs: {e}')
             self.work_available = False
             return False
 
+    def _apply_registration(self, request: dict):
+        if request.get('agent_uuid'):
+            self.agent_uuid = request.get('agent_uuid')
+            logger.info(f'Agent UUID: {self.agent_uuid}')
+            self.agent_tier = request.get('agent_tier')
+            logger.info(f'Agent Tier: {self.agent_tier}')
+            self.task_uuid = request.get('task_uuid')
+            logger.info(f'Task UUID: {self.task_uuid}')
+            self.work_package_uuid = request.get('work_package_uuid')
+            logger.info(f'Work Package UUID: {self.work_package_uuid}')
+            self.work_available = True
+        else:
+            logger.info('No current work available')
+            self.work_available = False
+
     def get_task_information(self):
         """
         Retrieve detailed task information from the orchestration layer
@@ -113,26 +128,28 @@ class AgentPrime:
                 task_uuid=self.task_uuid,
                 work_package_uuid=self.work_package_uuid
             )
+            return self._apply_task_information(task_info)
+        except Exception as e:
+            logger.error(f'Error retrieving task information: {e}')
+            return None
 
-            if not task_info or not isinstance(task_info, dict):
-                logger.error("Failed to retrieve task information")
-                return None
+    def _apply_task_information(self, task_info):
+        if not task_info or not isinstance(task_info, dict):
+            logger.error("Failed to retrieve task information")
+            return None
 
-            self.context = task_info.get('task_information_obj', {})
+        self.context = task_info.get('task_information_obj', {})
 
-            current_context = self.context.get('current_context', {})
-            logger.debug(current_context)
-            meta_objective = current_context.get('meta_main_objective', {})
-            logger.debug(meta_objective)
+        current_context = self.context.get('current_context', {})
+        logger.debug(current_context)
+        meta_objective = current_context.get('meta_main_objective', {})
+        logger.debug(meta_objective)
 
-            logger.debug(f"Task name: {current_context.get('task_name')}")
-            logger.debug(f"Task type: {current_context.get('task_type')}")
-            logger.debug(f"Task complexity: {current_context.get('task_complexity')}")
+        logger.debug(f"Task name: {current_context.get('task_name')}")
+        logger.debug(f"Task type: {current_context.get('task_type')}")
+        logger.debug(f"Task complexity: {current_context.get('task_complexity')}")
 
-            return task_info
-        except Exception as e:
-            logger.error(f'Error retrieving task information: {e}')
-            return None
+        return task_info
 
     def generate_tool_execution_plan(self):
         return
@@ -144,19 +161,22 @@ class AgentPrime:
                 task_uuid=self.task_uuid,
                 work_package_uuid=self.work_package_uuid
             )
-            if not checkpoint_info or not isinstance(checkpoint_info, dict):
-                logger.error("Failed to retrieve task information")
-                return None
-
-            if checkpoint_info.get('checkpoint_information'):
-                self.checkpoint_information = checkpoint_info.get('checkpoint_information').get('checkpoint')
-                return True
-            else:
-                return False
+            return self._apply_checkpoint_information(checkpoint_info)
         except Exception as e:
             logger.error(f'Error retrieving checkpoint information: {e}')
             return None
 
+    def _apply_checkpoint_information(self, checkpoint_info):
+        if not checkpoint_info or not isinstance(checkpoint_info, dict):
+            logger.error("Failed to retrieve task information")
+            return None
+
+        if checkpoint_info.get('checkpoint_information'):
+            self.checkpoint_information = checkpoint_info.get('checkpoint_information').get('checkpoint')
+            return True
+        else:
+            return False
+
     def generate_checkpoints(self):
         logger.info(f"Creating checkpoints for task: {self.task_uuid}")
         try:
@@ -169,15 +189,188 @@ class AgentPrime:
     def initialise_agent_polymorphism(self):
         return
 
+    def bootstrap_task(self):
+        """
+        Registration, task information and checkpoints in one orchestrator round trip.
+        Returns True when checkpoints already exist, False when they need generating and
+        None when the bootstrap call failed (e.g. an orchestrator without the endpoint).
+        """
+        logger.info("Bootstrapping task")
+        try:
+            bootstrap = self.api_master.bootstrap()
+        except Exception as e:
+            logger.warning(f'Bootstrap unavailable, falling back to separate calls: {e}')
+            return None
+        return self._apply_bootstrap(bootstrap)
+
+    def _apply_bootstrap(self, bootstrap: dict):
+        self._apply_registration(bootstrap['assignment'])
+        if not self.work_available:
+            return False
+        self._apply_task_information(bootstrap['task_information'])
+        return bool(self._apply_checkpoint_information(bootstrap['checkpoint_information']))
+
     def run(self):
         if self.initialise_class_runtimes():
-            self.initialise_agent_uuids()
+            has_checkpoints = self.bootstrap_task()
+            if has_checkpoints is None:
+                self.initialise_agent_uuids()
+                if self.work_available:
+                    self.get_task_information()
+                    has_checkpoints = self.check_for_existing_checkpoints()
             if self.work_available:
-                self.get_task_information()
-                if not self.check_for_existing_checkpoints():
+                if not has_checkpoints:
                     self.generate_checkpoints()
                 self.initialise_memory_system()
 
+    async def _fetch_task_information_async(self):
+        logger.info(f"Getting task information for task: {self.task_uuid}")
+        try:
+            task_info = await self.async_api_master.get_task_information(
+                task_uuid=self.task_uuid,
+                work_package_uuid=self.work_package_uuid
+            )
+            return self._apply_task_information(task_info)
+        except Exception as e:
+            logger.error(f'Error retrieving task information: {e}')
+            return None
+
+    async def _check_for_existing_checkpoints_async(self):
+        logger.info(f"Checking checkpoints for task: {self.task_uuid}")
+        try:
+            checkpoint_info = await self.async_api_master.check_for_checkpoints(
+                task_uuid=self.task_uuid,
+                work_package_uuid=self.work_package_uuid
+            )
+            return self._apply_checkpoint_information(checkpoint_info)
+        except Exception as e:
+            logger.error(f'Error retrieving checkpoint information: {e}')
+            return None
+
+    async def run_async(self, work: Callable[['AgentPrime'], Awaitable[Any]] = None):
+        """
+        Async counterpart of `run`.  Once work is assigned a background heartbeat keeps the
+        lease alive.  Without the bootstrap endpoint the task information fetch overlaps
+        with the checkpoint check, checkpoint generation and memory initialisation.
+        `work(self)`, if given, is awaited with the heartbeat still running; the heartbeat
+        is stopped when it returns.
+        """
+        if not self.initialise_class_runtimes():
+            return
+        self.async_api_master = AsyncAPIMaster(self.api_master, heartbeat_interval=self.heartbeat_interval)
+        try:
+            has_checkpoints = self._apply_bootstrap(await self.async_api_master.bootstrap())
+            bootstrapped = True
+        except Exception as e:
+            logger.warning(f'Bootstrap unavailable, falling back to separate calls: {e}')
+            bootstrapped = False
+            try:
+                self._apply_registration(await self.async_api_master.register_heartbeat())
+            except Exception as e:
+                logger.error(f'Error initializing agent UUIDs: {e}')
+                self.work_available = False
+        if not self.work_available:
+            return
+
+        self.async_api_master.start_heartbeat(self._lease_heartbeat_interval())
+        try:
+            task_information = None
+            if not bootstrapped:
+                task_information = asyncio.create_task(self._fetch_task_information_async())
+                has_checkpoints = await self._check_for_existing_checkpoints_async()
+            if not has_checkpoints:
+                await asyncio.to_thread(self.generate_checkpoints)
+            await asyncio.to_thread(self.initialise_memory_system)
+            if task_information is not None:
+                await task_information
+            if work is not None:
+                return await work(self)
+        finally:
+            await self.async_api_master.close()
+
+    def _lease_heartbeat_interval(self) -> float:
+        lease_seconds = self.api_master.lease_expires_in if self.api_master is not None else None
+        if lease_seconds:
+            return min(self.heartbeat_interval, lease_seconds / 3)
+        return self.heartbeat_interval
+
+    async def _work_on_package(self, work, has_checkpoints):
+        AgentPrime._memory_initialized = False
+        if not has_checkpoints:
+            await asyncio.to_thread(self.generate_checkpoints)
+        await asyncio.to_thread(self.initialise_memory_system)
+        if work is not None:
+            await work(self)
+
+    async def run_worker(self, work: Callable[['AgentPrime'], Awaitable[Any]] = None, max_tasks: int = None,
+                         idle_timeout: float = None, poll_interval: float = 1.0) -> int:
+        """
+        Worker loop against a work-queue orchestrator.  Each round leases a work package
+        through the bootstrap call and keeps the lease alive with the background heartbeat
+        while checkpoints, memory and `work(self)` run.  The package is then reported
+        complete, or failed when `work` raises.  When a heartbeat reports the lease lost
+        the package is abandoned (its work cancelled, nothing reported).  Stops after
+        `max_tasks` packages, or once no work has been available for `idle_timeout`
+        seconds.  Returns the number of successful completions the orchestrator accepted.
+        """
+        if self.api_master is None and not self.initialise_class_runtimes():
+            return 0
+        self.async_api_master = AsyncAPIMaster(self.api_master, heartbeat_interval=self.heartbeat_interval)
+        attempted = completed = 0
+        idle_since = None
+        try:
+            while max_tasks is None or attempted < max_tasks:
+                try:
+                    has_checkpoints = self._apply_bootstrap(await self.async_api_master.bootstrap())
+                except Exception as e:
+                    logger.warning(f'Error leasing work: {e}')
+                    self.work_available = False
+                if not self.work_available:
+                    idle_since = idle_since or time.monotonic()
+                    if idle_timeout is not None and time.monotonic() - idle_since >= idle_timeout:
+                        break
+                    await asyncio.sleep(poll_interval)
+                    continue
+
+                idle_since = None
+                attempted += 1
+                status = 'success'
+                lease_lost = False
+                package = asyncio.create_task(self._work_on_package(work, has_checkpoints))
+
+                def on_heartbeat(result: dict):
+                    nonlocal lease_lost
+                    if result.get('lease_lost') and not package.done():
+                        logger.warning(f'Lease on work package {self.work_package_uuid} lost, abandoning it')
+                        lease_lost = True
+                        package.cancel()
+
+                self.async_api_master.on_heartbeat = on_heartbeat
+                self.async_api_master.start_heartbeat(self._lease_heartbeat_interval())
+                try:
+                    await package
+                except asyncio.CancelledError:
+                    if not lease_lost:
+                        raise
+                except Exception as e:
+                    logger.error(f'Error working on work package {self.work_package_uuid}: {e}')
+                    status = 'failed'
+                finally:
+                    await self.async_api_master.stop_heartbeat()
+                    self.async_api_master.on_heartbeat = None
+                if lease_lost:
+                    continue
+
+                try:
+                    result = await self.async_api_master.complete_task(self.task_uuid, self.work_package_uuid, status)
+                    if result.get('accepted') and status == 'success':
+                        completed += 1
+                except Exception as e:
+                    logger.error(f'Error completing work package {self.work_package_uuid}: {e}')
+        finally:
+            await self.async_api_master.close()
+        return completed
+
     def run_example_agent(self):
         test_obj = {
             'checkpoint_uuid': '97e35266-3510-44f2-8d52-bc110da4a0f2',
@@ -197,20 +390,12 @@ class AgentPrime:
         self.memory.graph_memory.visualise_plt()
 
     def test(self):
-        self.thinking.task = 'Research the website https://www.project-friday.com, look at everything they have released; I want to know if they have a git hub, funding, team size'
-        clarification_needed_questions, cost = self.thinking.clarify_task(replacement_items=[''])
-
-        question_response_dict = {}
-        for question in clarification_needed_questions.clarification_needed_questions:
-            question_response_dict[question.question] = {'example_outcomes': question.example_outcomes, 'user_response': input(f'{question.question}\n')}
-
-        reformatted_task, cost = self.thinking.rework_task(replacement_items=[str(question_response_dict)])
-        self.thinking.task = reformatted_task.reformatted_task
-        complexity, cost = self.thinking.evaluate_task_complexity(replacement_items=[self.thinking.task])
-        checkpoint, cost = self.thinking.build_web_checkpoint(replacement_items=[complexity.value])
-        for item in checkpoint.checkpoint:
+        task = 'Research the website https://www.project-friday.com, look at everything they have released; I want to know if they have a git hub, funding, team size'
+        report = PlanningPipeline(self.thinking).run(task)
+        self.thinking.task = report.reworked_task
+        for item in report.checkpoints.checkpoint:
             print(item)
-
+        print(report.summary())
 
 
 if __name__ =='__main__':
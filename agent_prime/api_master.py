@@ -1,42 +1,331 @@
+import random
+import threading
+import time
+from typing import Optional
+
 import requests
+from requests.adapters import HTTPAdapter
 from loguru import logger
 
+from tracing.metrics import exponential_bounds, get_metrics
+from transport import payload_codec
+
+RETRY_STATUS_CODES = {429, 502, 503, 504}
+# 64B .. ~1GB
+PAYLOAD_BOUNDS = exponential_bounds(64, 2, 25)
+
+
+class CircuitOpenError(Exception):
+    pass
+
+
+class CircuitBreaker:
+    """
+    Stops calling the orchestrator after `failure_threshold` consecutive failures.  While
+    open, calls fail fast with `CircuitOpenError`; after `reset_timeout` seconds one trial
+    call is let through (half-open) and its outcome closes or re-opens the circuit.
+    """
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.OPEN and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = self.HALF_OPEN
+                self._trial_in_flight = False
+            if self.state == self.HALF_OPEN and not self._trial_in_flight:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            if self.state != self.CLOSED:
+                logger.info("Orchestrator circuit closed")
+            self.state = self.CLOSED
+            self.consecutive_failures = 0
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.consecutive_failures += 1
+            if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    logger.warning(f"Orchestrator circuit opened after {self.consecutive_failures} consecutive failures")
+                self.state = self.OPEN
+                self.opened_at = time.monotonic()
+                self._trial_in_flight = False
+
 
 class APIMaster:
-    def __init__(self, base_url: str, base_port: str, api_key: str):
+    def __init__(self, base_url: str, base_port: str, api_key: str, connect_timeout: float = 3.05,
+                 read_timeout: float = 30.0, max_retries: int = 3, backoff_base: float = 0.5,
+                 backoff_max: float = 10.0, pool_maxsize: int = 10, breaker_failure_threshold: int = 5,
+                 breaker_reset_timeout: float = 30.0, metrics=None, context_cache=None,
+                 response_format: str = 'msgpack', request_format: str = 'json',
+                 request_compression: Optional[str] = None):
         self.base_url = base_url
         self.port = base_port
         self.api_key = api_key
         self.headers = {"api_key": self.api_key}
         self.orchestration_endpoint = f'http://{self.base_url}:{self.port}'
+
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.circuit_breaker = CircuitBreaker(failure_threshold=breaker_failure_threshold,
+                                              reset_timeout=breaker_reset_timeout)
+        self.metrics = metrics if metrics is not None else get_metrics()
+        # TaskContextCache (or None): task context and checkpoints by ETag, across restarts
+        self.context_cache = context_cache
+        # responses are negotiated (an orchestrator that ignores Accept still answers JSON);
+        # request bodies are only sent as msgpack / compressed when configured to
+        self.request_content_type = payload_codec.FORMATS[request_format]
+        self.request_compression = request_compression
+        # sent with heartbeats so the orchestrator renews this agent's assignment / lease
+        self.agent_uuid = None
+        self.lease = None
+        # seconds the current lease lasted when granted or last renewed, if the orchestrator says
+        self.lease_expires_in = None
+
+        # one keep-alive connection pool for every call; retries are handled in _post
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_maxsize, max_retries=0)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update(self.headers)
+        # requests undoes the Content-Encoding itself; only advertise what the codec can also read
+        self.session.headers.update({'Accept': payload_codec.accept_header(payload_codec.FORMATS[response_format]),
+                                     'Accept-Encoding': payload_codec.accept_encoding_header()})
         logger.info(f"Initialized APIMaster with base URL: {self.base_url}")
 
+    def close(self):
+        self.session.close()
+
+    def _backoff(self, attempt: int, response=None) -> float:
+        """Full-jitter exponential backoff, or the server's Retry-After when it sends one."""
+        retry_after = response.headers.get('Retry-After') if response is not None else None
+        if retry_after:
+            try:
+                return min(float(retry_after), self.backoff_max)
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def _post(self, endpoint: str, data: dict = None, idempotent: bool = True,
+              headers: dict = None) -> requests.Response:
+        """
+        POSTs to the orchestrator through the pooled session.  Connection errors, timeouts
+        and 429/502/503/504 responses are retried with backoff when the call is idempotent
+        (a non-idempotent call is only retried when the connection was never established).
+        Every other request error counts as a failure for the circuit breaker and is raised.
+        """
+        url = f'{self.orchestration_endpoint}{endpoint}'
+        body = None
+        if data is not None:
+            body, body_headers = payload_codec.encode_payload(data, self.request_content_type,
+                                                              self.request_compression)
+            headers = {**body_headers, **(headers or {})}
+        attempt = 0
+        while True:
+            if not self.circuit_breaker.allow():
+                self.metrics.increment('api.circuit_rejected', endpoint=endpoint)
+                raise CircuitOpenError(f"Orchestrator circuit is open, not calling {endpoint}")
+
+            started = time.perf_counter()
+            response, error = None, None
+            try:
+                response = self.session.post(url=url, data=body, headers=headers, timeout=self.timeout)
+            except requests.RequestException as e:
+                # includes malformed responses (bad Content-Encoding, broken chunking), which fail the call
+                error = e
+            except BaseException:
+                # anything else must still settle a half-open trial, or the circuit never closes
+                self.circuit_breaker.record_failure()
+                raise
+            elapsed = time.perf_counter() - started
+
+            status = str(response.status_code) if response is not None else type(error).__name__
+            self.metrics.observe('api.latency_seconds', elapsed, endpoint=endpoint, status=status)
+            failed = error is not None or response.status_code in RETRY_STATUS_CODES or response.status_code >= 500
+            if not failed:
+                self.circuit_breaker.record_success()
+                if response.headers.get('Content-Length'):
+                    self.metrics.observe('api.response_bytes', int(response.headers['Content-Length']),
+                                         PAYLOAD_BOUNDS, endpoint=endpoint,
+                                         encoding=response.headers.get('Content-Encoding', payload_codec.IDENTITY))
+                return response
+
+            self.circuit_breaker.record_failure()
+            self.metrics.increment('api.errors', endpoint=endpoint, status=status)
+            transient = isinstance(error, (requests.ConnectionError, requests.Timeout))
+            retryable = (idempotent and (transient or (error is None and response.status_code in RETRY_STATUS_CODES))) \
+                or isinstance(error, requests.ConnectTimeout)
+            if not retryable or attempt >= self.max_retries:
+                if error is not None:
+                    raise error
+                return response
+
+            delay = self._backoff(attempt, response)
+            attempt += 1
+            self.metrics.increment('api.retries', endpoint=endpoint)
+            logger.warning(f"{endpoint} failed ({status}), retry {attempt}/{self.max_retries} in {delay:.2f}s")
+            time.sleep(delay)
+
     def register_heartbeat(self):
         endpoint = '/api/register_heartbeat'
-        url = f'{self.orchestration_endpoint}{endpoint}'
         logger.info(f"Registering heartbeat at endpoint: {endpoint}")
 
         try:
-            response = requests.post(url=url, headers=self.headers)
+            lease = self.lease
+            data = {'agent_uuid': self.agent_uuid, **(lease or {})} if self.agent_uuid else None
+            # until the agent has an identity every registration can create an agent (and lease
+            # work), so a retry after a lost response would leave an orphan behind
+            response = self._post(endpoint, data, idempotent=self.agent_uuid is not None)
             logger.debug(f"Response status code: {response.status_code}")
-            result = response.json()
+            response.raise_for_status()
+            result = self._decode(response)
+            if self.lease == lease:
+                self._track_assignment(result)
+            else:
+                # the lease changed while this beat was in flight (completed, or a new package)
+                logger.debug("Ignoring heartbeat answer for an earlier lease")
             logger.success(f"Successfully registered heartbeat")
             return result
         except Exception as e:
             logger.error(f"Error registering heartbeat: {str(e)}")
             raise
 
+    def _track_assignment(self, assignment: dict):
+        self.agent_uuid = assignment.get('agent_uuid') or self.agent_uuid
+        if assignment.get('lease_lost'):
+            logger.warning(f"Lease on work package {(self.lease or {}).get('work_package_uuid')} was lost")
+            self.lease = None
+            self.lease_expires_in = None
+        elif assignment.get('work_package_uuid'):
+            self.lease = {'task_uuid': assignment.get('task_uuid'),
+                          'work_package_uuid': assignment['work_package_uuid']}
+            self.lease_expires_in = assignment.get('lease_expires_in')
+
+    @staticmethod
+    def _decode(response: requests.Response):
+        """The response body as JSON or msgpack, going by its Content-Type."""
+        return payload_codec.decode_body(response.content, response.headers.get('Content-Type'))
+
+    def _post_cached(self, endpoint: str, data: dict, cache_key: str) -> dict:
+        """
+        POSTs with If-None-Match when `cache_key` is in the context cache.  A 304 returns
+        the cached payload; a fresh response is stored under its ETag.
+        """
+        cached = self.context_cache.get(cache_key) if self.context_cache is not None else None
+        headers = {'If-None-Match': cached[0]} if cached else None
+        response = self._post(endpoint, data, headers=headers)
+        logger.debug(f"Response status code: {response.status_code}")
+        if response.status_code == 304 and cached:
+            self.metrics.increment('api.not_modified', endpoint=endpoint)
+            logger.debug(f"{endpoint} not modified, using cached payload")
+            return cached[1]
+        response.raise_for_status()
+        result = self._decode(response)
+        if self.context_cache is not None:
+            self.context_cache.put(cache_key, response.headers.get('ETag'), result)
+        return result
+
+    def bootstrap(self) -> dict:
+        """
+        Registration, task information and checkpoints in a single round trip.  Sends the
+        ETags of cached parts so the orchestrator can skip unchanged bodies.  Returns
+        {'assignment', 'task_information', 'checkpoint_information'}, each shaped like the
+        response of `register_heartbeat`, `get_task_information` and `check_for_checkpoints`.
+        """
+        endpoint = '/api/bootstrap'
+        known_etags = self.context_cache.etags() if self.context_cache is not None else {}
+        logger.info(f"Bootstrapping at endpoint: {endpoint} ({len(known_etags)} cached parts)")
+
+        try:
+            data = {'known_etags': known_etags}
+            if self.agent_uuid:
+                data['agent_uuid'] = self.agent_uuid
+            response = self._post(endpoint, data, idempotent=self.agent_uuid is not None)
+            logger.debug(f"Response status code: {response.status_code}")
+            response.raise_for_status()
+            result = self._decode(response)
+            bootstrap = {'assignment': result['assignment']}
+            self._track_assignment(result['assignment'])
+            for part in ('task_information', 'checkpoint_information'):
+                section = result.get(part)
+                if section is None:
+                    bootstrap[part] = None
+                    continue
+                if section.get('not_modified'):
+                    cached = self.context_cache.get(section['key']) if self.context_cache is not None else None
+                    if cached is None or cached[0] != section['etag']:
+                        raise ValueError(f"Orchestrator reported {section['key']} unchanged but it is not cached")
+                    self.metrics.increment('api.not_modified', endpoint=endpoint)
+                    bootstrap[part] = cached[1]
+                else:
+                    bootstrap[part] = section['body']
+                    if self.context_cache is not None:
+                        self.context_cache.put(section['key'], section.get('etag'), section['body'])
+            logger.success(f"Successfully bootstrapped")
+            return bootstrap
+        except Exception as e:
+            logger.error(f"Error bootstrapping: {str(e)}")
+            raise
+
+    def complete_task(self, task_uuid: str, work_package_uuid: str, status: str = 'success',
+                      result: dict = None) -> dict:
+        """
+        Reports a work package finished ('success' or 'failed') and releases the lease.
+        Returns {'accepted': bool}; False (a 409) means the lease had already expired
+        and the work package was handed to another agent.
+        """
+        endpoint = '/api/complete_task'
+        data = {'agent_uuid': self.agent_uuid, 'task_uuid': task_uuid, 'work_package_uuid': work_package_uuid,
+                'status': status}
+        if result is not None:
+            data['result'] = result
+        logger.info(f"Completing work package {work_package_uuid} ({status}) at endpoint: {endpoint}")
+
+        try:
+            response = self._post(endpoint, data)
+            logger.debug(f"Response status code: {response.status_code}")
+            if response.status_code != 409:
+                response.raise_for_status()
+            result = self._decode(response)
+            if (self.lease or {}).get('work_package_uuid') == work_package_uuid:
+                self.lease = None
+                self.lease_expires_in = None
+            if result.get('accepted'):
+                logger.success(f"Successfully completed work package")
+            else:
+                logger.warning(f"Completion of work package {work_package_uuid} was rejected, lease lost")
+            return result
+        except Exception as e:
+            logger.error(f"Error completing work package: {str(e)}")
+            raise
+
     def get_task_information(self, task_uuid: str, work_package_uuid: str) -> dict:
         endpoint = '/api/get_task_information'
-        url = f'{self.orchestration_endpoint}{endpoint}'
         data = {'task_uuid': task_uuid, 'work_package_uuid': work_package_uuid}
         logger.info(f"Getting task information at endpoint: {endpoint}")
         logger.debug(f"Task UUID: {task_uuid}, Work Package UUID: {work_package_uuid}")
 
         try:
-            response = requests.post(url=url, json=data, headers=self.headers)
-            logger.debug(f"Response status code: {response.status_code}")
-            result = response.json()
+            result = self._post_cached(endpoint, data, f'{task_uuid}:{work_package_uuid}:task_information')
             logger.success(f"Successfully retrieved task information")
             return result
         except Exception as e:
@@ -45,15 +334,15 @@ class APIMaster:
 
     def get_task_meta(self, task_meta_id: str) -> dict:
         endpoint = '/get_task_meta'
-        url = f'{self.orchestration_endpoint}{endpoint}'
         data = {'task_meta_id': task_meta_id}
         logger.info(f"Getting task meta at endpoint: {endpoint}")
         logger.debug(f"Task meta ID: {task_meta_id}")
 
         try:
-            response = requests.post(url=url, json=data, headers=self.headers)
+            response = self._post(endpoint, data)
             logger.debug(f"Response status code: {response.status_code}")
-            result = response.json()
+            response.raise_for_status()
+            result = self._decode(response)
             logger.success(f"Successfully retrieved task meta")
             return result
         except Exception as e:
@@ -62,14 +351,11 @@ class APIMaster:
 
     def check_for_checkpoints(self, task_uuid: str, work_package_uuid: str) -> dict:
         endpoint = '/api/check_checkpoint_information'
-        url = f'{self.orchestration_endpoint}{endpoint}'
         data = {'task_uuid': task_uuid, 'work_package_uuid': work_package_uuid}
         logger.info(f"Getting checkpoints at endpoint: {endpoint}")
 
         try:
-            response = requests.post(url=url, json=data, headers=self.headers)
-            logger.debug(f"Response status code: {response.status_code}")
-            result = response.json()
+            result = self._post_cached(endpoint, data, f'{task_uuid}:{work_package_uuid}:checkpoint_information')
             logger.success(f"Successfully retrieved checkpoints")
             return result
         except Exception as e:
@@ -80,4 +366,4 @@ class APIMaster:
 
 
 if __name__ == '__main__':
-    run = APIMaster()
\ No newline at end of file
+    run = APIMaster()
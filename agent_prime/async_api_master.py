@@ -0,0 +1,105 @@
+import asyncio
+import time
+from typing import Callable, Optional
+
+from loguru import logger
+
+from api_master import APIMaster
+
+
+class AsyncAPIMaster:
+    """
+    Asyncio front end for `APIMaster`.  Calls run on worker threads over the same pooled
+    session (so retries, timeouts and the circuit breaker still apply) and can be awaited
+    alongside other work.  `start_heartbeat` keeps the agent's lease alive from a
+    background task until `stop_heartbeat` or `close`.
+    """
+
+    def __init__(self, api_master: APIMaster, heartbeat_interval: float = 30.0,
+                 on_heartbeat: Optional[Callable[[dict], None]] = None):
+        self.api_master = api_master
+        self.heartbeat_interval = heartbeat_interval
+        self.on_heartbeat = on_heartbeat
+        self.last_heartbeat: Optional[float] = None
+        self.heartbeat_count = 0
+        self.heartbeat_failures = 0
+        self._heartbeat_task: Optional[asyncio.Task] = None
+        # the beat currently running on a worker thread; cancelling the loop does not stop it
+        self._heartbeat_call: Optional[asyncio.Future] = None
+
+    async def register_heartbeat(self) -> dict:
+        return await asyncio.to_thread(self.api_master.register_heartbeat)
+
+    async def bootstrap(self) -> dict:
+        return await asyncio.to_thread(self.api_master.bootstrap)
+
+    async def get_task_information(self, task_uuid: str, work_package_uuid: str) -> dict:
+        return await asyncio.to_thread(self.api_master.get_task_information, task_uuid, work_package_uuid)
+
+    async def get_task_meta(self, task_meta_id: str) -> dict:
+        return await asyncio.to_thread(self.api_master.get_task_meta, task_meta_id)
+
+    async def check_for_checkpoints(self, task_uuid: str, work_package_uuid: str) -> dict:
+        return await asyncio.to_thread(self.api_master.check_for_checkpoints, task_uuid, work_package_uuid)
+
+    async def complete_task(self, task_uuid: str, work_package_uuid: str, status: str = 'success',
+                            result: dict = None) -> dict:
+        return await asyncio.to_thread(self.api_master.complete_task, task_uuid, work_package_uuid, status, result)
+
+    @property
+    def heartbeat_running(self) -> bool:
+        return self._heartbeat_task is not None and not self._heartbeat_task.done()
+
+    def start_heartbeat(self, interval: Optional[float] = None) -> asyncio.Task:
+        """Starts the heartbeat loop on the running event loop; a no-op if it is already running."""
+        if interval is not None:
+            self.heartbeat_interval = interval
+        if not self.heartbeat_running:
+            self._heartbeat_task = asyncio.create_task(self._heartbeat_loop(), name='orchestrator-heartbeat')
+            logger.info(f"Heartbeat started every {self.heartbeat_interval}s")
+        return self._heartbeat_task
+
+    async def stop_heartbeat(self):
+        if self._heartbeat_task is None:
+            return
+        self._heartbeat_task.cancel()
+        try:
+            await self._heartbeat_task
+        except asyncio.CancelledError:
+            pass
+        self._heartbeat_task = None
+        if self._heartbeat_call is not None:
+            # let a beat already on the wire finish, so it cannot update the client after we return
+            await asyncio.wait([self._heartbeat_call])
+            if not self._heartbeat_call.cancelled() and self._heartbeat_call.exception() is not None:
+                self.heartbeat_failures += 1
+            self._heartbeat_call = None
+        logger.info(f"Heartbeat stopped after {self.heartbeat_count} beats ({self.heartbeat_failures} failed)")
+
+    async def _heartbeat_loop(self):
+        while True:
+            await asyncio.sleep(self.heartbeat_interval)
+            self._heartbeat_call = asyncio.get_running_loop().run_in_executor(None, self.api_master.register_heartbeat)
+            try:
+                result = await asyncio.shield(self._heartbeat_call)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                # a missed beat is retried on the next interval; the agent keeps working
+                self.heartbeat_failures += 1
+                logger.warning(f"Heartbeat failed ({self.heartbeat_failures} so far): {e}")
+                continue
+            finally:
+                if self._heartbeat_call is not None and self._heartbeat_call.done():
+                    self._heartbeat_call = None
+            self.heartbeat_count += 1
+            self.last_heartbeat = time.time()
+            if self.on_heartbeat is not None:
+                try:
+                    self.on_heartbeat(result)
+                except Exception as e:
+                    # a failing callback must not end the heartbeat and lose the lease
+                    logger.error(f"Heartbeat callback failed: {e}")
+
+    async def close(self):
+        await self.stop_heartbeat()
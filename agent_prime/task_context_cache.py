@@ -0,0 +1,67 @@
+import json
+import os
+import tempfile
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from loguru import logger
+
+
+class TaskContextCache:
+    """
+    On-disk cache of orchestrator payloads (task context, checkpoints) and their ETags,
+    keyed by task, work package and part.  It survives agent restarts, so a cold start
+    can ask the orchestrator "has this changed?" instead of downloading it again.  Only
+    the `max_entries` most recently stored payloads are kept.
+    """
+
+    def __init__(self, path: str, max_entries: int = 16):
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries: Dict[str, Dict[str, Any]] = self._load()
+
+    @staticmethod
+    def key(task_uuid: str, work_package_uuid: str, part: str) -> str:
+        return f'{task_uuid}:{work_package_uuid}:{part}'
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            with open(self.path, 'r') as file:
+                return json.load(file)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable task context cache {self.path}: {e}")
+            return {}
+
+    def _save(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        handle, temporary_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        with os.fdopen(handle, 'w') as file:
+            json.dump(self._entries, file)
+        os.replace(temporary_path, self.path)
+
+    def etags(self) -> Dict[str, str]:
+        """{key: etag} for every cached payload, as sent to the bootstrap endpoint."""
+        with self._lock:
+            return {key: entry['etag'] for key, entry in self._entries.items()}
+
+    def get(self, key: str) -> Optional[Tuple[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            return (entry['etag'], entry['payload']) if entry else None
+
+    def put(self, key: str, etag: str, payload: Any):
+        if not etag:
+            return
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = {'etag': etag, 'payload': payload}
+            while len(self._entries) > self.max_entries:
+                self._entries.pop(next(iter(self._entries)))
+            try:
+                self._save()
+            except OSError as e:
+                logger.warning(f"Could not write task context cache {self.path}: {e}")
@@ -0,0 +1,246 @@
+"""
+Offline stand-in for the AI driver used by `TaskMaster` and `HashRag`.
+
+`FakeAIDriver` implements `gpt_parse`, `open_router_chat`, `open_router_chat_stream`
+and `embeddings` with configurable latency, simulated token usage, deterministic
+embeddings and schema-valid responses synthesized from the requested pydantic parser,
+so planning and memory flows can be benchmarked without calling paid APIs.
+"""
+import hashlib
+import json
+import math
+import random
+import threading
+import time
+import types
+import typing
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Union
+
+import numpy as np
+from pydantic import BaseModel
+
+
+@dataclass(slots=True)
+class SimulatedUsage:
+    completion_tokens: int
+    prompt_tokens: int
+    total_tokens: int
+
+
+@dataclass(slots=True)
+class LatencyProfile:
+    """
+    Latency of one simulated call: a base delay drawn from `distribution` ('fixed',
+    'uniform' or 'lognormal' around `base_seconds`) plus `seconds_per_token` for every
+    completion token.  Samples are clamped to `max_seconds`.
+    """
+    base_seconds: float = 0.05
+    distribution: str = 'lognormal'
+    spread: float = 0.5
+    seconds_per_token: float = 0.0
+    max_seconds: float = 30.0
+
+    def sample(self, rng: random.Random, completion_tokens: int = 0) -> float:
+        if self.distribution == 'fixed':
+            base = self.base_seconds
+        elif self.distribution == 'uniform':
+            base = rng.uniform(self.base_seconds * (1 - self.spread), self.base_seconds * (1 + self.spread))
+        elif self.distribution == 'lognormal':
+            base = self.base_seconds * math.exp(rng.gauss(0.0, self.spread))
+        else:
+            raise ValueError(f"Unknown latency distribution: {self.distribution}")
+        return min(max(base, 0.0) + completion_tokens * self.seconds_per_token, self.max_seconds)
+
+
+DEFAULT_LATENCY = {
+    'gpt_parse': LatencyProfile(base_seconds=0.8, spread=0.35, seconds_per_token=0.004),
+    'open_router_chat': LatencyProfile(base_seconds=2.0, spread=0.4, seconds_per_token=0.012),
+    'embeddings': LatencyProfile(base_seconds=0.08, spread=0.25),
+}
+
+_WORDS = ('verify', 'source', 'data', 'retrieve', 'page', 'validate', 'record', 'funding', 'team', 'repository',
+          'confirm', 'extract', 'summary', 'release', 'criteria', 'output', 'consistency', 'retry', 'schema')
+
+
+class ResponseSynthesizer:
+    """Builds random but schema-valid instances of pydantic models from their field annotations."""
+
+    def __init__(self, rng: random.Random, max_list_items: int = 4, sentence_words: Tuple[int, int] = (6, 18)):
+        self.rng = rng
+        self.max_list_items = max_list_items
+        self.sentence_words = sentence_words
+
+    def sentence(self) -> str:
+        words = [self.rng.choice(_WORDS) for _ in range(self.rng.randint(*self.sentence_words))]
+        return ' '.join(words).capitalize() + '.'
+
+    def value(self, annotation: Any, index: int = 1) -> Any:
+        origin = typing.get_origin(annotation)
+        arguments = typing.get_args(annotation)
+        if annotation is Any:
+            return self.sentence()
+        if origin is typing.Literal:
+            return self.rng.choice(arguments)
+        if origin in (Union, types.UnionType):
+            options = [argument for argument in arguments if argument is not type(None)]
+            return self.value(options[0], index) if options else None
+        if origin in (list, List, set, tuple):
+            item_type = arguments[0] if arguments else str
+            return [self.value(item_type, position) for position in range(1, self.rng.randint(1, self.max_list_items) + 1)]
+        if origin in (dict, Dict):
+            value_type = arguments[1] if len(arguments) == 2 else str
+            return {f'key_{position}': self.value(value_type, position) for position in range(1, 3)}
+        if isinstance(annotation, type):
+            if issubclass(annotation, BaseModel):
+                return self.model(annotation)
+            if issubclass(annotation, bool):
+                return self.rng.random() < 0.5
+            if issubclass(annotation, int):
+                return index
+            if issubclass(annotation, float):
+                return round(self.rng.random(), 4)
+            if issubclass(annotation, str):
+                return self.sentence()
+        return self.sentence()
+
+    def model(self, model_class: type, overrides: Optional[Dict[str, Any]] = None) -> BaseModel:
+        values = {}
+        for index, (name, model_field) in enumerate(model_class.model_fields.items(), start=1):
+            values[name] = self.value(model_field.annotation, index)
+        if overrides:
+            values.update(overrides)
+        return model_class.model_validate(values)
+
+
+class FakeAIDriver:
+    """
+    Drop-in for the AI driver: same attributes (`agent_prompt`, `parser`, `model`) and
+    call signatures, returning `(response, usage)` like the real client.
+
+    `latency` maps a call name ('gpt_parse', 'open_router_chat', 'embeddings') to a
+    `LatencyProfile`; `time_scale` multiplies every sleep (0 disables sleeping while
+    still reporting simulated latency).  Embeddings are derived from a hash of the text,
+    so the same text always maps to the same unit vector.
+    """
+
+    def __init__(self, latency: Optional[Dict[str, LatencyProfile]] = None, seed: int = 0,
+                 time_scale: float = 1.0, embedding_dim: int = 1536, chars_per_token: float = 4.0,
+                 completion_tokens: Tuple[int, int] = (80, 600), stream_chunk_tokens: int = 8,
+                 max_list_items: int = 6):
+        self.agent_prompt = None
+        self.parser = None
+        self.model = None
+        self.latency = {**DEFAULT_LATENCY, **(latency or {})}
+        self.seed = seed
+        self.time_scale = time_scale
+        self.embedding_dim = embedding_dim
+        self.chars_per_token = chars_per_token
+        self.completion_tokens = completion_tokens
+        self.stream_chunk_tokens = stream_chunk_tokens
+        self.max_list_items = max_list_items
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self.stats = {'calls': {}, 'simulated_seconds': 0.0, 'total_tokens': 0}
+
+    def _count_tokens(self, text: Any) -> int:
+        return max(1, int(len(str(text or '')) / self.chars_per_token))
+
+    def _draw(self, call: str) -> Tuple[random.Random, int, float]:
+        """Per-call RNG, completion token count and latency; the shared RNG is only touched under the lock."""
+        with self._lock:
+            call_rng = random.Random(self._rng.getrandbits(64))
+        completion_tokens = call_rng.randint(*self.completion_tokens)
+        return call_rng, completion_tokens, self.latency[call].sample(call_rng, completion_tokens)
+
+    def _record(self, call: str, seconds: float, usage: SimulatedUsage):
+        with self._lock:
+            self.stats['calls'][call] = self.stats['calls'].get(call, 0) + 1
+            self.stats['simulated_seconds'] += seconds
+            self.stats['total_tokens'] += usage.total_tokens
+
+    def _sleep(self, seconds: float):
+        if self.time_scale > 0 and seconds > 0:
+            time.sleep(seconds * self.time_scale)
+
+    def _usage(self, prompt: Any, completion_tokens: int) -> SimulatedUsage:
+        prompt_tokens = self._count_tokens(self.agent_prompt) + self._count_tokens(prompt)
+        return SimulatedUsage(completion_tokens=completion_tokens, prompt_tokens=prompt_tokens,
+                              total_tokens=prompt_tokens + completion_tokens)
+
+    def _synthesizer(self, rng: random.Random) -> ResponseSynthesizer:
+        return ResponseSynthesizer(rng, max_list_items=self.max_list_items)
+
+    def _checkpoint_payload(self, rng: random.Random) -> dict:
+        synthesizer = self._synthesizer(rng)
+        checkpoints = []
+        for iterator in range(1, rng.randint(3, self.max_list_items + 2) + 1):
+            checkpoints.append({'checkpoint_iter': iterator,
+                                'description': synthesizer.sentence(),
+                                'review_criteria': [synthesizer.sentence() for _ in range(rng.randint(1, 3))]})
+        return {'checkpoint': checkpoints}
+
+    def _chat_text(self, rng: random.Random) -> str:
+        payload = self._checkpoint_payload(rng)
+        if '"checkpoint"' in (self.agent_prompt or ''):
+            return '<think>' + self._synthesizer(rng).sentence() + '</think>\n' + json.dumps(payload)
+        sections = []
+        for checkpoint in payload['checkpoint']:
+            criteria = '\n'.join(f'- {criterion}' for criterion in checkpoint['review_criteria'])
+            sections.append(f"### Checkpoint {checkpoint['checkpoint_iter']}\n**Description:**\n"
+                            f"{checkpoint['description']}\n\n**Success Criteria:**\n{criteria}")
+        return '\n\n'.join(sections)
+
+    def gpt_parse(self, prompt: Any = None):
+        if self.parser is None:
+            raise ValueError("FakeAIDriver.gpt_parse requires a parser")
+        rng, completion_tokens, seconds = self._draw('gpt_parse')
+        response = self._synthesizer(rng).model(self.parser)
+        usage = self._usage(prompt, completion_tokens)
+        self._sleep(seconds)
+        self._record('gpt_parse', seconds, usage)
+        return response, usage
+
+    def open_router_chat(self, prompt: Any = None):
+        rng, completion_tokens, seconds = self._draw('open_router_chat')
+        text = self._chat_text(rng)
+        usage = self._usage(prompt, self._count_tokens(text))
+        self._sleep(seconds)
+        self._record('open_router_chat', seconds, usage)
+        return text, usage
+
+    def open_router_chat_stream(self, prompt: Any = None) -> Iterator[Union[str, SimulatedUsage]]:
+        """Yields the response in chunks of ~`stream_chunk_tokens` tokens, then the usage."""
+        rng, _, seconds = self._draw('open_router_chat')
+        text = self._chat_text(rng)
+        usage = self._usage(prompt, self._count_tokens(text))
+        chunk_chars = max(1, int(self.stream_chunk_tokens * self.chars_per_token))
+        chunks = [text[start:start + chunk_chars] for start in range(0, len(text), chunk_chars)]
+        profile = self.latency['open_router_chat']
+        first_token = min(seconds, profile.max_seconds) - usage.completion_tokens * profile.seconds_per_token
+        self._sleep(max(first_token, 0.0))
+        per_chunk = profile.seconds_per_token * self.stream_chunk_tokens
+        for chunk in chunks:
+            self._sleep(per_chunk)
+            yield chunk
+        self._record('open_router_chat', seconds, usage)
+        yield usage
+
+    def embedding_vector(self, text: Any) -> List[float]:
+        digest = hashlib.sha256(str(text).encode('utf-8')).digest()
+        generator = np.random.default_rng(int.from_bytes(digest[:8], 'little'))
+        vector = generator.standard_normal(self.embedding_dim)
+        return (vector / np.linalg.norm(vector)).astype('float32').tolist()
+
+    def embeddings(self, prompt: Any = None):
+        """A single embedding for a string, or a list of embeddings for a list of strings."""
+        _, _, seconds = self._draw('embeddings')
+        if isinstance(prompt, list):
+            vectors = [self.embedding_vector(item) for item in prompt]
+        else:
+            vectors = self.embedding_vector(prompt)
+        prompt_tokens = self._count_tokens(prompt)
+        usage = SimulatedUsage(completion_tokens=0, prompt_tokens=prompt_tokens, total_tokens=prompt_tokens)
+        self._sleep(seconds)
+        self._record('embeddings', seconds, usage)
+        return vectors, usage
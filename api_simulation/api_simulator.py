@@ -1,39 +1,304 @@
+import argparse
+import hashlib
 import json
+import logging
+import os
+import threading
+import time
+from typing import Dict, Optional
 from uuid import uuid4
 
-from flask import Flask, jsonify
+from flask import Flask, g, request
+from loguru import logger
 import datetime
 import random
 
+from api_simulation.ai_simulator import LatencyProfile
+from api_simulation.load_test import EndpointProfile, LoadTest, RequestRecord
+from api_simulation.work_queue import WorkQueue
+from transport import payload_codec
+
 app = Flask(__name__)
+simulation_directory = os.path.dirname(os.path.abspath(__file__))
+
+# set by `enable_load_test`; None serves the static simulated responses without delays or faults
+load_test: Optional[LoadTest] = None
+# set by `enable_work_queue`; assignments then come from leased work packages
+work_queue: Optional[WorkQueue] = None
+# agent_uuid -> assignment, minted per registration in load-test mode
+assignments: Dict[str, dict] = {}
+assignments_lock = threading.Lock()
 
 simulated_agent_uuids = {"agent_uuid": str(uuid4()),
                          "work_package_uuid": str(uuid4()),
                          "agent_tier": "AGENT",
                          "task_uuid": str(uuid4())}
 
-with open('simulated_response.json', 'r') as files:
+with open(os.path.join(simulation_directory, 'simulated_response.json'), 'r') as files:
     simulated_response = json.loads(files.read())
 
-with open('simulated_checkpoints.json', 'r') as files:
+with open(os.path.join(simulation_directory, 'simulated_checkpoints.json'), 'r') as files:
     simulated_checkpoints = json.loads(files.read())
 
 
+def payload_etag(payload) -> str:
+    """Strong ETag over the canonical JSON form of a payload."""
+    canonical = json.dumps(payload, sort_keys=True, separators=(',', ':')).encode('utf-8')
+    return '"' + hashlib.sha256(canonical).hexdigest()[:32] + '"'
+
+
+def request_payload() -> dict:
+    """The request body, whatever its Content-Type (JSON or msgpack) and Content-Encoding."""
+    body = request.get_data()
+    if not body:
+        return {}
+    return payload_codec.decode_payload(body, request.headers.get('Content-Type'),
+                                        request.headers.get('Content-Encoding')) or {}
+
+
+def respond(payload, status: int = 200):
+    """`payload` encoded and compressed as negotiated from the request's Accept headers."""
+    body, headers = payload_codec.encode_response(payload, request.headers.get('Accept'),
+                                                  request.headers.get('Accept-Encoding'))
+    return app.response_class(body, status=status, headers=headers)
+
+
+def cached_part_response(payload):
+    """The payload with its ETag, or 304 when the request's If-None-Match already has it."""
+    etag = payload_etag(payload)
+    if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+        response = app.response_class(status=304)
+    else:
+        response = respond(payload)
+    response.headers['ETag'] = etag
+    return response
+
+
+def enable_load_test(test: Optional[LoadTest]):
+    global load_test
+    load_test = test
+    with assignments_lock:
+        assignments.clear()
+
+
+def enable_work_queue(queue: Optional[WorkQueue]):
+    global work_queue
+    work_queue = queue
+
+
+def queued_assignment(payload: dict, heartbeat: bool) -> dict:
+    """
+    A registration (bootstrap, or the first heartbeat of an agent without an
+    `agent_uuid`) leases the agent a work package; {} when the queue is empty.  A
+    heartbeat from a known agent only ever renews: it extends the lease on the work
+    package it names, or answers `lease_lost` when that lease expired and the package
+    went back to the queue.
+    """
+    agent_uuid = payload.get('agent_uuid')
+    if heartbeat and agent_uuid:
+        g.agent_uuid = agent_uuid
+        if not payload.get('work_package_uuid'):
+            return {'agent_uuid': agent_uuid}
+        item = work_queue.renew(agent_uuid, payload['work_package_uuid'])
+        if item is None:
+            return {'agent_uuid': agent_uuid, 'lease_lost': True}
+    else:
+        agent_uuid = agent_uuid or str(uuid4())
+        g.agent_uuid = agent_uuid
+        item = work_queue.lease(agent_uuid)
+        if item is None:
+            return {}
+    return {"agent_uuid": agent_uuid,
+            "work_package_uuid": item.work_package_uuid,
+            "agent_tier": "AGENT",
+            "task_uuid": item.task_uuid,
+            "lease_expires_in": item.lease_expires - time.time()}
+
+
+def assignment_for(payload: dict, heartbeat: bool = False) -> dict:
+    """
+    The shared simulated assignment, or in load-test mode the calling agent's own: an
+    agent that sends its `agent_uuid` keeps its assignment, any other gets a new one.
+    In work-queue mode assignments are leases, see `queued_assignment`.
+    """
+    if work_queue is not None:
+        return queued_assignment(payload, heartbeat)
+    if load_test is None:
+        return simulated_agent_uuids
+    with assignments_lock:
+        assignment = assignments.get(payload.get('agent_uuid'))
+        if assignment is None:
+            assignment = {"agent_uuid": str(uuid4()),
+                          "work_package_uuid": str(uuid4()),
+                          "agent_tier": "AGENT",
+                          "task_uuid": str(uuid4())}
+            assignments[assignment['agent_uuid']] = assignment
+    g.agent_uuid = assignment['agent_uuid']
+    return assignment
+
+
+@app.before_request
+def inject_load_test_behaviour():
+    if load_test is None or request.path.startswith('/api/simulator/'):
+        return None
+    g.started = time.perf_counter()
+    delay, injected, status = load_test.plan(request.path)
+    time.sleep(delay)
+    if injected:
+        g.injected = injected
+        return respond({'error': f'simulated {injected}'}, status=status)
+    return None
+
+
+@app.after_request
+def log_load_test_request(response):
+    if load_test is not None and 'started' in g:
+        load_test.record(RequestRecord(timestamp=time.time(), endpoint=request.path, status=response.status_code,
+                                       latency_seconds=time.perf_counter() - g.started,
+                                       injected=g.get('injected'), agent_uuid=g.get('agent_uuid')))
+    return response
+
+
+@app.route('/api/simulator/stats', methods=['GET'])
+def simulator_stats():
+    """Per-endpoint request counts, injected faults and latency percentiles of the load test, and work queue state"""
+    stats = {'load_test': load_test is not None}
+    if load_test is not None:
+        with assignments_lock:
+            stats['registrations'] = len(assignments)
+        stats.update(load_test.stats())
+    if work_queue is not None:
+        stats['work_queue'] = work_queue.stats()
+    return respond(stats)
+
+
+@app.route('/api/simulator/requests', methods=['GET'])
+def simulator_requests():
+    """The most recent `limit` requests of the load test"""
+    if load_test is None:
+        return respond([])
+    return respond(load_test.recent(request.args.get('limit', 100, type=int)))
+
+
 @app.route('/api/register_heartbeat', methods=['GET', 'POST'])
 def register_heartbeat():
     """Simulate agent registration and heartbeat"""
-    return jsonify(simulated_agent_uuids), 200
+    return respond(assignment_for(request_payload(), heartbeat=True))
 
 @app.route('/api/get_task_information', methods=['GET', 'POST'])
 def get_task_information():
     """Simulate agent task information request"""
-    return jsonify({"task_information_obj": simulated_response}), 200
+    return cached_part_response({"task_information_obj": simulated_response})
 
 @app.route('/api/check_checkpoint_information', methods=['GET', 'POST'])
 def check_checkpoint_information():
     """Simulate agent checkpoint information request"""
-    return jsonify({"checkpoint_information": simulated_checkpoints}), 200
+    return cached_part_response({"checkpoint_information": simulated_checkpoints})
+
+@app.route('/api/bootstrap', methods=['POST'])
+def bootstrap():
+    """
+    Registration, task information and checkpoints in one round trip.  The request may
+    send `known_etags` ({"<task_uuid>:<work_package_uuid>:<part>": etag}); parts the
+    agent already has come back as {"etag", "not_modified": true} without a body.
+    """
+    payload = request_payload()
+    known_etags = payload.get('known_etags', {})
+    assignment = assignment_for(payload)
+    parts = {'task_information': {"task_information_obj": simulated_response},
+             'checkpoint_information': {"checkpoint_information": simulated_checkpoints}}
+    response = {'assignment': assignment}
+    if not assignment.get('task_uuid'):
+        return respond(response)
+    for part, body in parts.items():
+        etag = payload_etag(body)
+        key = f"{assignment['task_uuid']}:{assignment['work_package_uuid']}:{part}"
+        if known_etags.get(key) == etag:
+            response[part] = {'key': key, 'etag': etag, 'not_modified': True}
+        else:
+            response[part] = {'key': key, 'etag': etag, 'body': body}
+    return respond(response)
+
+
+@app.route('/api/complete_task', methods=['POST'])
+def complete_task():
+    """
+    Reports a work package finished (`status` 'success' or 'failed').  In work-queue mode
+    a completion from an agent that no longer holds the lease is rejected with 409.
+    """
+    payload = request_payload()
+    g.agent_uuid = payload.get('agent_uuid')
+    if work_queue is None:
+        return respond({'accepted': True})
+    accepted = work_queue.complete(payload.get('agent_uuid'), payload.get('work_package_uuid'),
+                                   success=payload.get('status', 'success') == 'success')
+    return respond({'accepted': accepted}, status=200 if accepted else 409)
+
+
+def serve(host: str = '127.0.0.1', port: int = 5000, threads: int = 32):
+    """Serves the app with waitress when it is installed, otherwise werkzeug's threaded server."""
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    try:
+        from waitress import serve as waitress_serve
+    except ImportError:
+        waitress_serve = None
+    if waitress_serve is not None:
+        logger.info(f"Serving simulator with waitress on http://{host}:{port} ({threads} threads)")
+        waitress_serve(app, host=host, port=port, threads=threads)
+    else:
+        from werkzeug.serving import make_server
+        logger.info(f"Serving simulator with werkzeug (threaded) on http://{host}:{port}")
+        make_server(host, port, app, threaded=True).serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Local orchestrator simulator')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5000)
+    parser.add_argument('--load-test', action='store_true',
+                        help='unique assignments, latency and fault injection, request log; production server')
+    parser.add_argument('--threads', type=int, default=32, help='waitress worker threads')
+    parser.add_argument('--latency-ms', type=float, default=20.0, help='base latency of every endpoint')
+    parser.add_argument('--latency-distribution', default='lognormal', choices=['fixed', 'uniform', 'lognormal'])
+    parser.add_argument('--latency-spread', type=float, default=0.5)
+    parser.add_argument('--error-rate', type=float, default=0.0)
+    parser.add_argument('--error-status', type=int, default=503)
+    parser.add_argument('--timeout-rate', type=float, default=0.0)
+    parser.add_argument('--timeout-seconds', type=float, default=60.0)
+    parser.add_argument('--profiles', help='JSON file of per-endpoint profiles, see load_test.py')
+    parser.add_argument('--request-log', help='append every request to this JSON lines file')
+    parser.add_argument('--seed', type=int)
+    parser.add_argument('--work-queue', action='store_true', help='lease work packages from a queue of tasks')
+    parser.add_argument('--tasks', type=int, default=100)
+    parser.add_argument('--packages-per-task', type=int, default=1)
+    parser.add_argument('--lease-seconds', type=float, default=30.0)
+    parser.add_argument('--max-attempts', type=int, default=3)
+    args = parser.parse_args()
+
+    if args.work_queue:
+        queue = WorkQueue(lease_seconds=args.lease_seconds, max_attempts=args.max_attempts)
+        for _ in range(args.tasks):
+            queue.add_task(args.packages_per_task)
+        enable_work_queue(queue)
+    if not args.load_test:
+        if args.work_queue:
+            serve(args.host, args.port, args.threads)
+        else:
+            app.run(host=args.host, port=args.port, debug=True)
+        return
+
+    default = EndpointProfile(latency=LatencyProfile(base_seconds=args.latency_ms / 1000,
+                                                     distribution=args.latency_distribution,
+                                                     spread=args.latency_spread),
+                              error_rate=args.error_rate, error_status=args.error_status,
+                              timeout_rate=args.timeout_rate, timeout_seconds=args.timeout_seconds)
+    if args.profiles:
+        test = LoadTest.from_file(args.profiles, default=default, seed=args.seed, log_path=args.request_log)
+    else:
+        test = LoadTest(default=default, seed=args.seed, log_path=args.request_log)
+    enable_load_test(test)
+    serve(args.host, args.port, args.threads)
 
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    main()
@@ -0,0 +1,150 @@
+"""
+Benchmarks the thinking and memory layers against `FakeAIDriver`.
+
+    python -m api_simulation.benchmark_harness --plans 20 --concurrency 4 --steps 200 --time-scale 0.05
+
+Planning runs `PlanningPipeline` end to end (optionally streaming checkpoints into an
+`AgentMemory` graph); the memory flow pushes normalized steps through AgentMemory and
+HashRag and then runs RAG searches.  Latencies are wall-clock and include `time_scale`.
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+from uuid import uuid4
+
+from loguru import logger
+
+from agent_memory.agent_internal_memory import AgentMemory
+from api_simulation.ai_simulator import FakeAIDriver
+from thinking.planning_pipeline.planning_pipeline import PlanningPipeline
+from thinking.thinking import TaskMaster
+from tracing.metrics import get_metrics
+
+TASK = ('Research the website https://www.project-friday.com, look at everything they have released; '
+        'I want to know if they have a git hub, funding, team size')
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    position = (len(ordered) - 1) * fraction
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarise(name: str, samples: List[float], elapsed: float) -> Dict[str, float]:
+    return {
+        'name': name,
+        'count': len(samples),
+        'p50': percentile(samples, 0.50),
+        'p95': percentile(samples, 0.95),
+        'p99': percentile(samples, 0.99),
+        'mean': statistics.fmean(samples) if samples else 0.0,
+        'throughput': len(samples) / elapsed if elapsed else 0.0,
+    }
+
+
+def print_summary(summary: Dict[str, float], unit: str = 's'):
+    print(f"{summary['name']:<24} n={summary['count']:<6} p50 {summary['p50']:.4f}{unit}  "
+          f"p95 {summary['p95']:.4f}{unit}  p99 {summary['p99']:.4f}{unit}  "
+          f"mean {summary['mean']:.4f}{unit}  {summary['throughput']:.2f}/s")
+
+
+def run_planning(driver: FakeAIDriver, plans: int, concurrency: int, stream: bool) -> Dict[str, Dict[str, float]]:
+    task_master = TaskMaster(AI_CLIENT=driver, provider_limits={'openai': concurrency * 2, 'open_router': concurrency})
+
+    def plan(_):
+        memory = AgentMemory(ai_driver=driver)
+        pipeline = PlanningPipeline(task_master, answer_collector=lambda question: 'Use public sources only.',
+                                    stream_checkpoints=stream, on_checkpoint=memory.add_streamed_checkpoint)
+        report = pipeline.run(TASK)
+        if not stream:
+            for checkpoint in report.checkpoints.checkpoint:
+                memory.add_streamed_checkpoint(checkpoint)
+        return report
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        reports = list(executor.map(plan, range(plans)))
+    elapsed = time.perf_counter() - started
+    task_master.close()
+
+    results = {'plan_total': summarise('plan_total', [report.total_seconds for report in reports], elapsed)}
+    first_checkpoint = [report.first_checkpoint_seconds for report in reports if report.first_checkpoint_seconds]
+    if first_checkpoint:
+        results['first_checkpoint'] = summarise('first_checkpoint', first_checkpoint, elapsed)
+    stage_names = sorted({name for report in reports for name in report.stages})
+    for name in stage_names:
+        durations = [report.stages[name].duration for report in reports if name in report.stages]
+        results[name] = summarise(name, durations, elapsed)
+    return results
+
+
+def run_memory(driver: FakeAIDriver, steps: int, searches: int) -> Dict[str, Dict[str, float]]:
+    memory = AgentMemory(ai_driver=driver)
+    checkpoint = memory.add_streamed_checkpoint({'checkpoint_iter': 1, 'description': 'benchmark',
+                                                 'review_criteria': ['steps recorded']})
+    step = memory.add_to_memory_decorator()(memory.function_normalizer.normalize()(
+        lambda function_arguments: f"Retrieved {function_arguments['index']} records from the source"))
+
+    step_latencies = []
+    previous_step_uuid = checkpoint.checkpoint_uuid
+    started = time.perf_counter()
+    for index in range(steps):
+        step_uuid = str(uuid4())
+        step_started = time.perf_counter()
+        step(checkpoint_uuid=checkpoint.checkpoint_uuid, step_uuid=step_uuid, previous_step_uuid=previous_step_uuid,
+             function_arguments={'index': index})
+        step_latencies.append(time.perf_counter() - step_started)
+        previous_step_uuid = step_uuid
+    step_elapsed = time.perf_counter() - started
+
+    search_latencies = []
+    started = time.perf_counter()
+    for index in range(searches):
+        search_started = time.perf_counter()
+        memory.hash_rag.search(query=f'Retrieved {index} records', k=5)
+        search_latencies.append(time.perf_counter() - search_started)
+    search_elapsed = time.perf_counter() - started
+
+    return {'memory_step': summarise('memory_step', step_latencies, step_elapsed),
+            'rag_search': summarise('rag_search', search_latencies, search_elapsed)}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark TaskMaster and AgentMemory against FakeAIDriver')
+    parser.add_argument('--plans', type=int, default=10)
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--stream', action='store_true', help='stream checkpoints instead of draft + parse')
+    parser.add_argument('--steps', type=int, default=200)
+    parser.add_argument('--searches', type=int, default=50)
+    parser.add_argument('--time-scale', type=float, default=0.05, help='multiplier on simulated latencies')
+    parser.add_argument('--embedding-dim', type=int, default=256)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    logger.remove()
+    driver = FakeAIDriver(seed=args.seed, time_scale=args.time_scale, embedding_dim=args.embedding_dim)
+
+    print(f"planning: {args.plans} plans, concurrency {args.concurrency}, "
+          f"{'streamed' if args.stream else 'draft + parse'} checkpoints, time scale {args.time_scale}")
+    for summary in run_planning(driver, args.plans, args.concurrency, args.stream).values():
+        print_summary(summary)
+
+    print(f"memory: {args.steps} steps, {args.searches} searches")
+    for summary in run_memory(driver, args.steps, args.searches).values():
+        print_summary(summary)
+
+    print("model calls (TaskMaster metrics):")
+    for key, histogram in get_metrics().snapshot('llm.latency_seconds')['histograms'].items():
+        print(f"  {key:<70} n={histogram['count']:<6} p50 {histogram['p50']:.4f}s  p99 {histogram['p99']:.4f}s")
+
+    print(f"driver: {driver.stats}")
+
+
+if __name__ == '__main__':
+    main()
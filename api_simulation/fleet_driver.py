@@ -0,0 +1,163 @@
+"""
+Runs a fleet of `AgentPrime` workers against the simulator's work queue and reports
+throughput, queue wait and lease churn.
+
+    python -m api_simulation.fleet_driver --workers 8 --tasks 200 --work-seconds 0.5 --lease-seconds 5
+
+The simulator runs in this process.  Every worker is its own process running
+`AgentPrime.run_worker` with `FakeAIDriver`, doing a simulated work step sampled from a
+`LatencyProfile`.  `--stall-rate` makes workers stop heartbeating mid-task for longer
+than the lease, so expired leases and rejected completions show up as churn.  Workers
+import `agent_prime/` modules by their flat names, so the driver puts the repository
+root and `agent_prime/` on their PYTHONPATH.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import random
+import subprocess
+import sys
+import threading
+import time
+
+from loguru import logger
+
+from api_simulation import api_simulator
+from api_simulation.ai_simulator import FakeAIDriver, LatencyProfile
+from api_simulation.load_test import EndpointProfile, LoadTest
+from api_simulation.work_queue import WorkQueue
+
+repository_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def run_worker(args):
+    """Entry point of one worker process; prints {'worker', 'completed'} as JSON when the queue runs dry."""
+    logger.remove()
+    logger.add(sys.stderr, level='WARNING')
+    from agent_prime import AgentPrime
+    from api_master import APIMaster
+
+    rng = random.Random(args.seed)
+    work_latency = LatencyProfile(base_seconds=args.work_seconds, spread=0.5)
+    agent = AgentPrime()
+    agent.ai_driver = FakeAIDriver(seed=args.seed, time_scale=0.0, embedding_dim=64)
+    agent.heartbeat_interval = args.heartbeat_interval
+    agent.api_master = APIMaster(args.host, args.port, 'fleet', max_retries=5, backoff_base=0.1)
+
+    async def work(agent_prime):
+        if rng.random() < args.stall_rate:
+            await agent_prime.async_api_master.stop_heartbeat()
+            await asyncio.sleep(args.lease_seconds * 1.5)
+        await asyncio.sleep(work_latency.sample(rng))
+
+    completed = asyncio.run(agent.run_worker(work, idle_timeout=args.idle_timeout, poll_interval=0.2))
+    print(json.dumps({'worker': args.seed, 'completed': completed}), flush=True)
+
+
+def _worker_command(args, port: int, index: int):
+    return [sys.executable, '-m', 'api_simulation.fleet_driver', '--worker', '--host', args.host,
+            '--port', str(port), '--seed', str(args.seed + index), '--work-seconds', str(args.work_seconds),
+            '--stall-rate', str(args.stall_rate), '--lease-seconds', str(args.lease_seconds),
+            '--heartbeat-interval', str(args.heartbeat_interval), '--idle-timeout', str(args.idle_timeout)]
+
+
+def run_fleet(args) -> dict:
+    queue = WorkQueue(lease_seconds=args.lease_seconds, max_attempts=args.max_attempts)
+    for _ in range(args.tasks):
+        queue.add_task(args.packages_per_task)
+    api_simulator.enable_work_queue(queue)
+    api_simulator.enable_load_test(LoadTest(
+        default=EndpointProfile(latency=LatencyProfile(base_seconds=args.latency_ms / 1000),
+                                error_rate=args.error_rate), seed=args.seed))
+
+    from werkzeug.serving import make_server
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server(args.host, args.port, api_simulator.app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='simulator', daemon=True).start()
+    port = server.server_port
+
+    python_path = [repository_root, os.path.join(repository_root, 'agent_prime')]
+    if os.environ.get('PYTHONPATH'):
+        python_path.append(os.environ['PYTHONPATH'])
+    environment = {**os.environ, 'PYTHONPATH': os.pathsep.join(python_path)}
+
+    started = time.time()
+    workers = [subprocess.Popen(_worker_command(args, port, index), cwd=repository_root, env=environment,
+                                stdout=subprocess.PIPE, text=True)
+               for index in range(args.workers)]
+    deadline = started + args.max_seconds
+    next_report = started + args.report_every
+    while not queue.drained and time.time() < deadline:
+        time.sleep(0.2)
+        if time.time() >= next_report:
+            stats = queue.stats()
+            print(f"  {time.time() - started:6.1f}s  completed {stats['completed']:<6} pending {stats['pending']:<6} "
+                  f"leased {stats['active_leases']:<4} expired {stats['expired']}")
+            next_report += args.report_every
+    elapsed = time.time() - started
+
+    per_worker = []
+    for worker in workers:
+        try:
+            output, _ = worker.communicate(timeout=args.idle_timeout + args.lease_seconds * 2 + 10)
+            per_worker.append(json.loads(output.strip().splitlines()[-1])['completed'] if output.strip() else None)
+        except (subprocess.TimeoutExpired, ValueError, KeyError):
+            worker.kill()
+            per_worker.append(None)
+    server.shutdown()
+    return {'elapsed_seconds': elapsed, 'drained': queue.drained, 'per_worker': per_worker,
+            'queue': queue.stats(), 'orchestrator': api_simulator.load_test.stats()}
+
+
+def print_report(args, report: dict):
+    queue = report['queue']
+    wait = queue['queue_wait_seconds']
+    completed = [count for count in report['per_worker'] if count is not None]
+    print(f"fleet: {args.workers} workers, {args.tasks * args.packages_per_task} work packages, "
+          f"lease {args.lease_seconds}s, heartbeat {args.heartbeat_interval}s")
+    print(f"  elapsed             : {report['elapsed_seconds']:.1f}s ({'drained' if report['drained'] else 'timed out'})")
+    print(f"  throughput          : {queue['tasks_per_minute'] or 0:.1f} work packages/min "
+          f"({queue['completed']} completed, {queue['failed']} failed)")
+    print(f"  queue wait          : p50 {wait['p50'] or 0:.3f}s  p95 {wait['p95'] or 0:.3f}s  "
+          f"p99 {wait['p99'] or 0:.3f}s  max {wait['max'] or 0:.3f}s")
+    print(f"  lease churn         : {queue['lease_churn']} (expired {queue['expired']}, rejected completions "
+          f"{queue['stale_completions']}, lost on heartbeat {queue['lease_lost']}, requeued {queue['requeued']})")
+    if completed:
+        print(f"  per worker          : min {min(completed)}  max {max(completed)}  "
+              f"({len(report['per_worker']) - len(completed)} without a report)")
+    for endpoint, latency in sorted(report['orchestrator']['latency_seconds'].items()):
+        print(f"  {endpoint:<28}: n={latency['count']:<6} p50 {latency['p50']:.4f}s  p99 {latency['p99']:.4f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run AgentPrime workers against the simulated work queue')
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--tasks', type=int, default=100)
+    parser.add_argument('--packages-per-task', type=int, default=1)
+    parser.add_argument('--work-seconds', type=float, default=0.5, help='median simulated work per package')
+    parser.add_argument('--lease-seconds', type=float, default=10.0)
+    parser.add_argument('--heartbeat-interval', type=float, default=3.0)
+    parser.add_argument('--max-attempts', type=int, default=3)
+    parser.add_argument('--stall-rate', type=float, default=0.0, help='share of packages where the worker stalls')
+    parser.add_argument('--latency-ms', type=float, default=5.0, help='base orchestrator latency')
+    parser.add_argument('--error-rate', type=float, default=0.0, help='share of orchestrator calls that fail')
+    parser.add_argument('--idle-timeout', type=float, default=2.0, help='workers exit after this long without work')
+    parser.add_argument('--max-seconds', type=float, default=600.0)
+    parser.add_argument('--report-every', type=float, default=5.0)
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=0)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+    logger.remove()
+    print_report(args, run_fleet(args))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,120 @@
+"""
+Load-test behaviour for `api_simulator`: per-endpoint latency, injected errors and
+timeouts, and a request log with per-endpoint latency histograms.
+
+A profile file maps endpoints to `EndpointProfile` fields, e.g.
+
+    {"default": {"latency": {"base_seconds": 0.02}, "error_rate": 0.01},
+     "/api/bootstrap": {"latency": {"base_seconds": 0.2, "spread": 0.8}, "timeout_rate": 0.005}}
+"""
+import json
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import asdict, dataclass, field
+from typing import Deque, Dict, List, Optional
+
+from api_simulation.ai_simulator import LatencyProfile
+from tracing.metrics import MetricsRegistry
+
+
+@dataclass(slots=True)
+class EndpointProfile:
+    """
+    How one endpoint misbehaves.  Every request is delayed by a `latency` sample; then
+    `timeout_rate` of requests hang for `timeout_seconds` (longer than a client's read
+    timeout) before answering 504, and `error_rate` answer `error_status` at once.
+    """
+    latency: LatencyProfile = field(default_factory=lambda: LatencyProfile(base_seconds=0.02, spread=0.5))
+    error_rate: float = 0.0
+    error_status: int = 503
+    timeout_rate: float = 0.0
+    timeout_seconds: float = 60.0
+
+    @classmethod
+    def from_dict(cls, values: dict, base: Optional['EndpointProfile'] = None) -> 'EndpointProfile':
+        merged = asdict(base) if base is not None else {}
+        latency = {**merged.pop('latency', {}), **values.get('latency', {})}
+        merged.update({key: value for key, value in values.items() if key != 'latency'})
+        return cls(latency=LatencyProfile(**latency), **merged)
+
+
+@dataclass(slots=True)
+class RequestRecord:
+    timestamp: float
+    endpoint: str
+    status: int
+    latency_seconds: float
+    injected: Optional[str] = None
+    agent_uuid: Optional[str] = None
+
+
+class LoadTest:
+    """
+    Decides, per request, how long to wait and whether to fail, and keeps the last
+    `log_size` requests (optionally appended to `log_path` as JSON lines).
+    """
+
+    def __init__(self, default: Optional[EndpointProfile] = None, endpoints: Dict[str, EndpointProfile] = None,
+                 seed: Optional[int] = None, log_size: int = 10_000, log_path: Optional[str] = None):
+        self.default = default or EndpointProfile()
+        self.endpoints = dict(endpoints or {})
+        self.log: Deque[RequestRecord] = deque(maxlen=log_size)
+        self.log_path = log_path
+        self.metrics = MetricsRegistry()
+        self.started = time.time()
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path: str, **kwargs) -> 'LoadTest':
+        with open(path, 'r') as file:
+            profiles = json.load(file)
+        default = EndpointProfile.from_dict(profiles.pop('default', {}), kwargs.pop('default', None))
+        endpoints = {endpoint: EndpointProfile.from_dict(values, default) for endpoint, values in profiles.items()}
+        return cls(default=default, endpoints=endpoints, **kwargs)
+
+    def profile(self, endpoint: str) -> EndpointProfile:
+        return self.endpoints.get(endpoint, self.default)
+
+    def plan(self, endpoint: str):
+        """(delay seconds, injected fault or None, status to answer with or None) for one request."""
+        profile = self.profile(endpoint)
+        with self._lock:
+            delay = profile.latency.sample(self._rng)
+            roll = self._rng.random()
+        if roll < profile.timeout_rate:
+            return delay + profile.timeout_seconds, 'timeout', 504
+        if roll < profile.timeout_rate + profile.error_rate:
+            return delay, 'error', profile.error_status
+        return delay, None, None
+
+    def record(self, record: RequestRecord):
+        self.metrics.observe('simulator.latency_seconds', record.latency_seconds, endpoint=record.endpoint)
+        self.metrics.increment('simulator.requests', endpoint=record.endpoint, status=str(record.status))
+        if record.injected:
+            self.metrics.increment('simulator.injected', endpoint=record.endpoint, fault=record.injected)
+        with self._lock:
+            self.log.append(record)
+            if self.log_path:
+                with open(self.log_path, 'a') as file:
+                    file.write(json.dumps(asdict(record)) + '\n')
+
+    def recent(self, limit: int = 100) -> List[dict]:
+        with self._lock:
+            records = list(self.log)[-limit:] if limit > 0 else []
+        return [asdict(record) for record in records]
+
+    def stats(self) -> dict:
+        snapshot = self.metrics.snapshot()
+        return {
+            'uptime_seconds': time.time() - self.started,
+            'requests': {series['labels']['endpoint'] + ' ' + series['labels']['status']: series['value']
+                         for key, series in snapshot['counters'].items() if key.startswith('simulator.requests')},
+            'injected': {series['labels']['endpoint'] + ' ' + series['labels']['fault']: series['value']
+                         for key, series in snapshot['counters'].items() if key.startswith('simulator.injected')},
+            'latency_seconds': {series['labels']['endpoint']: {name: series[name] for name in
+                                                               ('count', 'mean', 'p50', 'p95', 'p99', 'max')}
+                                for series in snapshot['histograms'].values()},
+        }
@@ -0,0 +1,113 @@
+"""
+Measures orchestrator payload size and encode/decode time for every body format and
+content encoding `transport.payload_codec` supports.
+
+    python -m api_simulation.payload_benchmark --scales 1 100 1000 --repeats 5
+
+Task contexts are `simulated_response.json` grown to `scale` group tasks, successors,
+checkpoints and step results, with text drawn from the simulated payloads so it
+compresses roughly like real task context.
+"""
+import argparse
+import copy
+import json
+import os
+import random
+import statistics
+import time
+from uuid import UUID
+
+from transport import payload_codec
+
+simulation_directory = os.path.dirname(os.path.abspath(__file__))
+
+
+def _load(name: str) -> dict:
+    with open(os.path.join(simulation_directory, name), 'r') as file:
+        return json.load(file)
+
+
+def synthetic_task_context(scale: int, seed: int = 0) -> dict:
+    """A `get_task_information`-shaped payload (plus checkpoints and step results) grown to `scale`."""
+    rng = random.Random(seed)
+    base = _load('simulated_response.json')
+    checkpoints = _load('simulated_checkpoints.json')['checkpoint']
+    words = ' '.join(json.dumps([base, checkpoints])).replace('"', ' ').split()
+
+    def sentence(length: int) -> str:
+        return ' '.join(rng.choice(words) for _ in range(length))
+
+    def uuid() -> str:
+        return str(UUID(int=rng.getrandbits(128), version=4))
+
+    context = copy.deepcopy(base)
+    group_task = context['holistic_context']['group_tasks'][0]
+    successor = context['linear_context']['successors'][0]
+    context['holistic_context']['group_tasks'] = [
+        {**group_task, 'task_uuid': uuid(), 'task_action_type_reason': sentence(18)} for _ in range(scale)]
+    context['linear_context']['successors'] = [
+        {**successor, 'task_uuid': uuid(), 'task_action_type_reason': sentence(14)} for _ in range(scale)]
+    context['checkpoint_information'] = {'checkpoint': [
+        {**checkpoints[index % len(checkpoints)], 'checkpoint_iter': index + 1, 'description': sentence(40)}
+        for index in range(scale)]}
+    context['step_results'] = [
+        {'step_uuid': uuid(), 'checkpoint_uuid': uuid(), 'status': 'success', 'execution_duration': rng.random(),
+         'cost': {'prompt_tokens': rng.randint(100, 4000), 'completion_tokens': rng.randint(10, 800)},
+         'reasoning': sentence(60), 'function_output': sentence(120)}
+        for _ in range(scale)]
+    return {'task_information_obj': context}
+
+
+def _median_seconds(call, repeats: int) -> float:
+    timings = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        call()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings)
+
+
+def measure(payload: dict, content_type: str, encoding: str, repeats: int = 5) -> dict:
+    body, headers = payload_codec.encode_payload(payload, content_type, encoding, min_bytes=0)
+    content_encoding = headers.get('Content-Encoding')
+    decoded = payload_codec.decode_payload(body, content_type, content_encoding)
+    assert decoded == payload, f"{content_type} + {encoding} did not round trip"
+    return {
+        'bytes': len(body),
+        'encode_seconds': _median_seconds(
+            lambda: payload_codec.encode_payload(payload, content_type, encoding, min_bytes=0), repeats),
+        'decode_seconds': _median_seconds(
+            lambda: payload_codec.decode_payload(body, content_type, content_encoding), repeats),
+    }
+
+
+def run_benchmark(scales, repeats: int = 5, seed: int = 0):
+    encodings = [payload_codec.IDENTITY] + payload_codec.CONTENT_ENCODINGS
+    for scale in scales:
+        payload = synthetic_task_context(scale, seed)
+        baseline = None
+        print(f"scale {scale}:")
+        for content_type in payload_codec.CONTENT_TYPES[::-1]:
+            for encoding in encodings:
+                result = measure(payload, content_type, encoding, repeats)
+                baseline = baseline or result['bytes']
+                print(f"  {content_type.split('/')[-1] + ' + ' + encoding:<20} "
+                      f"{result['bytes'] / 1e3:10.1f} kB ({100 * result['bytes'] / baseline:5.1f}%)  "
+                      f"encode {result['encode_seconds'] * 1e3:8.2f} ms  decode {result['decode_seconds'] * 1e3:8.2f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark orchestrator payload formats and compression')
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 100, 1000])
+    parser.add_argument('--repeats', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    if payload_codec.zstandard is None:
+        print("zstandard is not installed, zstd is skipped")
+    if payload_codec.msgpack is None:
+        print("msgpack is not installed, msgpack is skipped")
+    run_benchmark(args.scales, args.repeats, args.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,152 @@
+"""
+Work queue behind `api_simulator`'s work-queue mode: tasks split into work packages,
+leased to one agent at a time.  A lease lasts `lease_seconds` and is renewed by the
+agent's heartbeats; an expired lease puts the work package back at the front of the
+queue, and a completion from an agent that no longer holds the lease is rejected.
+"""
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Optional
+from uuid import uuid4
+
+from tracing.metrics import Histogram
+
+
+@dataclass(slots=True)
+class WorkItem:
+    task_uuid: str
+    work_package_uuid: str
+    enqueued_at: float
+    attempts: int = 0
+    leased_by: Optional[str] = None
+    leased_at: Optional[float] = None
+    lease_expires: Optional[float] = None
+    completed_at: Optional[float] = None
+    status: str = 'pending'
+
+
+class WorkQueue:
+    def __init__(self, lease_seconds: float = 30.0, max_attempts: int = 3):
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        self.items: Dict[str, WorkItem] = {}
+        self.leases: Dict[str, WorkItem] = {}
+        self.queue_wait = Histogram()
+        self.lease_duration = Histogram()
+        self.counters = {'leases_granted': 0, 'renewed': 0, 'expired': 0, 'lease_lost': 0, 'completed': 0,
+                         'failed': 0, 'requeued': 0, 'stale_completions': 0}
+        self.first_lease_at: Optional[float] = None
+        self.last_completed_at: Optional[float] = None
+        self._pending: Deque[WorkItem] = deque()
+        self._lock = threading.Lock()
+
+    def add_task(self, work_packages: int = 1, task_uuid: Optional[str] = None) -> str:
+        task_uuid = task_uuid or str(uuid4())
+        now = time.time()
+        with self._lock:
+            for _ in range(work_packages):
+                item = WorkItem(task_uuid=task_uuid, work_package_uuid=str(uuid4()), enqueued_at=now)
+                self.items[item.work_package_uuid] = item
+                self._pending.append(item)
+        return task_uuid
+
+    def _release(self, item: WorkItem, now: float, front: bool = False):
+        self.leases.pop(item.leased_by, None)
+        self.lease_duration.observe(now - item.leased_at)
+        item.leased_by = item.leased_at = item.lease_expires = None
+        item.status = 'pending'
+        item.enqueued_at = now
+        if front:
+            self._pending.appendleft(item)
+        else:
+            self._pending.append(item)
+
+    def _expire(self, now: float):
+        for item in [item for item in self.leases.values() if item.lease_expires <= now]:
+            self.counters['expired'] += 1
+            self._release(item, now, front=True)
+
+    def lease(self, agent_uuid: str) -> Optional[WorkItem]:
+        """The agent's current lease, or the next pending work package; None when the queue is empty."""
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            item = self.leases.get(agent_uuid)
+            if item is not None:
+                return item
+            if not self._pending:
+                return None
+            item = self._pending.popleft()
+            item.attempts += 1
+            item.leased_by = agent_uuid
+            item.leased_at = now
+            item.lease_expires = now + self.lease_seconds
+            item.status = 'leased'
+            self.leases[agent_uuid] = item
+            self.counters['leases_granted'] += 1
+            self.queue_wait.observe(now - item.enqueued_at)
+            self.first_lease_at = self.first_lease_at or now
+            return item
+
+    def renew(self, agent_uuid: str, work_package_uuid: str) -> Optional[WorkItem]:
+        """Extends the agent's lease on `work_package_uuid`; None when the lease was lost."""
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            item = self.leases.get(agent_uuid)
+            if item is None or item.work_package_uuid != work_package_uuid:
+                self.counters['lease_lost'] += 1
+                return None
+            item.lease_expires = now + self.lease_seconds
+            self.counters['renewed'] += 1
+            return item
+
+    def complete(self, agent_uuid: str, work_package_uuid: str, success: bool = True) -> bool:
+        """
+        Marks the agent's leased work package done (or failed, which re-queues it until
+        `max_attempts`).  Returns False when the agent no longer holds the lease.
+        """
+        now = time.time()
+        with self._lock:
+            self._expire(now)
+            item = self.items.get(work_package_uuid)
+            if item is not None and item.status in ('completed', 'failed') and item.leased_by == agent_uuid:
+                return True
+            if item is None or self.leases.get(agent_uuid) is not item:
+                self.counters['stale_completions'] += 1
+                return False
+            if not success and item.attempts < self.max_attempts:
+                self.counters['requeued'] += 1
+                self._release(item, now)
+                return True
+            del self.leases[agent_uuid]
+            self.lease_duration.observe(now - item.leased_at)
+            item.status = 'completed' if success else 'failed'
+            item.completed_at = now
+            self.counters['completed' if success else 'failed'] += 1
+            self.last_completed_at = now
+            return True
+
+    @property
+    def drained(self) -> bool:
+        with self._lock:
+            self._expire(time.time())
+            return not self._pending and not self.leases
+
+    def stats(self) -> dict:
+        with self._lock:
+            self._expire(time.time())
+            finished = self.counters['completed'] + self.counters['failed']
+            elapsed = (self.last_completed_at - self.first_lease_at) if finished and self.first_lease_at else None
+            return {
+                'pending': len(self._pending),
+                'active_leases': len(self.leases),
+                **self.counters,
+                'lease_churn': self.counters['expired'] + self.counters['stale_completions'],
+                # work packages finished per minute, from the first lease to the last completion
+                'tasks_per_minute': 60 * finished / elapsed if elapsed else None,
+                'queue_wait_seconds': self.queue_wait.snapshot(),
+                'lease_seconds': self.lease_duration.snapshot(),
+            }
@@ -0,0 +1,51 @@
+from typing import Callable, Dict, Optional
+
+from agent_memory.data_classes.normalizer_dataclasses import FunctionType
+
+
+def agent_step(function_key: str, label: FunctionType, arguments: Optional[str] = None):
+    """
+    Marks an agent method as a memory-tracked step.  The method is registered under
+    `function_key` when the agent class is created and wrapped with the memory and
+    normalizer decorators once per agent instance by `build_step_table`.
+    """
+
+    def decorator(func: Callable) -> Callable:
+        func.function_type_label = label.value
+        func.agent_step_key = function_key
+        func.agent_step_arguments = arguments
+        return func
+
+    return decorator
+
+
+def register_agent_steps(agent_class):
+    """
+    Collects the `agent_step` methods of an agent class into `agent_class.step_registry`
+    ({function_key: method name}).  Called once from the agent's `create_*_agent` factory.
+    """
+    registry = {}
+    arguments = {}
+    for klass in reversed(agent_class.__mro__):
+        for name, member in vars(klass).items():
+            function_key = getattr(member, 'agent_step_key', None)
+            if function_key is not None:
+                registry[function_key] = name
+                if member.agent_step_arguments:
+                    arguments[function_key] = member.agent_step_arguments
+    agent_class.step_registry = registry
+    agent_class.step_arguments = arguments
+    return agent_class
+
+
+def build_step_table(agent_instance, memory) -> Dict[str, Callable]:
+    """
+    Builds the dispatch table for one agent instance: each registered step method is
+    wrapped with `add_to_memory_decorator` and `normalize` exactly once.
+    """
+    add_to_memory = memory.add_to_memory_decorator()
+    normalize = memory.function_normalizer.normalize()
+    return {
+        function_key: add_to_memory(normalize(getattr(agent_instance, method_name)))
+        for function_key, method_name in agent_instance.step_registry.items()
+    }
@@ -5,6 +5,7 @@ from typing import Dict
 from uuid import uuid4
 
 from agent_memory.data_classes.normalizer_dataclasses import FunctionType
+from speciality_agents.agent_steps import agent_step, build_step_table, register_agent_steps
 
 
 
@@ -12,6 +13,7 @@ def create_example_agent():
     class ExampleAgent:
         def __init__(self, data=None):
             self.agent = data
+            self._step_table = build_step_table(self, self.agent.memory) if data is not None else {}
 
         def run(self):
             # Implementation here
@@ -21,94 +23,72 @@ def create_example_agent():
         def _map_function(self):
             return {
                 'EXAMPLE_FUNCTION': self.example_function,
+                **self._step_table,
             }
 
         @staticmethod
         def _map_arguments():
             return {
                 'EXAMPLE_FUNCTION': 'example_function_basemodel',
+                **ExampleAgent.step_arguments,
             }
 
         def _run_function(self, handler, args_dict, context):
             return handler(**args_dict)
 
-        def single_function_call(self, checkpoint_uuid: str, step_uuid: str, previous_step_uuid: str, function_arguments: dict):
-            @self.agent.memory.add_to_memory_decorator()
-            @self.agent.memory.function_normalizer.normalize()
-            @self.agent.function_type_label(FunctionType.REASONING.value)
-            def _single_function_call(*args, **kwargs):
-                self.agent.thinking.task = function_arguments.get('checkpoint')
-                previous_function = function_arguments.get('previous_function')
-                previous_function_output = function_arguments.get('previous_function_output')
-                task = function_arguments.get('task')
-                single_function_call, cost =\
-                    self.agent.thinking.single_function_call(replacement_items=[previous_function, previous_function_output, task])
-                return single_function_call, cost
-            return  _single_function_call(
+        def _run_step(self, function_key: str, checkpoint_uuid: str, step_uuid: str, previous_step_uuid: str,
+                      function_arguments: dict):
+            return self._step_table[function_key](
                 checkpoint_uuid=checkpoint_uuid,
                 step_uuid=step_uuid,
                 previous_step_uuid=previous_step_uuid,
                 function_arguments=function_arguments
             )
 
-        def arguments_for_single_function_call(self, checkpoint_uuid: str, step_uuid: str, previous_step_uuid: str, function_arguments: dict):
-            @self.agent.memory.add_to_memory_decorator()
-            @self.agent.memory.function_normalizer.normalize()
-            @self.agent.function_type_label(FunctionType.REASONING.value)
-            def _arguments_for_single_function_call(*args, **kwargs):
-                self.agent.thinking.task = function_arguments.get('checkpoint')
-                previous_function = function_arguments.get('previous_function')
-                previous_function_output = function_arguments.get('previous_function_output')
-                task = function_arguments.get('task')
-                map_to_args, cost =\
-                    self.agent.thinking.arguments_for_single_function_call(replacement_items=[previous_function, previous_function_output, task])
-                return map_to_args, cost
-            return  _arguments_for_single_function_call(
-                checkpoint_uuid=checkpoint_uuid,
-                step_uuid=step_uuid,
-                previous_step_uuid=previous_step_uuid,
-                function_arguments=function_arguments
-            )
-
-        def example_function(self, checkpoint_uuid: str, step_uuid: str, previous_step_uuid: str, function_arguments: dict):
-            @self.agent.memory.add_to_memory_decorator()
-            @self.agent.memory.function_normalizer.normalize()
-            @self.agent.memory.function_type_label(FunctionType.DATA_PROCESSING.value)
-            def _example_function_processing(*args, **kwargs):
-                #self.agent.thinking.example_thinking()
-                return 5
-
-            @self.agent.memory.add_to_memory_decorator()
-            @self.agent.memory.function_normalizer.normalize()
-            @self.agent.memory.function_type_label(FunctionType.DATA_PROCESSING.value)
-            def _example_function_thinking(*args, **kwargs):
-                return 50
-
-            def _run_test_function(*args, **kwargs):
-                _example_function_processing(
-                    checkpoint_uuid=checkpoint_uuid,
-                    step_uuid=step_uuid,
-                    previous_step_uuid=previous_step_uuid,
-                    function_arguments=function_arguments
-                )
-                _example_function_thinking(
-                    checkpoint_uuid=checkpoint_uuid,
-                    step_uuid=str(uuid4()),
-                    previous_step_uuid=step_uuid,
-                    function_arguments=function_arguments
-                )
-
-            return _run_test_function(
-                checkpoint_uuid=checkpoint_uuid,
-                step_uuid=step_uuid,
-                previous_step_uuid=previous_step_uuid,
-                function_arguments=function_arguments
-            )
+        @agent_step('SINGLE_FUNCTION_CALL', FunctionType.REASONING)
+        def _single_function_call(self, function_arguments: dict):
+            self.agent.thinking.task = function_arguments.get('checkpoint')
+            previous_function = function_arguments.get('previous_function')
+            previous_function_output = function_arguments.get('previous_function_output')
+            task = function_arguments.get('task')
+            single_function_call, cost =\
+                self.agent.thinking.single_function_call(replacement_items=[previous_function, previous_function_output, task])
+            return single_function_call, cost
+
+        @agent_step('ARGUMENTS_FOR_SINGLE_FUNCTION_CALL', FunctionType.REASONING)
+        def _arguments_for_single_function_call(self, function_arguments: dict):
+            self.agent.thinking.task = function_arguments.get('checkpoint')
+            previous_function = function_arguments.get('previous_function')
+            previous_function_output = function_arguments.get('previous_function_output')
+            task = function_arguments.get('task')
+            map_to_args, cost =\
+                self.agent.thinking.arguments_for_single_function_call(replacement_items=[previous_function, previous_function_output, task])
+            return map_to_args, cost
+
+        @agent_step('EXAMPLE_FUNCTION_PROCESSING', FunctionType.DATA_PROCESSING)
+        def _example_function_processing(self, function_arguments: dict):
+            #self.agent.thinking.example_thinking()
+            return 5
+
+        @agent_step('EXAMPLE_FUNCTION_THINKING', FunctionType.DATA_PROCESSING)
+        def _example_function_thinking(self, function_arguments: dict):
+            return 50
 
+        def single_function_call(self, checkpoint_uuid: str, step_uuid: str, previous_step_uuid: str, function_arguments: dict):
+            return self._run_step('SINGLE_FUNCTION_CALL', checkpoint_uuid, step_uuid, previous_step_uuid,
+                                  function_arguments)
 
+        def arguments_for_single_function_call(self, checkpoint_uuid: str, step_uuid: str, previous_step_uuid: str, function_arguments: dict):
+            return self._run_step('ARGUMENTS_FOR_SINGLE_FUNCTION_CALL', checkpoint_uuid, step_uuid,
+                                  previous_step_uuid, function_arguments)
 
+        def example_function(self, checkpoint_uuid: str, step_uuid: str, previous_step_uuid: str, function_arguments: dict):
+            self._run_step('EXAMPLE_FUNCTION_PROCESSING', checkpoint_uuid, step_uuid, previous_step_uuid,
+                           function_arguments)
+            self._run_step('EXAMPLE_FUNCTION_THINKING', checkpoint_uuid, str(uuid4()), step_uuid,
+                           function_arguments)
 
-    return ExampleAgent
+    return register_agent_steps(ExampleAgent)
 
 if __name__ == '__main__':
     run = create_example_agent()
@@ -0,0 +1,101 @@
+import dataclasses
+import gc
+import io
+import json
+import time
+import tracemalloc
+from datetime import datetime
+from uuid import uuid4
+
+from agent_memory.data_classes.normalizer_dataclasses import FunctionCost, FunctionExecutionOutput
+from agent_memory.data_classes.normalizer_codec import iter_execution_outputs, write_execution_outputs
+
+
+def _unslotted_record_class():
+    """Rebuilds FunctionExecutionOutput as a plain (dict backed) dataclass for comparison."""
+    record_fields = []
+    for f in dataclasses.fields(FunctionExecutionOutput):
+        if not f.init:
+            continue
+        if f.default is not dataclasses.MISSING:
+            record_fields.append((f.name, f.type, dataclasses.field(default=f.default)))
+        elif f.default_factory is not dataclasses.MISSING:
+            record_fields.append((f.name, f.type, dataclasses.field(default_factory=f.default_factory)))
+        else:
+            record_fields.append((f.name, f.type))
+    return dataclasses.make_dataclass('UnslottedFunctionExecutionOutput', record_fields)
+
+
+def _record_kwargs(i: int) -> dict:
+    now = datetime.now()
+    return dict(
+        function_name='example_function',
+        function_signature='(*args, **kwargs)',
+        function_type='data_processing',
+        reasoning=None,
+        data_processing='data_processing',
+        processed_data=None,
+        execution_start=now,
+        execution_end=now,
+        execution_duration=0.000125,
+        step_uuid=str(uuid4()),
+        checkpoint_uuid='97e35266-3510-44f2-8d52-bc110da4a0f2',
+        previous_step_uuid=str(uuid4()),
+        status='success',
+        function_output=i,
+        cost=[FunctionCost(completion_tokens=120, prompt_tokens=900, total_tokens=1020)],
+        function_output_type='int',
+        is_empty=False,
+        args_provided={'args': (), 'kwargs': {'function_arguments': {}}},
+    )
+
+
+def _measure_allocation(record_class, kwargs_list):
+    gc.collect()
+    tracemalloc.start()
+    start = time.perf_counter()
+    records = [record_class(**kwargs) for kwargs in kwargs_list]
+    elapsed = time.perf_counter() - start
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return records, current, elapsed
+
+
+def run_benchmark(steps: int = 100_000):
+    kwargs_list = [_record_kwargs(i) for i in range(steps)]
+
+    unslotted, unslotted_bytes, unslotted_time = _measure_allocation(_unslotted_record_class(), kwargs_list)
+    del unslotted
+    slotted, slotted_bytes, slotted_time = _measure_allocation(FunctionExecutionOutput, kwargs_list)
+
+    print(f"{steps} step records")
+    print(f"  dataclass (dict)  : {unslotted_bytes / 1e6:8.1f} MB  {unslotted_time:6.3f}s")
+    print(f"  dataclass (slots) : {slotted_bytes / 1e6:8.1f} MB  {slotted_time:6.3f}s  "
+          f"({100 * (1 - slotted_bytes / unslotted_bytes):.1f}% less)")
+
+    start = time.perf_counter()
+    json_size = sum(len(json.dumps(record.to_dict(), default=str)) for record in slotted)
+    json_time = time.perf_counter() - start
+
+    buffer = io.BytesIO()
+    start = time.perf_counter()
+    msgpack_size = write_execution_outputs(slotted, buffer)
+    encode_time = time.perf_counter() - start
+    buffer.seek(0)
+    start = time.perf_counter()
+    decoded = sum(1 for _ in iter_execution_outputs(buffer))
+    decode_time = time.perf_counter() - start
+
+    print(f"  to_dict + json    : {json_size / 1e6:8.1f} MB  {json_time:6.3f}s encode")
+    print(f"  msgpack codec     : {msgpack_size / 1e6:8.1f} MB  {encode_time:6.3f}s encode  "
+          f"{decode_time:6.3f}s decode ({decoded} records)")
+
+    for label in ('first', 'cached'):
+        start = time.perf_counter()
+        for record in slotted:
+            record.to_embedding_text()
+        print(f"  embedding text ({label:6}): {time.perf_counter() - start:6.3f}s")
+
+
+if __name__ == '__main__':
+    run_benchmark()
@@ -0,0 +1,8 @@
+import os
+import sys
+
+# agent_prime/ modules import each other by flat name, as when run from the IDE with both source roots
+repository_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+for path in (repository_root, os.path.join(repository_root, 'agent_prime')):
+    if path not in sys.path:
+        sys.path.insert(0, path)
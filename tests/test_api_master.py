@@ -0,0 +1,109 @@
+import threading
+import time
+
+import pytest
+import requests
+from werkzeug.serving import make_server
+
+from api_master import APIMaster, CircuitBreaker, CircuitOpenError
+from api_simulation import api_simulator
+from api_simulation.ai_simulator import LatencyProfile
+from api_simulation.load_test import EndpointProfile, LoadTest
+from tracing.metrics import MetricsRegistry
+
+
+@pytest.fixture(scope='module')
+def simulator_port():
+    server = make_server('127.0.0.1', 0, api_simulator.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield server.server_port
+    server.shutdown()
+
+
+@pytest.fixture
+def faults():
+    """Load test whose `plan` answers from `faults.plans` (fault names, None = normal) in order."""
+    test = LoadTest(default=EndpointProfile(latency=LatencyProfile(base_seconds=0.0, distribution='fixed')))
+    test.plans = []
+    statuses = {'error': 503, 'timeout': 504}
+
+    def plan(endpoint):
+        injected = test.plans.pop(0) if test.plans else None
+        return 0.0, injected, statuses.get(injected)
+
+    test.plan = plan
+    api_simulator.enable_load_test(test)
+    yield test
+    api_simulator.enable_load_test(None)
+
+
+def make_client(port, **kwargs):
+    options = dict(max_retries=2, backoff_base=0.001, breaker_failure_threshold=3, breaker_reset_timeout=0.2,
+                   metrics=MetricsRegistry())
+    options.update(kwargs)
+    return APIMaster('127.0.0.1', port, 'test', **options)
+
+
+def registered_client(port, **kwargs):
+    """A client past its first registration, whose heartbeats are safe to retry."""
+    client = make_client(port, **kwargs)
+    client.register_heartbeat()
+    return client
+
+
+def test_retries_transient_errors(simulator_port, faults):
+    client = registered_client(simulator_port)
+    faults.plans = ['error', 'error']
+    assert client.register_heartbeat()['agent_uuid'] == client.agent_uuid
+    assert client.metrics.counter('api.retries', endpoint='/api/register_heartbeat') == 2
+    assert client.circuit_breaker.state == CircuitBreaker.CLOSED
+
+
+def test_circuit_opens_then_recovers(simulator_port, faults):
+    client = registered_client(simulator_port)
+    faults.plans = ['error'] * 3
+    with pytest.raises(requests.HTTPError):
+        client.register_heartbeat()
+    assert client.circuit_breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        client.register_heartbeat()
+
+    time.sleep(0.25)
+    assert client.register_heartbeat()['agent_uuid']
+    assert client.circuit_breaker.state == CircuitBreaker.CLOSED
+
+
+def test_unexpected_request_error_settles_half_open_trial(simulator_port, faults):
+    client = registered_client(simulator_port)
+    faults.plans = ['error'] * 3
+    with pytest.raises(requests.HTTPError):
+        client.register_heartbeat()
+    time.sleep(0.25)
+
+    post = client.session.post
+
+    def undecodable(*args, **kwargs):
+        raise requests.exceptions.ContentDecodingError('bad gzip body')
+
+    client.session.post = undecodable
+    with pytest.raises(requests.exceptions.ContentDecodingError):
+        client.register_heartbeat()
+    assert client.circuit_breaker.state == CircuitBreaker.OPEN
+
+    client.session.post = post
+    time.sleep(0.25)
+    assert client.register_heartbeat()['agent_uuid']
+    assert client.circuit_breaker.state == CircuitBreaker.CLOSED
+
+
+def test_first_registration_is_not_retried(simulator_port, faults):
+    client = make_client(simulator_port)
+    faults.plans = ['error']
+    with pytest.raises(requests.HTTPError):
+        client.register_heartbeat()
+    assert client.metrics.counter('api.retries', endpoint='/api/register_heartbeat') == 0
+
+    assert client.register_heartbeat()['agent_uuid']
+    faults.plans = ['error']
+    assert client.register_heartbeat()['agent_uuid'] == client.agent_uuid
+    assert client.metrics.counter('api.retries', endpoint='/api/register_heartbeat') == 1
@@ -0,0 +1,52 @@
+import asyncio
+import threading
+import time
+
+from async_api_master import AsyncAPIMaster
+
+
+class SlowHeartbeatClient:
+    """Stands in for APIMaster: every beat takes `seconds` on its worker thread."""
+
+    def __init__(self, seconds: float):
+        self.seconds = seconds
+        self.finished = 0
+        self._lock = threading.Lock()
+
+    def register_heartbeat(self):
+        time.sleep(self.seconds)
+        with self._lock:
+            self.finished += 1
+        return {'agent_uuid': 'agent'}
+
+
+def test_stop_heartbeat_waits_for_the_beat_in_flight():
+    client = SlowHeartbeatClient(0.2)
+
+    async def scenario():
+        heartbeat = AsyncAPIMaster(client, heartbeat_interval=0.01)
+        heartbeat.start_heartbeat()
+        await asyncio.sleep(0.05)
+        await heartbeat.stop_heartbeat()
+        return client.finished
+
+    assert asyncio.run(scenario()) == 1
+
+
+def test_failing_callback_does_not_stop_the_heartbeat():
+    client = SlowHeartbeatClient(0.0)
+
+    def callback(result):
+        raise RuntimeError('callback failed')
+
+    async def scenario():
+        heartbeat = AsyncAPIMaster(client, heartbeat_interval=0.01, on_heartbeat=callback)
+        heartbeat.start_heartbeat()
+        await asyncio.sleep(0.1)
+        running = heartbeat.heartbeat_running
+        await heartbeat.close()
+        return running, heartbeat.heartbeat_count
+
+    running, count = asyncio.run(scenario())
+    assert running
+    assert count > 1
@@ -0,0 +1,51 @@
+import threading
+import time
+
+import pytest
+from werkzeug.serving import make_server
+
+from api_master import APIMaster
+from api_simulation import api_simulator
+from api_simulation.work_queue import WorkQueue
+from tracing.metrics import MetricsRegistry
+
+
+
+def test_stats_separate_live_leases_from_leases_granted():
+    queue = WorkQueue()
+    queue.add_task(work_packages=3)
+    first = queue.lease('agent-a')
+    assert queue.complete('agent-a', first.work_package_uuid)
+    queue.lease('agent-b')
+
+    stats = queue.stats()
+    assert stats['active_leases'] == 1
+    assert stats['leases_granted'] == 2
+    assert stats['pending'] == 1
+
+
+@pytest.fixture
+def queue_port():
+    queue = WorkQueue(lease_seconds=0.3)
+    queue.add_task(work_packages=3)
+    api_simulator.enable_work_queue(queue)
+    server = make_server('127.0.0.1', 0, api_simulator.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield queue, server.server_port
+    server.shutdown()
+    api_simulator.enable_work_queue(None)
+
+
+def test_heartbeat_renews_but_never_leases(queue_port):
+    queue, port = queue_port
+    client = APIMaster('127.0.0.1', port, 'test', metrics=MetricsRegistry())
+    work_package_uuid = client.bootstrap()['assignment']['work_package_uuid']
+    assert client.register_heartbeat()['work_package_uuid'] == work_package_uuid
+
+    time.sleep(0.4)
+    assert client.register_heartbeat()['lease_lost']
+    assert client.lease is None
+    # the busy agent keeps beating without a lease; that must not hand it another package
+    assert 'work_package_uuid' not in client.register_heartbeat()
+    assert queue.stats()['active_leases'] == 0
+    assert queue.stats()['leases_granted'] == 1
@@ -0,0 +1,127 @@
+import hashlib
+import json
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional, Tuple, Union
+
+from loguru import logger
+
+
+class LLMResponseCache:
+    """
+    Disk-backed (sqlite) cache of model responses keyed on method, model, rendered
+    system prompt, user prompt and parser schema.  Entries expire after `ttl_seconds`
+    and the least recently used entries are evicted beyond `max_entries` / `max_bytes`.
+
+    Parsed pydantic responses are stored as JSON and re-validated against the parser on
+    a hit; plain strings, dicts and lists are stored as JSON.  Other response types are
+    not cached.
+    """
+
+    def __init__(self, path: Optional[Union[str, Path]] = None, ttl_seconds: Optional[float] = 7 * 24 * 3600,
+                 max_entries: Optional[int] = 10_000, max_bytes: Optional[int] = 256 * 1024 * 1024):
+        self.path = Path(path) if path else Path(tempfile.gettempdir()) / 'agent_prime_llm_cache.sqlite3'
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._connection.execute('PRAGMA journal_mode=WAL')
+        self._connection.execute(
+            'CREATE TABLE IF NOT EXISTS responses ('
+            'key TEXT PRIMARY KEY, method TEXT, model TEXT, kind TEXT, payload TEXT, usage TEXT, '
+            'size INTEGER, created_at REAL, last_access REAL)'
+        )
+        self._connection.execute('CREATE INDEX IF NOT EXISTS responses_last_access ON responses (last_access)')
+        self._connection.commit()
+
+    @staticmethod
+    def make_key(method: str, model: str, system_prompt: Optional[str], prompt: Any, parser=None) -> str:
+        schema = parser.model_json_schema() if parser is not None else None
+        material = json.dumps([method, model, system_prompt, str(prompt), schema], sort_keys=True, default=str)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def get(self, key: str, parser=None) -> Optional[Tuple[Any, dict]]:
+        """Returns (response, usage dict) or None on a miss or an expired entry."""
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT kind, payload, usage, created_at FROM responses WHERE key = ?', (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            kind, payload, usage, created_at = row
+            now = time.time()
+            if self.ttl_seconds is not None and now - created_at > self.ttl_seconds:
+                self._connection.execute('DELETE FROM responses WHERE key = ?', (key,))
+                self._connection.commit()
+                self.misses += 1
+                return None
+            self._connection.execute('UPDATE responses SET last_access = ? WHERE key = ?', (now, key))
+            self._connection.commit()
+        try:
+            response = parser.model_validate_json(payload) if kind == 'pydantic' else json.loads(payload)
+        except Exception as e:
+            logger.warning(f"Discarding unreadable cached response {key[:12]}: {e}")
+            self.delete(key)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return response, json.loads(usage)
+
+    def put(self, key: str, method: str, model: str, response: Any, usage: dict):
+        if hasattr(response, 'model_dump_json'):
+            kind, payload = 'pydantic', response.model_dump_json()
+        elif isinstance(response, (str, dict, list)):
+            kind, payload = 'json', json.dumps(response)
+        else:
+            return
+        now = time.time()
+        with self._lock:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, method, model, kind, payload, json.dumps(usage, default=str), len(payload), now, now)
+            )
+            self._evict()
+            self._connection.commit()
+
+    def _evict(self):
+        if self.ttl_seconds is not None:
+            self._connection.execute('DELETE FROM responses WHERE created_at < ?', (time.time() - self.ttl_seconds,))
+        if self.max_entries is not None:
+            self._connection.execute(
+                'DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY last_access DESC '
+                'LIMIT -1 OFFSET ?)', (self.max_entries,)
+            )
+        if self.max_bytes is not None:
+            total = self._connection.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+            if total > self.max_bytes:
+                rows = self._connection.execute('SELECT key, size FROM responses ORDER BY last_access').fetchall()
+                for key, size in rows:
+                    if total <= self.max_bytes:
+                        break
+                    self._connection.execute('DELETE FROM responses WHERE key = ?', (key,))
+                    total -= size
+
+    def delete(self, key: str):
+        with self._lock:
+            self._connection.execute('DELETE FROM responses WHERE key = ?', (key,))
+            self._connection.commit()
+
+    def clear(self):
+        with self._lock:
+            self._connection.execute('DELETE FROM responses')
+            self._connection.commit()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, size = self._connection.execute(
+                'SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses'
+            ).fetchone()
+        return {'entries': entries, 'bytes': size, 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,85 @@
+import copy
+import threading
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+from loguru import logger
+
+# Client methods and the provider whose concurrency limit they count against
+CLIENT_CALL_PROVIDERS = {
+    'gpt_parse': 'openai',
+    'open_router_chat': 'open_router',
+    'open_router_chat_stream': 'open_router',
+}
+
+
+@dataclass(frozen=True, slots=True)
+class LLMRequest:
+    """
+    Everything one model call needs, captured when the call is built: the TaskMaster
+    method it belongs to, the client call to make, the rendered system prompt (and the
+    name of its template), the user prompt, the response parser and the model.  Fitting
+    the replacement items to the prompt budget is recorded too: how many tokens were
+    trimmed, and the cost items of any summarizer calls it made (`budget_cost`), which
+    belong to the cost of the method that built the request.  Requests are immutable,
+    so they can be handed to other threads without sharing state through the AI client.
+    """
+    method: str
+    client_call: str
+    model: str
+    system_prompt: str
+    prompt: Any
+    parser: Any = None
+    prompt_name: Optional[str] = None
+    trimmed_tokens: int = 0
+    budget_cost: Tuple[dict, ...] = ()
+
+    @property
+    def provider(self) -> str:
+        return CLIENT_CALL_PROVIDERS.get(self.client_call, self.client_call)
+
+    def bind(self, ai_client):
+        """
+        Returns a shallow copy of `ai_client` configured for this request.  The copy
+        shares the underlying HTTP clients but has its own prompt, parser and model.
+        """
+        client = copy.copy(ai_client)
+        client.agent_prompt = self.system_prompt
+        client.parser = self.parser
+        client.model = self.model
+        return client
+
+    def send(self, ai_client):
+        """Makes the call on a bound copy of `ai_client`; returns the client's (response, usage)."""
+        return getattr(self.bind(ai_client), self.client_call)(prompt=self.prompt)
+
+
+class ProviderLimiter:
+    """
+    Caps the number of in-flight calls per provider.  Providers without a configured
+    limit use `default_limit`; a limit of None means unbounded.
+    """
+
+    def __init__(self, limits: Optional[Dict[str, Optional[int]]] = None, default_limit: Optional[int] = 4):
+        self.limits = dict(limits or {})
+        self.default_limit = default_limit
+        self._semaphores: Dict[str, Optional[threading.BoundedSemaphore]] = {}
+        self._lock = threading.Lock()
+
+    def _semaphore(self, provider: str) -> Optional[threading.BoundedSemaphore]:
+        semaphore = self._semaphores.get(provider, False)
+        if semaphore is not False:
+            return semaphore
+        with self._lock:
+            if provider not in self._semaphores:
+                limit = self.limits.get(provider, self.default_limit)
+                self._semaphores[provider] = threading.BoundedSemaphore(limit) if limit else None
+                logger.debug(f"Concurrency limit for provider {provider}: {limit or 'unbounded'}")
+            return self._semaphores[provider]
+
+    def run(self, provider: str, call, *args, **kwargs):
+        semaphore = self._semaphore(provider)
+        if semaphore is None:
+            return call(*args, **kwargs)
+        with semaphore:
+            return call(*args, **kwargs)
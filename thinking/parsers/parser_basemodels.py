@@ -39,6 +39,12 @@ class ClarifiedSystemPrompt(BaseModel):
     class Config:
         extra = 'forbid'
 
+class SummarizedText(BaseModel):
+    summary: str = Field(description='The summarized text')
+
+    class Config:
+        extra = 'forbid'
+
 
 
 
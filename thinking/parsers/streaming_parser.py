@@ -0,0 +1,118 @@
+import json
+import re
+from typing import Callable, List, Optional
+
+from loguru import logger
+from pydantic import ValidationError
+
+from thinking.parsers.parser_basemodels import Checkpoint, Checkpoints
+
+_CHECKPOINT_ARRAY = re.compile(r'"checkpoint"\s*:\s*\[')
+
+
+class StreamingCheckpointParser:
+    """
+    Incrementally parses a `Checkpoints` JSON document as it is streamed.
+
+    Text before the `"checkpoint": [` key (reasoning, code fences) is skipped.  From
+    there a small scanner tracks string/escape state and brace depth, and each element
+    object is validated into a `Checkpoint` and handed to `on_checkpoint` as soon as its
+    closing brace arrives.  Elements that fail to parse are logged and skipped.
+    """
+
+    def __init__(self, on_checkpoint: Optional[Callable[[Checkpoint], None]] = None):
+        self.on_checkpoint = on_checkpoint
+        self.checkpoints: List[Checkpoint] = []
+        self.errors = 0
+        self._buffer = ''
+        self._position = 0
+        self._in_array = False
+        self._finished = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._object_start = None
+
+    @property
+    def finished(self) -> bool:
+        return self._finished
+
+    def feed(self, chunk: str) -> List[Checkpoint]:
+        """Consume the next piece of model output; returns the checkpoints it completed."""
+        if self._finished or not chunk:
+            return []
+        self._buffer += chunk
+        if not self._in_array:
+            match = _CHECKPOINT_ARRAY.search(self._buffer)
+            if match is None:
+                # keep enough tail to match a key split across chunks
+                self._buffer = self._buffer[-32:]
+                return []
+            self._in_array = True
+            self._buffer = self._buffer[match.end():]
+            self._position = 0
+        return self._scan()
+
+    def _scan(self) -> List[Checkpoint]:
+        emitted = []
+        buffer = self._buffer
+        position = self._position
+        while position < len(buffer):
+            character = buffer[position]
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif character == '\\':
+                    self._escaped = True
+                elif character == '"':
+                    self._in_string = False
+            elif character == '"':
+                self._in_string = True
+            elif character == '{':
+                if self._depth == 0:
+                    self._object_start = position
+                self._depth += 1
+            elif character == '}':
+                self._depth -= 1
+                if self._depth == 0 and self._object_start is not None:
+                    checkpoint = self._emit(buffer[self._object_start:position + 1])
+                    if checkpoint is not None:
+                        emitted.append(checkpoint)
+                    buffer = buffer[position + 1:]
+                    position = 0
+                    self._object_start = None
+                    continue
+            elif character == ']' and self._depth == 0:
+                self._finished = True
+                buffer = ''
+                position = 0
+                break
+            position += 1
+
+        if self._object_start is None:
+            # nothing pending between objects, only separators
+            buffer = buffer[position:]
+            position = 0
+        self._buffer = buffer
+        self._position = position
+        return emitted
+
+    def _emit(self, text: str) -> Optional[Checkpoint]:
+        try:
+            checkpoint = Checkpoint.model_validate(json.loads(text))
+        except (json.JSONDecodeError, ValidationError) as e:
+            self.errors += 1
+            logger.warning(f"Skipping unparseable streamed checkpoint: {e}")
+            return None
+        self.checkpoints.append(checkpoint)
+        if self.on_checkpoint is not None:
+            self.on_checkpoint(checkpoint)
+        return checkpoint
+
+    def close(self) -> Checkpoints:
+        """Ends the stream and returns everything parsed so far."""
+        if not self._finished and (self._depth or self._in_string):
+            logger.warning(f"Checkpoint stream ended inside an incomplete object "
+                           f"({len(self.checkpoints)} checkpoints parsed)")
+        self._finished = True
+        return Checkpoints(checkpoint=self.checkpoints)
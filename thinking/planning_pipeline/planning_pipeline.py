@@ -0,0 +1,163 @@
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, List, Optional
+
+from loguru import logger
+
+from thinking.enums.arb_enums import TaskComplexity
+
+
+@dataclass(slots=True)
+class PlanningStage:
+    name: str
+    started: float
+    duration: float
+    cost: List[dict] = field(default_factory=list)
+    discarded: bool = False
+
+
+@dataclass(slots=True)
+class PlanningReport:
+    """
+    Outcome of one `PlanningPipeline.run`.  Stage `started` offsets and durations are in
+    seconds relative to the start of the run; `answer_seconds` is time spent waiting on
+    the answer collector and is excluded from `model_seconds`.
+    """
+    task: str
+    reworked_task: Optional[str] = None
+    complexity: Optional[TaskComplexity] = None
+    checkpoints: Any = None
+    questions: List[Any] = field(default_factory=list)
+    answers: Dict[str, dict] = field(default_factory=dict)
+    speculation_used: bool = False
+    stages: Dict[str, PlanningStage] = field(default_factory=dict)
+    total_seconds: float = 0.0
+    answer_seconds: float = 0.0
+    first_checkpoint_seconds: Optional[float] = None
+
+    @property
+    def model_seconds(self) -> float:
+        return self.total_seconds - self.answer_seconds
+
+    @property
+    def cost(self) -> List[dict]:
+        """Everything the run was billed for, including discarded speculative stages."""
+        return [item for stage in self.stages.values() for item in stage.cost]
+
+    @property
+    def wasted_cost(self) -> List[dict]:
+        """The part of `cost` spent on stages whose result was discarded."""
+        return [item for stage in self.stages.values() if stage.discarded for item in stage.cost]
+
+    def summary(self) -> str:
+        lines = [f"planning {self.total_seconds:.2f}s (model {self.model_seconds:.2f}s, "
+                 f"answers {self.answer_seconds:.2f}s, speculation {'used' if self.speculation_used else 'discarded'})"]
+        if self.first_checkpoint_seconds is not None:
+            lines.append(f"  first checkpoint after {self.first_checkpoint_seconds:.2f}s")
+        for stage in sorted(self.stages.values(), key=lambda stage: stage.started):
+            lines.append(f"  {stage.name:<24} +{stage.started:6.2f}s  {stage.duration:6.2f}s"
+                         f"{'  (discarded)' if stage.discarded else ''}")
+        return '\n'.join(lines)
+
+
+def ask_on_console(question) -> str:
+    return input(f'{question.question}\n')
+
+
+class PlanningPipeline:
+    """
+    Plans a task with a `TaskMaster`: clarify -> (answers) -> rework -> complexity ->
+    checkpoint draft -> checkpoint parse.
+
+    Complexity is evaluated speculatively on the original task while clarification runs.
+    When clarification asks no questions, the task is not reworked and the speculative
+    result is used, so the critical path loses a whole model call; otherwise the
+    speculative result is discarded and complexity is re-evaluated on the reworked task.
+
+    With `stream_checkpoints` the draft and parse stages are replaced by a single
+    `TaskMaster.stream_web_checkpoint` call and `on_checkpoint` (e.g.
+    `AgentMemory.add_streamed_checkpoint`) receives each checkpoint as it is parsed.
+    """
+
+    def __init__(self, task_master, answer_collector: Callable[[Any], str] = ask_on_console,
+                 speculate: bool = True, stream_checkpoints: bool = False,
+                 on_checkpoint: Optional[Callable[[Any], Any]] = None):
+        self.task_master = task_master
+        self.answer_collector = answer_collector
+        self.speculate = speculate
+        self.stream_checkpoints = stream_checkpoints
+        self.on_checkpoint = on_checkpoint
+
+    def _timed(self, report: PlanningReport, run_started: float, name: str, call, *args, **kwargs):
+        started = time.perf_counter()
+        result, cost = call(*args, **kwargs)
+        report.stages[name] = PlanningStage(name=name, started=started - run_started,
+                                            duration=time.perf_counter() - started,
+                                            cost=cost if isinstance(cost, list) else [cost])
+        return result
+
+    def run(self, task: str) -> PlanningReport:
+        task_master = self.task_master
+        report = PlanningReport(task=task)
+        run_started = time.perf_counter()
+
+        with ThreadPoolExecutor(max_workers=2, thread_name_prefix='planning') as executor:
+            speculative = None
+            if self.speculate:
+                speculative = executor.submit(self._timed, report, run_started, 'complexity_speculative',
+                                              task_master.evaluate_task_complexity, replacement_items=[task])
+            clarification = self._timed(report, run_started, 'clarify', task_master.clarify_task, task=task)
+            report.questions = list(clarification.clarification_needed_questions or [])
+
+            if report.questions:
+                answers_started = time.perf_counter()
+                for question in report.questions:
+                    report.answers[question.question] = {'example_outcomes': question.example_outcomes,
+                                                         'user_response': self.answer_collector(question)}
+                report.answer_seconds = time.perf_counter() - answers_started
+
+                reworked = self._timed(report, run_started, 'rework', task_master.rework_task,
+                                       replacement_items=[str(report.answers)], task=task)
+                report.reworked_task = reworked.reformatted_task
+                if speculative is not None:
+                    speculative.cancel()
+                report.complexity = self._timed(report, run_started, 'complexity',
+                                                task_master.evaluate_task_complexity,
+                                                replacement_items=[report.reworked_task])
+            else:
+                report.reworked_task = task
+                if speculative is not None:
+                    try:
+                        report.complexity = speculative.result()
+                        report.speculation_used = True
+                    except Exception as e:
+                        logger.warning(f"Speculative complexity evaluation failed, re-running: {e}")
+                if report.complexity is None:
+                    report.complexity = self._timed(report, run_started, 'complexity',
+                                                    task_master.evaluate_task_complexity, replacement_items=[task])
+
+        speculative_stage = report.stages.get('complexity_speculative')
+        if speculative_stage is not None and not report.speculation_used:
+            speculative_stage.discarded = True
+
+        replacement_items = [report.complexity.value]
+        if self.stream_checkpoints:
+            def on_checkpoint(checkpoint):
+                if report.first_checkpoint_seconds is None:
+                    report.first_checkpoint_seconds = time.perf_counter() - run_started
+                if self.on_checkpoint is not None:
+                    self.on_checkpoint(checkpoint)
+
+            report.checkpoints = self._timed(report, run_started, 'checkpoint_stream',
+                                             task_master.stream_web_checkpoint, replacement_items,
+                                             on_checkpoint=on_checkpoint, task=report.reworked_task)
+        else:
+            draft = self._timed(report, run_started, 'checkpoint_draft', task_master.draft_web_checkpoint,
+                                replacement_items, task=report.reworked_task)
+            report.checkpoints = self._timed(report, run_started, 'checkpoint_parse',
+                                             task_master.parse_web_checkpoint, replacement_items, draft)
+
+        report.total_seconds = time.perf_counter() - run_started
+        logger.info(report.summary())
+        return report
@@ -1,9 +1,109 @@
+import re
+import threading
+import time
 from pathlib import Path
-from typing import Optional, List
+from typing import Dict, Optional, List, Tuple
 from loguru import logger
 from thinking.enums.prompt_handler_enums import Prompt
 
 
+class CompiledPrompt:
+    """
+    A prompt file pre-split into literal and placeholder segments, so rendering is a
+    single join instead of one `str.replace` pass over the whole prompt per placeholder.
+    """
+    __slots__ = ('prompt', 'source', 'mtime_ns', '_segments', '_slots', 'placeholder_count')
+
+    def __init__(self, prompt: Prompt, source: str, mtime_ns: int):
+        self.prompt = prompt
+        self.source = source
+        self.mtime_ns = mtime_ns
+        placeholders = prompt.value[1]
+        self.placeholder_count = len(placeholders)
+
+        slot_for = {placeholder: index for index, placeholder in enumerate(placeholders)}
+        pattern = '|'.join(re.escape(placeholder) for placeholder in sorted(placeholders, key=len, reverse=True))
+        segments: List[str] = []
+        slots: List[Tuple[int, int]] = []
+        position = 0
+        if pattern:
+            for match in re.finditer(pattern, source):
+                segments.append(source[position:match.start()])
+                slots.append((len(segments), slot_for[match.group(0)]))
+                segments.append('')
+                position = match.end()
+        segments.append(source[position:])
+        self._segments = segments
+        self._slots = slots
+
+        missing = [placeholder for placeholder in placeholders if placeholder not in source]
+        if missing:
+            logger.warning(f"Prompt {prompt.name} does not contain placeholders {missing}")
+
+    def render(self, replacement_items: List[str]) -> str:
+        if self.placeholder_count != len(replacement_items):
+            raise ValueError(
+                f"Number of replacements ({len(replacement_items)}) does not match number of placeholders ({self.placeholder_count}).")
+        if not self._slots:
+            return self.source
+        pieces = list(self._segments)
+        for segment_index, replacement_index in self._slots:
+            pieces[segment_index] = str(replacement_items[replacement_index])
+        return ''.join(pieces)
+
+
+class PromptRegistry:
+    """
+    Process-wide cache of compiled prompts.  Each file is read and compiled once; its
+    mtime is re-checked at most every `check_interval` seconds and the prompt is
+    recompiled only when the file changed.
+    """
+
+    def __init__(self, check_interval: float = 1.0):
+        self.check_interval = check_interval
+        self._compiled: Dict[Prompt, CompiledPrompt] = {}
+        self._checked_at: Dict[Prompt, float] = {}
+        self._lock = threading.Lock()
+
+    def _compile(self, prompt: Prompt) -> CompiledPrompt:
+        prompt_path = Path(prompt.value[0])
+        mtime_ns = prompt_path.stat().st_mtime_ns
+        compiled = CompiledPrompt(prompt, prompt_path.read_text(encoding='utf-8'), mtime_ns)
+        logger.info(f"Compiled prompt {prompt.name} from {prompt_path}")
+        return compiled
+
+    def get(self, prompt: Prompt) -> CompiledPrompt:
+        compiled = self._compiled.get(prompt)
+        now = time.monotonic()
+        if compiled is not None and now - self._checked_at.get(prompt, 0.0) < self.check_interval:
+            return compiled
+        with self._lock:
+            compiled = self._compiled.get(prompt)
+            if compiled is None or Path(prompt.value[0]).stat().st_mtime_ns != compiled.mtime_ns:
+                compiled = self._compiled[prompt] = self._compile(prompt)
+            self._checked_at[prompt] = now
+        return compiled
+
+    def render(self, prompt: Prompt, replacement_items: List[str]) -> str:
+        return self.get(prompt).render(replacement_items)
+
+    def preload(self):
+        """Compile every `Prompt` up front, skipping files that do not exist."""
+        for prompt in Prompt:
+            try:
+                self.get(prompt)
+            except FileNotFoundError:
+                logger.error(f"Prompt file does not exist: {prompt.value[0]}")
+
+    def clear(self):
+        with self._lock:
+            self._compiled.clear()
+            self._checked_at.clear()
+
+
+PROMPT_REGISTRY = PromptRegistry()
+
+
 class PromptHandler:
     def __init__(self, prompt: Prompt):
 
@@ -23,7 +123,7 @@ class PromptHandler:
             return None
 
         try:
-            self.prompt_content = self.prompt_path.read_text(encoding='utf-8')
+            self.prompt_content = PROMPT_REGISTRY.get(self.prompt).source
             logger.info(f"Successfully loaded prompt from {self.prompt_path}")
             return self.prompt_content
         except IOError as e:
@@ -40,12 +140,7 @@ class PromptHandler:
         return self.prompt_content
 
     def build_prompt(self, replacement_items: List[str]):
-        if len(self.replacement_values) != len(replacement_items):
-            raise ValueError(
-                f"Number of replacements ({len(replacement_items)}) does not match number of placeholders ({len(self.replacement_values)}).")
-
-        for placeholder, replacement in zip(self.replacement_values, replacement_items):
-            self.prompt_content = self.prompt_content.replace(placeholder, str(replacement))
+        self.prompt_content = PROMPT_REGISTRY.render(self.prompt, replacement_items)
 
 
 
@@ -1,17 +1,41 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Dict, List, Optional
+
 from loguru import logger
-from thinking.prompt_handler.prompt_handler import PromptHandler
+from thinking.prompt_handler.prompt_handler import PromptHandler, PROMPT_REGISTRY
 from thinking.enums.prompt_handler_enums import Prompt
 from thinking.parsers.parser_basemodels import *
+from thinking.parsers.streaming_parser import StreamingCheckpointParser
 from utils.ai.ai_enums import Models, ClientProvider
 from thinking.enums.arb_enums import *
+from thinking.llm_cache.response_cache import LLMResponseCache
+from thinking.llm_request.llm_request import LLMRequest, ProviderLimiter
+from thinking.token_budget.token_budget import PromptBudget, PromptBudgeter
+from tracing.metrics import TOKEN_BOUNDS, MetricsRegistry, get_metrics
 
 
 class TaskMaster:
-    def __init__(self, AI_CLIENT  = None, task: str = None):
+    def __init__(self, AI_CLIENT  = None, task: str = None, response_cache: LLMResponseCache = None,
+                 cache_disabled_methods: set = None, max_workers: int = 8,
+                 provider_limits: Dict[str, Optional[int]] = None, metrics: MetricsRegistry = None,
+                 prompt_budgets: Dict[str, PromptBudget] = None, default_prompt_budget: PromptBudget = None,
+                 enforce_prompt_budgets: bool = True):
         logger.info(f"Initializing TaskMaster")
 
         self.ai_client = AI_CLIENT
         self.task = task
+        self.response_cache = response_cache
+        self.cache_disabled_methods = set(cache_disabled_methods or ())
+        self.max_workers = max_workers
+        self.provider_limiter = ProviderLimiter(limits=provider_limits)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._executor_lock = threading.Lock()
+        self.metrics = metrics if metrics is not None else get_metrics()
+        self.prompt_budgeter = PromptBudgeter(budgets=prompt_budgets, default_budget=default_prompt_budget,
+                                              summarizer=self.summarize_text) if enforce_prompt_budgets else None
         return
 
     @staticmethod
@@ -28,72 +52,265 @@ class TaskMaster:
 
         return obj
 
+    @staticmethod
+    def _cached_cost_items(cost_item: dict) -> dict:
+        """A cache hit spends nothing; the tokens the original call used are kept for reference."""
+        return {'completion_tokens': 0,
+                'prompt_tokens': 0,
+                'total_tokens': 0,
+                'model': cost_item.get('model'),
+                'cached': True,
+                'cached_total_tokens': cost_item.get('total_tokens')}
+
+    def build_request(self, method: str, client_call: str, PromptEnum, replacement_items, model: str, prompt,
+                      parser=None) -> LLMRequest:
+        """
+        Renders the prompt and captures the call.  Replacement items are first fitted to the
+        model's prompt budget; raises `PromptBudgetExceeded` when they cannot be.
+        """
+        compiled = PROMPT_REGISTRY.get(PromptEnum)
+        trimmed_tokens, budget_cost = 0, ()
+        if self.prompt_budgeter is not None:
+            replacement_items, budget_report = self.prompt_budgeter.fit(
+                model, PromptEnum.name, compiled.render([''] * compiled.placeholder_count), replacement_items, prompt)
+            trimmed_tokens, budget_cost = budget_report.trimmed_tokens, tuple(budget_report.cost)
+            if trimmed_tokens:
+                self.metrics.increment('llm.trimmed_tokens', trimmed_tokens, model=model, prompt=PromptEnum.name)
+        return LLMRequest(method=method, client_call=client_call, model=model,
+                          system_prompt=compiled.render(replacement_items),
+                          prompt=prompt, parser=parser, prompt_name=PromptEnum.name, trimmed_tokens=trimmed_tokens,
+                          budget_cost=budget_cost)
+
+    def execute(self, request: LLMRequest):
+        """
+        Runs one request through the response cache (unless disabled for its method) and the
+        provider concurrency limit, and returns (response, cost item).  Safe to call from
+        several threads at once.
+        """
+        use_cache = self.response_cache is not None and request.method not in self.cache_disabled_methods
+        if use_cache:
+            key = LLMResponseCache.make_key(request.method, request.model, request.system_prompt, request.prompt,
+                                            request.parser)
+            cached = self.response_cache.get(key, parser=request.parser)
+            if cached is not None:
+                logger.info(f"Using cached {request.model} response for {request.method}")
+                response, cost_item = cached
+                self._record_cache_hit(request)
+                return response, self._cached_cost_items(cost_item)
+
+        try:
+            (response, usage), seconds = self.provider_limiter.run(request.provider, self._timed_call, request.send,
+                                                                   self.ai_client)
+        except Exception as e:
+            self._record_error(request, e)
+            raise
+        cost_item = self.extract_cost_items(usage=usage, model=request.model)
+        if request.trimmed_tokens:
+            cost_item['trimmed_tokens'] = request.trimmed_tokens
+        self._record_call(request, seconds, cost_item)
+        if use_cache:
+            self.response_cache.put(key, request.method, request.model, response, cost_item)
+        return response, cost_item
+
+    @staticmethod
+    def _request_cost(request: LLMRequest, cost_item: dict) -> List[dict]:
+        """The call's cost item preceded by those of the summaries made to fit its prompt."""
+        return [*request.budget_cost, cost_item]
+
+    @staticmethod
+    def _timed_call(call, *args):
+        """Times the call itself, excluding any wait for the provider concurrency limit."""
+        started = time.perf_counter()
+        result = call(*args)
+        return result, time.perf_counter() - started
+
+    @staticmethod
+    def _metric_labels(request: LLMRequest) -> dict:
+        return {'model': request.model, 'prompt': request.prompt_name or request.method}
+
+    def _record_call(self, request: LLMRequest, seconds: float, cost_item: dict):
+        labels = self._metric_labels(request)
+        self.metrics.increment('llm.calls', **labels)
+        self.metrics.observe('llm.latency_seconds', seconds, **labels)
+        for field_name in ('prompt_tokens', 'completion_tokens', 'total_tokens'):
+            if cost_item.get(field_name) is not None:
+                self.metrics.observe(f'llm.{field_name}', cost_item[field_name], bounds=TOKEN_BOUNDS, **labels)
+
+    def _record_error(self, request: LLMRequest, error: Exception):
+        self.metrics.increment('llm.errors', error=type(error).__name__, **self._metric_labels(request))
+
+    def _record_cache_hit(self, request: LLMRequest):
+        self.metrics.increment('llm.cache_hits', **self._metric_labels(request))
+
+    def submit(self, request: LLMRequest) -> Future:
+        """Runs `execute(request)` on the TaskMaster's thread pool."""
+        if self._executor is None:
+            with self._executor_lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                        thread_name_prefix='task-master')
+        return self._executor.submit(self.execute, request)
+
+    def execute_many(self, requests: List[LLMRequest]) -> List[tuple]:
+        """Runs independent requests concurrently; results are returned in request order."""
+        return [future.result() for future in [self.submit(request) for request in requests]]
+
+    async def execute_async(self, request: LLMRequest):
+        return await asyncio.to_thread(self.execute, request)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
+
     def set_prompt(self, PromptEnum, replacement_items):
-        prompt = PromptHandler(PromptEnum)
-        prompt.get_prompt()
-        prompt.build_prompt(replacement_items=replacement_items)
-        self.ai_client.agent_prompt = prompt.prompt_content
+        self.ai_client.agent_prompt = PROMPT_REGISTRY.render(PromptEnum, replacement_items)
 
     def example_function(self, replacement_items, prompt):
         logger.info(f"Running example function")
         cost = []
-        self.set_prompt(PromptEnum=Prompt.EXAMPLE_PROMPT, replacement_items=replacement_items)
-        print(self.ai_client.agent_prompt)
-        self.ai_client.parser = ExampleParser
-        self.ai_client.model = Models.GPT_4O.value
-        response, cost = self.ai_client.gpt_parse(prompt=prompt)
-        cost.append(self.extract_cost_items(usage=cost, model=self.ai_client.model))
+        request = self.build_request('example_function', 'gpt_parse', Prompt.EXAMPLE_PROMPT, replacement_items,
+                                     model=Models.GPT_4O.value, prompt=prompt, parser=ExampleParser)
+        response, cost_item = self.execute(request)
+        cost.extend(self._request_cost(request, cost_item))
         logger.success(f'Example function ran successfully')
         return response, cost
 
-    def clarify_task(self, replacement_items = None):
+    def clarify_task(self, replacement_items = None, task: str = None):
         logger.info(f'Refining task')
         cost = []
-        self.set_prompt(PromptEnum=Prompt.CLARIFY_PROMPT, replacement_items=[''])
-        self.ai_client.parser = VerifySystemPrompt
-        self.ai_client.model = Models.GPT_4O.model_id
-        prompt_clarification, usage = self.ai_client.gpt_parse(prompt=self.task)
-        cost.append(self.extract_cost_items(usage=usage, model=self.ai_client.model))
+        request = self.build_request('clarify_task', 'gpt_parse', Prompt.CLARIFY_PROMPT, [''],
+                                     model=Models.GPT_4O.model_id, prompt=self.task if task is None else task,
+                                     parser=VerifySystemPrompt)
+        prompt_clarification, cost_item = self.execute(request)
+        cost.extend(self._request_cost(request, cost_item))
         return prompt_clarification, cost
 
-    def rework_task(self, replacement_items):
+    def rework_task(self, replacement_items, task: str = None):
         logger.info(f'Reworking task')
         cost = []
-        self.ai_client.model = Models.GPT_4O.model_id
-        self.set_prompt(PromptEnum=Prompt.REWORK_PROMPT, replacement_items=replacement_items)
-        self.ai_client.parser = ClarifiedSystemPrompt
-        prompt_clarification, usage = self.ai_client.gpt_parse(prompt=self.task)
-        cost.append(self.extract_cost_items(usage=usage, model=self.ai_client.model))
+        request = self.build_request('rework_task', 'gpt_parse', Prompt.REWORK_PROMPT, replacement_items,
+                                     model=Models.GPT_4O.model_id, prompt=self.task if task is None else task,
+                                     parser=ClarifiedSystemPrompt)
+        prompt_clarification, cost_item = self.execute(request)
+        cost.extend(self._request_cost(request, cost_item))
         return prompt_clarification, cost
 
     def evaluate_task_complexity(self, replacement_items=''):
-        logger.info(f"Evaluating complexity for task: {self.task}")
+        logger.info(f"Evaluating complexity for task: {replacement_items}")
         cost = []
-
-        self.set_prompt(PromptEnum=Prompt.EVALUATE_TASK_COMPLEXITY, replacement_items=replacement_items)
-        self.ai_client.parser = Complexity
-
-        self.ai_client.model = Models.GPT_4O.model_id
-        response, usage = self.ai_client.gpt_parse(prompt='')
-        cost.append(self.extract_cost_items(usage=usage, model=self.ai_client.model))
+        request = self.build_request('evaluate_task_complexity', 'gpt_parse', Prompt.EVALUATE_TASK_COMPLEXITY,
+                                     replacement_items, model=Models.GPT_4O.model_id, prompt='', parser=Complexity)
+        response, cost_item = self.execute(request)
+        cost.extend(self._request_cost(request, cost_item))
         complexity = TaskComplexity(response.score)
 
         logger.info(f"Task complexity evaluated as: {complexity}")
         return complexity, cost
 
-    def build_web_checkpoint(self, replacement_items):
+    def summarize_text(self, text: str, max_tokens: int, model: str = None):
+        """
+        Summarizer for the 'summarize' prompt budget strategy; returns (summary, cost).  The
+        text is sent as the user prompt, so it is not itself subject to replacement-item
+        budgeting.
+        """
+        logger.info(f"Summarizing {len(text)} characters to at most {max_tokens} tokens")
+        summary_model = Models.GPT_4O.model_id
+        counter = self.prompt_budgeter.counter
+        text = counter.truncate(text, self.prompt_budgeter.budget_for(summary_model).max_prompt_tokens // 2,
+                                summary_model)
+        request = self.build_request('summarize_text', 'gpt_parse', Prompt.SUMMARIZE_ITEM, [max_tokens],
+                                     model=summary_model, prompt=text, parser=SummarizedText)
+        response, cost_item = self.execute(request)
+        return response.summary, self._request_cost(request, cost_item)
+
+    def draft_web_checkpoint(self, replacement_items, task: str = None):
+        """First half of `build_web_checkpoint`: the free-text DeepSeek draft."""
+        request = self.build_request('build_web_checkpoint', 'open_router_chat', Prompt.WEB_CHECKPOINT_PROMPT,
+                                     replacement_items, model=Models.DEEPSEEK_R1.model_id,
+                                     prompt=str(self.task if task is None else task))
+        draft, cost_item = self.execute(request)
+        return draft, self._request_cost(request, cost_item)
+
+    def parse_web_checkpoint(self, replacement_items, draft):
+        """Second half of `build_web_checkpoint`: parses the draft into `Checkpoints`."""
+        request = self.build_request('build_web_checkpoint', 'gpt_parse', Prompt.WEB_CHECKPOINT_PROMPT,
+                                     replacement_items, model=Models.GPT_4O.model_id, prompt=draft,
+                                     parser=Checkpoints)
+        checkpoints, cost_item = self.execute(request)
+        return checkpoints, self._request_cost(request, cost_item)
+
+    def _consume_checkpoint_stream(self, request: LLMRequest, checkpoint_parser: StreamingCheckpointParser):
+        client = request.bind(self.ai_client)
+        chunks, usage = [], None
+        if hasattr(client, 'open_router_chat_stream'):
+            # the stream yields text chunks, optionally followed by a usage object
+            for chunk in client.open_router_chat_stream(prompt=request.prompt):
+                if isinstance(chunk, str):
+                    chunks.append(chunk)
+                    checkpoint_parser.feed(chunk)
+                else:
+                    usage = chunk
+        else:
+            text, usage = client.open_router_chat(prompt=request.prompt)
+            chunks.append(text)
+            checkpoint_parser.feed(text)
+        return ''.join(chunks), usage
+
+    def stream_web_checkpoint(self, replacement_items, on_checkpoint: Callable[[Checkpoint], None] = None,
+                              task: str = None):
+        """
+        Single-call alternative to `build_web_checkpoint`: the model is asked for JSON
+        directly and `on_checkpoint` is called with each `Checkpoint` as soon as its object
+        is complete in the stream.  Falls back to feeding the whole response at once when
+        the client has no `open_router_chat_stream`.  Returns (Checkpoints, cost).
+        """
+        logger.info(f"Streaming web checkpoint creation")
+        request = self.build_request('stream_web_checkpoint', 'open_router_chat_stream', Prompt.WEB_CHECKPOINT_STREAM,
+                                     replacement_items, model=Models.DEEPSEEK_R1.model_id,
+                                     prompt=str(self.task if task is None else task))
+        checkpoint_parser = StreamingCheckpointParser(on_checkpoint=on_checkpoint)
+
+        use_cache = self.response_cache is not None and request.method not in self.cache_disabled_methods
+        if use_cache:
+            key = LLMResponseCache.make_key(request.method, request.model, request.system_prompt, request.prompt)
+            cached = self.response_cache.get(key)
+            if cached is not None:
+                logger.info(f"Replaying cached {request.model} response for {request.method}")
+                text, cost_item = cached
+                self._record_cache_hit(request)
+                checkpoint_parser.feed(text)
+                return checkpoint_parser.close(), self._request_cost(request, self._cached_cost_items(cost_item))
+
+        try:
+            (text, usage), seconds = self.provider_limiter.run(request.provider, self._timed_call,
+                                                               self._consume_checkpoint_stream, request,
+                                                               checkpoint_parser)
+        except Exception as e:
+            self._record_error(request, e)
+            raise
+        if usage is not None:
+            cost_item = self.extract_cost_items(usage=usage, model=request.model)
+        else:
+            cost_item = {'completion_tokens': None, 'prompt_tokens': None, 'total_tokens': None,
+                         'model': request.model}
+        if request.trimmed_tokens:
+            cost_item['trimmed_tokens'] = request.trimmed_tokens
+        self._record_call(request, seconds, cost_item)
+        if use_cache and checkpoint_parser.finished:
+            self.response_cache.put(key, request.method, request.model, text, cost_item)
+        checkpoints = checkpoint_parser.close()
+        logger.info(f"Streamed {len(checkpoints.checkpoint)} checkpoints ({checkpoint_parser.errors} skipped)")
+        return checkpoints, self._request_cost(request, cost_item)
+
+    def build_web_checkpoint(self, replacement_items, task: str = None):
         usage = []
         logger.info(f"Running web checkpoint creation")
-        self.set_prompt(PromptEnum=Prompt.WEB_CHECKPOINT_PROMPT, replacement_items=replacement_items)
-
-        self.ai_client.model = Models.DEEPSEEK_R1.model_id
-        steps, cost = self.ai_client.open_router_chat(prompt=str(self.task))
-        usage.append(cost)
+        steps, cost = self.draft_web_checkpoint(replacement_items, task=task)
+        usage.extend(cost)
 
-        self.ai_client.parser = Checkpoints
-        self.ai_client.model = Models.GPT_4O.model_id
-        steps, cost = self.ai_client.gpt_parse(prompt=steps)
-        usage.append(cost)
+        steps, cost = self.parse_web_checkpoint(replacement_items, steps)
+        usage.extend(cost)
         return steps, usage
 
 
@@ -0,0 +1,187 @@
+import threading
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Tuple
+
+from loguru import logger
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+
+class PromptBudgetExceeded(Exception):
+    pass
+
+
+class TokenCounter:
+    """
+    Counts tokens locally for a target model.  Uses tiktoken when it is installed (the
+    model's own encoding, or cl100k_base for models tiktoken does not know, e.g.
+    OpenRouter ids); otherwise estimates `chars_per_token` characters per token.
+    """
+
+    def __init__(self, chars_per_token: float = 4.0):
+        self.chars_per_token = chars_per_token
+        self._encodings: Dict[str, object] = {}
+        self._lock = threading.Lock()
+
+    def encoding(self, model: Optional[str]):
+        if tiktoken is None:
+            return None
+        key = model or ''
+        encoding = self._encodings.get(key)
+        if encoding is None:
+            with self._lock:
+                encoding = self._encodings.get(key)
+                if encoding is None:
+                    try:
+                        encoding = tiktoken.encoding_for_model(model.split('/')[-1]) if model else None
+                    except KeyError:
+                        encoding = None
+                    encoding = encoding or tiktoken.get_encoding('cl100k_base')
+                    self._encodings[key] = encoding
+        return encoding
+
+    def count(self, text: str, model: Optional[str] = None) -> int:
+        if not text:
+            return 0
+        encoding = self.encoding(model)
+        if encoding is None:
+            return int(len(text) / self.chars_per_token) + 1
+        return len(encoding.encode(text, disallowed_special=()))
+
+    def truncate(self, text: str, max_tokens: int, model: Optional[str] = None, head_fraction: float = 0.75) -> str:
+        """
+        Cuts `text` to at most `max_tokens`, keeping the start and the end around a
+        marker that says how much was removed.
+        """
+        tokens = self.count(text, model)
+        if tokens <= max_tokens:
+            return text
+        marker = f'\n...[truncated {tokens - max_tokens} tokens]...\n'
+        keep = max(max_tokens - self.count(marker, model), 0)
+        head_tokens = int(keep * head_fraction)
+        tail_tokens = keep - head_tokens
+        encoding = self.encoding(model)
+        if encoding is None:
+            head = text[:int(head_tokens * self.chars_per_token)]
+            tail = text[len(text) - int(tail_tokens * self.chars_per_token):] if tail_tokens else ''
+        else:
+            encoded = encoding.encode(text, disallowed_special=())
+            head = encoding.decode(encoded[:head_tokens])
+            tail = encoding.decode(encoded[len(encoded) - tail_tokens:]) if tail_tokens else ''
+        return head + marker + tail
+
+
+@dataclass(slots=True)
+class PromptBudget:
+    """
+    Token limits for one model.  `max_prompt_tokens` covers the rendered system prompt
+    plus the user prompt; `max_item_tokens` caps every replacement item on its own.
+    `strategy` is 'truncate', 'summarize' (falls back to truncation when no summarizer
+    is configured) or 'error'.
+    """
+    max_prompt_tokens: int = 100_000
+    max_item_tokens: Optional[int] = None
+    strategy: str = 'truncate'
+
+
+@dataclass(slots=True)
+class BudgetReport:
+    model: str
+    prompt_name: str
+    tokens_before: int
+    tokens_after: int
+    items_trimmed: List[int] = field(default_factory=list)
+    # cost items of the summarizer calls made to fit the items
+    cost: List[dict] = field(default_factory=list)
+
+    @property
+    def trimmed_tokens(self) -> int:
+        return self.tokens_before - self.tokens_after
+
+
+class PromptBudgeter:
+    """
+    Fits replacement items into a model's `PromptBudget` before a prompt is rendered.
+    When the prompt is over budget the largest items are trimmed first, all down to a
+    common cap (water-filling), so small items such as a task complexity level are left
+    untouched.  Template and user prompt tokens count towards the budget but are never
+    trimmed.
+
+    `summarizer(text, max_tokens, model) -> (summary, cost items)` is used by the
+    'summarize' strategy; its cost ends up in the `BudgetReport`.
+    """
+
+    def __init__(self, budgets: Optional[Dict[str, PromptBudget]] = None,
+                 default_budget: Optional[PromptBudget] = None, counter: Optional[TokenCounter] = None,
+                 summarizer: Optional[Callable[[str, int, str], Tuple[str, List[dict]]]] = None):
+        self.budgets = dict(budgets or {})
+        self.default_budget = default_budget or PromptBudget()
+        self.counter = counter or TokenCounter()
+        self.summarizer = summarizer
+
+    def budget_for(self, model: str) -> PromptBudget:
+        return self.budgets.get(model, self.default_budget)
+
+    @staticmethod
+    def _item_cap(item_tokens: List[int], available: int) -> int:
+        """Largest cap such that sum(min(tokens, cap)) <= available."""
+        remaining = available
+        ordered = sorted(item_tokens)
+        for position, tokens in enumerate(ordered):
+            share = remaining // (len(ordered) - position)
+            if tokens > share:
+                return share
+            remaining -= tokens
+        return ordered[-1] if ordered else 0
+
+    def _shrink(self, text: str, max_tokens: int, model: str, budget: PromptBudget, cost: List[dict]) -> str:
+        if budget.strategy == 'summarize' and self.summarizer is not None:
+            try:
+                summary, summary_cost = self.summarizer(text, max_tokens, model)
+                cost.extend(summary_cost)
+                if self.counter.count(summary, model) <= max_tokens:
+                    return summary
+                return self.counter.truncate(summary, max_tokens, model)
+            except Exception as e:
+                logger.warning(f"Summarizing oversized prompt item failed, truncating instead: {e}")
+        return self.counter.truncate(text, max_tokens, model)
+
+    def fit(self, model: str, prompt_name: str, template: str, replacement_items: List, prompt=None
+            ) -> Tuple[List, BudgetReport]:
+        """
+        Returns (replacement items that fit the budget, report).  `template` is the
+        prompt rendered with empty replacement items.
+        """
+        budget = self.budget_for(model)
+        fixed_tokens = self.counter.count(template, model) + self.counter.count(str(prompt or ''), model)
+        texts = [str(item) for item in replacement_items]
+        item_tokens = [self.counter.count(text, model) for text in texts]
+        tokens_before = fixed_tokens + sum(item_tokens)
+
+        caps = [budget.max_item_tokens] * len(texts) if budget.max_item_tokens is not None else [None] * len(texts)
+        if tokens_before > budget.max_prompt_tokens:
+            available = budget.max_prompt_tokens - fixed_tokens
+            if budget.strategy == 'error' or available < 0:
+                raise PromptBudgetExceeded(
+                    f"{prompt_name} needs {tokens_before} tokens, budget for {model} is {budget.max_prompt_tokens}"
+                    + (f" (template and prompt alone use {fixed_tokens})" if available < 0 else ''))
+            cap = self._item_cap(item_tokens, available)
+            caps = [cap if item_cap is None else min(cap, item_cap) for item_cap in caps]
+
+        fitted = list(replacement_items)
+        trimmed, cost = [], []
+        for index, (text, tokens, cap) in enumerate(zip(texts, item_tokens, caps)):
+            if cap is not None and tokens > cap:
+                fitted[index] = self._shrink(text, cap, model, budget, cost)
+                item_tokens[index] = self.counter.count(fitted[index], model)
+                trimmed.append(index)
+
+        report = BudgetReport(model=model, prompt_name=prompt_name, tokens_before=tokens_before,
+                              tokens_after=fixed_tokens + sum(item_tokens), items_trimmed=trimmed, cost=cost)
+        if trimmed:
+            logger.warning(f"Trimmed {report.trimmed_tokens} tokens from {len(trimmed)} replacement item(s) "
+                           f"of {prompt_name} for {model} ({report.tokens_before} -> {report.tokens_after})")
+        return fitted, report
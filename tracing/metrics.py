@@ -0,0 +1,166 @@
+import bisect
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Sequence, Tuple
+
+from loguru import logger
+
+
+def exponential_bounds(start: float, factor: float, count: int) -> List[float]:
+    return [start * factor ** index for index in range(count)]
+
+
+# 1ms .. ~15 minutes, and 1 .. ~2M tokens
+LATENCY_BOUNDS = exponential_bounds(0.001, 1.5, 34)
+TOKEN_BOUNDS = exponential_bounds(1, 1.5, 36)
+
+
+class Histogram:
+    """
+    Fixed-bucket histogram.  `bounds` are inclusive bucket upper bounds; values above
+    the last bound go to an overflow bucket.  Percentiles are interpolated within the
+    bucket and clamped to the observed min/max, so they are approximate (to one bucket
+    width) but cost O(buckets) memory regardless of sample count.
+    """
+    __slots__ = ('bounds', 'buckets', 'count', 'sum', 'min', 'max', '_lock')
+
+    def __init__(self, bounds: Sequence[float] = LATENCY_BOUNDS):
+        self.bounds = list(bounds)
+        self.buckets = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.min = None
+        self.max = None
+        self._lock = threading.Lock()
+
+    def observe(self, value: float):
+        index = bisect.bisect_left(self.bounds, value)
+        with self._lock:
+            self.buckets[index] += 1
+            self.count += 1
+            self.sum += value
+            if self.min is None or value < self.min:
+                self.min = value
+            if self.max is None or value > self.max:
+                self.max = value
+
+    def percentile(self, fraction: float) -> Optional[float]:
+        with self._lock:
+            if not self.count:
+                return None
+            rank = fraction * self.count
+            seen = 0
+            for index, bucket_count in enumerate(self.buckets):
+                if not bucket_count or seen + bucket_count < rank:
+                    seen += bucket_count
+                    continue
+                lower = self.bounds[index - 1] if index > 0 else 0.0
+                upper = self.bounds[index] if index < len(self.bounds) else self.max
+                value = lower + (upper - lower) * (rank - seen) / bucket_count
+                return min(max(value, self.min), self.max)
+            return self.max
+
+    def snapshot(self) -> dict:
+        return {
+            'count': self.count,
+            'sum': self.sum,
+            'mean': self.sum / self.count if self.count else None,
+            'min': self.min,
+            'max': self.max,
+            'p50': self.percentile(0.50),
+            'p95': self.percentile(0.95),
+            'p99': self.percentile(0.99),
+        }
+
+
+def _series_key(name: str, labels: Dict[str, str]) -> str:
+    if not labels:
+        return name
+    return name + '{' + ','.join(f'{key}={labels[key]}' for key in sorted(labels)) + '}'
+
+
+class MetricsRegistry:
+    """
+    In-process counters and histograms keyed by metric name and labels.  `snapshot()`
+    returns plain dicts (JSON serialisable) and `serve()` exposes it over HTTP.
+    """
+
+    def __init__(self):
+        self._counters: Dict[str, Tuple[str, Dict[str, str], float]] = {}
+        self._histograms: Dict[str, Tuple[str, Dict[str, str], Histogram]] = {}
+        self._lock = threading.Lock()
+
+    def increment(self, name: str, value: float = 1, **labels):
+        key = _series_key(name, labels)
+        with self._lock:
+            _, _, current = self._counters.get(key, (name, labels, 0))
+            self._counters[key] = (name, labels, current + value)
+
+    def histogram(self, name: str, bounds: Sequence[float] = LATENCY_BOUNDS, **labels) -> Histogram:
+        key = _series_key(name, labels)
+        series = self._histograms.get(key)
+        if series is None:
+            with self._lock:
+                series = self._histograms.get(key)
+                if series is None:
+                    series = self._histograms[key] = (name, labels, Histogram(bounds))
+        return series[2]
+
+    def observe(self, name: str, value: float, bounds: Sequence[float] = LATENCY_BOUNDS, **labels):
+        self.histogram(name, bounds, **labels).observe(value)
+
+    def counter(self, name: str, **labels) -> float:
+        return self._counters.get(_series_key(name, labels), (name, labels, 0))[2]
+
+    def snapshot(self, name: Optional[str] = None) -> dict:
+        """All series, or only those of metric `name`."""
+        with self._lock:
+            counters = list(self._counters.items())
+            histograms = list(self._histograms.items())
+        return {
+            'counters': {key: {'labels': labels, 'value': value}
+                         for key, (metric, labels, value) in counters if name is None or metric == name},
+            'histograms': {key: {'labels': labels, **histogram.snapshot()}
+                           for key, (metric, labels, histogram) in histograms if name is None or metric == name},
+        }
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def serve(self, port: int = 9464, host: str = '127.0.0.1') -> ThreadingHTTPServer:
+        """
+        Serves `snapshot()` as JSON on `GET /metrics` from a daemon thread.  Call
+        `shutdown()` on the returned server to stop it.
+        """
+        registry = self
+
+        class MetricsHandler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?')[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                body = json.dumps(registry.snapshot(), default=str).encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'application/json')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        server = ThreadingHTTPServer((host, port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, name='metrics-endpoint', daemon=True).start()
+        logger.info(f"Serving metrics on http://{host}:{server.server_port}/metrics")
+        return server
+
+
+_registry = MetricsRegistry()
+
+
+def get_metrics() -> MetricsRegistry:
+    """The process-wide metrics registry."""
+    return _registry
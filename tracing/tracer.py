@@ -0,0 +1,215 @@
+import random
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple, Union
+
+from loguru import logger
+
+
+class TraceLevel(IntEnum):
+    TRACE = 5
+    DEBUG = 10
+    INFO = 20
+    SUCCESS = 25
+    WARNING = 30
+    ERROR = 40
+
+
+@dataclass(slots=True)
+class SpanRecord:
+    """A finished span or point event.  The message is only formatted when read."""
+    tracer: str
+    name: str
+    level: TraceLevel
+    start_ns: int
+    duration_ns: int
+    thread: str
+    attributes: Dict[str, Any] = field(default_factory=dict)
+    status: str = 'ok'
+    error: Optional[str] = None
+    template: Optional[Union[str, Callable[[], str]]] = None
+    args: Tuple[Any, ...] = ()
+
+    @property
+    def message(self) -> str:
+        if self.template is None:
+            return self.name
+        if callable(self.template):
+            return self.template()
+        if self.args or self.attributes:
+            return self.template.format(*self.args, **self.attributes)
+        return self.template
+
+
+class RingBufferSink:
+    """Keeps the most recent `capacity` records in memory; old records fall off the end."""
+
+    def __init__(self, capacity: int = 4096):
+        self.records: Deque[SpanRecord] = deque(maxlen=capacity)
+
+    def emit(self, record: SpanRecord):
+        self.records.append(record)
+
+    def snapshot(self, name: Optional[str] = None, min_level: TraceLevel = TraceLevel.TRACE) -> List[SpanRecord]:
+        return [record for record in list(self.records)
+                if record.level >= min_level and (name is None or record.name == name)]
+
+    def clear(self):
+        self.records.clear()
+
+
+class LoguruSink:
+    """Forwards records to loguru, formatting only if loguru will actually emit them."""
+
+    def emit(self, record: SpanRecord):
+        logger.opt(lazy=True).log(
+            record.level.name, "{} [{}] {:.3f}ms {}",
+            lambda: record.name, lambda: record.status, lambda: record.duration_ns / 1e6, lambda: record.message
+        )
+
+
+class _NoopSpan:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        return False
+
+    def set(self, **attributes):
+        return self
+
+
+_NOOP_SPAN = _NoopSpan()
+
+
+class _Span:
+    __slots__ = ('_tracer', '_name', '_level', '_template', '_attributes', '_start_ns')
+
+    def __init__(self, tracer: 'Tracer', name: str, level: TraceLevel, template, attributes: Dict[str, Any]):
+        self._tracer = tracer
+        self._name = name
+        self._level = level
+        self._template = template
+        self._attributes = attributes
+        self._start_ns = 0
+
+    def set(self, **attributes) -> '_Span':
+        self._attributes.update(attributes)
+        return self
+
+    def __enter__(self) -> '_Span':
+        self._start_ns = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> bool:
+        duration_ns = time.perf_counter_ns() - self._start_ns
+        level = self._level if exc_type is None else max(self._level, TraceLevel.ERROR)
+        self._tracer._emit(SpanRecord(
+            tracer=self._tracer.name,
+            name=self._name,
+            level=level,
+            start_ns=self._start_ns,
+            duration_ns=duration_ns,
+            thread=threading.current_thread().name,
+            attributes=self._attributes,
+            status='ok' if exc_type is None else 'error',
+            error=None if exc_type is None else f"{exc_type.__name__}: {exc_val}",
+            template=self._template
+        ))
+        return False
+
+
+class Tracer:
+    """
+    Structured span/event tracer for hot paths.  Calls below `level` return a shared
+    no-op span without allocating, spans below WARNING are sampled at `sample_rate`,
+    and messages are formatted lazily by whichever sink reads them.  Records go to
+    an in-memory ring buffer by default.
+    """
+
+    def __init__(self, name: str, level: TraceLevel = TraceLevel.INFO, sample_rate: float = 1.0,
+                 sinks: Optional[list] = None, buffer_size: int = 4096):
+        self.name = name
+        self.level = level
+        self.sample_rate = sample_rate
+        self.buffer = RingBufferSink(buffer_size)
+        self.sinks = sinks if sinks is not None else [self.buffer]
+
+    def enabled(self, level: TraceLevel) -> bool:
+        return level >= self.level
+
+    def _sampled(self, level: TraceLevel) -> bool:
+        return level >= TraceLevel.WARNING or self.sample_rate >= 1.0 or random.random() < self.sample_rate
+
+    def span(self, name: str, level: TraceLevel = TraceLevel.DEBUG,
+             message: Optional[Union[str, Callable[[], str]]] = None, **attributes):
+        """Times the enclosed block.  Exceptions are recorded at ERROR level and re-raised."""
+        if level < self.level or not self._sampled(level):
+            return _NOOP_SPAN
+        return _Span(self, name, level, message, attributes)
+
+    def event(self, level: TraceLevel, name: str, message: Optional[Union[str, Callable[[], str]]] = None,
+              *args, **attributes):
+        """Records a point event.  `message` is a str.format template or a zero-argument callable."""
+        if level < self.level or not self._sampled(level):
+            return
+        self._emit(SpanRecord(
+            tracer=self.name,
+            name=name,
+            level=level,
+            start_ns=time.perf_counter_ns(),
+            duration_ns=0,
+            thread=threading.current_thread().name,
+            attributes=attributes,
+            template=message,
+            args=args
+        ))
+
+    def _emit(self, record: SpanRecord):
+        for sink in self.sinks:
+            sink.emit(record)
+
+
+_tracers: Dict[str, Tracer] = {}
+_tracers_lock = threading.Lock()
+_defaults: Dict[str, Any] = {'level': TraceLevel.WARNING, 'sample_rate': 1.0, 'buffer_size': 4096,
+                             'forward_to_loguru': False}
+
+
+def _sinks_for(tracer: Tracer) -> list:
+    return [tracer.buffer, LoguruSink()] if _defaults['forward_to_loguru'] else [tracer.buffer]
+
+
+def get_tracer(name: str) -> Tracer:
+    """Process-wide tracer for a component, created with the current `configure_tracing` defaults."""
+    tracer = _tracers.get(name)
+    if tracer is None:
+        with _tracers_lock:
+            tracer = _tracers.get(name)
+            if tracer is None:
+                tracer = Tracer(name, level=_defaults['level'], sample_rate=_defaults['sample_rate'],
+                                buffer_size=_defaults['buffer_size'])
+                tracer.sinks = _sinks_for(tracer)
+                _tracers[name] = tracer
+    return tracer
+
+
+def configure_tracing(level: Optional[TraceLevel] = None, sample_rate: Optional[float] = None,
+                      buffer_size: Optional[int] = None, forward_to_loguru: Optional[bool] = None):
+    """Updates the defaults and applies them to every existing tracer."""
+    with _tracers_lock:
+        for key, value in (('level', level), ('sample_rate', sample_rate), ('buffer_size', buffer_size),
+                           ('forward_to_loguru', forward_to_loguru)):
+            if value is not None:
+                _defaults[key] = value
+        for tracer in _tracers.values():
+            tracer.level = _defaults['level']
+            tracer.sample_rate = _defaults['sample_rate']
+            if buffer_size is not None:
+                tracer.buffer = RingBufferSink(buffer_size)
+            tracer.sinks = _sinks_for(tracer)